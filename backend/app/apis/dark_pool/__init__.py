@@ -1,11 +1,18 @@
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
 import databutton as db
-import requests
 import json
 import datetime
 import random
+import asyncio
+import io
+import time
+import numpy as np
+from collections import OrderedDict
+from zoneinfo import ZoneInfo
 from typing import List, Dict, Optional, Any
+from app.apis.market_data import polygon_client
+from app.apis.ted_brain_categories import sanitize_key
 
 router = APIRouter()
 
@@ -22,6 +29,7 @@ class PriceLevel(BaseModel):
     notional: str
     percentage: str
     spread: str
+    prints: Optional[str] = None
     isHighlighted: bool
 
 class DarkPoolTrade(BaseModel):
@@ -43,11 +51,100 @@ class DarkPoolLevels(BaseModel):
     date: str
     levels: List[PriceLevel]
 
+# Numeric models every analytics step works on; formatting happens only when serializing
+class DarkPoolPrint(BaseModel):
+    ts_ns: int
+    symbol: str
+    price: float
+    size: int
+    notional: float
+    type: str  # DARK or BLOCK
+    is_block: bool = False  # Large for this symbol, by size percentile and notional
+    size_percentile: Optional[float] = None  # Percentile of the print's size among the symbol's trades
+    adv_pct: Optional[float] = None  # Size as a percent of average daily volume
+
+class LevelStat(BaseModel):
+    price: float
+    volume: int
+    notional: float
+    share: float  # Percent of off-exchange volume in the window
+    prints: int
+    spread: float  # Width of the level's price bin, in cents
+    z_score: float
+    significant: bool
+
+class DarkPoolLevelStats(BaseModel):
+    ticker: str
+    price: float
+    prev_close: float
+    volume: int
+    date: str  # YYYY-MM-DD
+    levels: List[LevelStat]
+
 class DarkPoolResponse(BaseModel):
     trades: List[DarkPoolTrade]
     levels: Optional[DarkPoolLevels] = None
+    prints: Optional[List[DarkPoolPrint]] = None  # Numeric view, when formatted=false
+    level_stats: Optional[DarkPoolLevelStats] = None  # Numeric view, when formatted=false
+    loading: bool = False  # True while the market-wide print index is still being built
     error: Optional[str] = None
 
+class TapeSummary(BaseModel):
+    symbol: str
+    date: str
+    trades: int  # Every print on the consolidated tape
+    volume: int
+    dark_prints: int
+    dark_volume: int
+    block_prints: int  # Lit prints kept as block candidates (at least BLOCK_MIN_NOTIONAL)
+    complete: bool
+
+class DarkPoolDayStat(BaseModel):
+    date: str
+    prints: int  # Off-exchange prints
+    dark_volume: int
+    dark_notional: float
+    vwap: Optional[float] = None  # Off-exchange VWAP
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    close: Optional[float] = None
+    close_vs_vwap_pct: Optional[float] = None
+
+class LevelReaction(BaseModel):
+    price: float
+    volume: int
+    share: float  # Percent of off-exchange volume across the window
+    significant: bool
+    role: str  # support or resistance, relative to the last close
+    first_seen: str  # First day the level traded off-exchange
+    touches: int  # Later days whose range reached the level
+    holds: int  # Touches that closed on the side price came from
+    hold_rate: Optional[float] = None
+    avg_reaction_pct: Optional[float] = None  # Mean move away from the level, REACTION_DAYS after a touch
+    last_touch: Optional[str] = None
+
+class DarkPoolHistoryResponse(BaseModel):
+    symbol: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+    vwap: Optional[float] = None  # Off-exchange VWAP across the window
+    days: List[DarkPoolDayStat]
+    levels: List[LevelReaction]
+    loading: bool = False  # True while missing days are still being ingested; the days present are final
+    error: Optional[str] = None
+
+class SizeProfile(BaseModel):
+    symbol: str
+    days: int
+    trades: int  # Trades in the rolling size distribution
+    median_size: float
+    p90_size: float
+    p99_size: float
+    block_size: float  # Size at BLOCK_PERCENTILE
+    block_min_notional: float
+    adv: float  # Average daily volume over the complete days in the window
+
 # Get Polygon API key
 def get_polygon_api_key():
     api_key = db.secrets.get("POLYGON_API_KEY")
@@ -70,147 +167,622 @@ def format_dollar(amount: float) -> str:
     else:
         return f"${amount:.2f}"
 
+# Display view of numeric prints
+def format_trades(prints: List[DarkPoolPrint]) -> List[DarkPoolTrade]:
+    trades = []
+    for trade_id, print_ in enumerate(prints, start=1):
+        trade_time = datetime.datetime.fromtimestamp(print_.ts_ns / 1_000_000_000)
+        trades.append(DarkPoolTrade(
+            id=trade_id,
+            time=trade_time.strftime("%H:%M:%S"),
+            date=trade_time.strftime("%m/%d/%y"),
+            symbol=print_.symbol,
+            shares=format_number(print_.size),
+            price=f"${print_.price:.2f}",
+            value=format_dollar(print_.notional),
+            type=print_.type
+        ))
+    return trades
+
+# Display view of numeric level statistics
+def format_levels(stats: DarkPoolLevelStats) -> DarkPoolLevels:
+    change = stats.price - stats.prev_close
+    change_percent = (change / stats.prev_close) * 100 if stats.prev_close else 0.0
+    return DarkPoolLevels(
+        ticker=stats.ticker,
+        price=f"${stats.price:.2f}",
+        change=f"{'+' if change >= 0 else ''}{change:.2f}",
+        changePercent=f"{'+' if change >= 0 else ''}{change_percent:.2f}%",
+        avgDailyVolume=format_number(stats.volume),
+        date=datetime.date.fromisoformat(stats.date).strftime("%m/%d/%y"),
+        levels=[
+            PriceLevel(
+                price=f"{level.price:.2f}",
+                volume=format_number(level.volume),
+                notional=format_dollar(level.notional),
+                percentage=f"{level.share:.2f}%",
+                spread=f"{level.spread:g}",
+                prints=str(level.prints),
+                isHighlighted=level.significant
+            )
+            for level in stats.levels
+        ]
+    )
+
+def dark_pool_response(prints: List[DarkPoolPrint], stats: Optional[DarkPoolLevelStats], formatted: bool = True) -> DarkPoolResponse:
+    """Serialize numeric results, as display strings or as-is"""
+    if formatted:
+        return DarkPoolResponse(trades=format_trades(prints), levels=format_levels(stats) if stats else None)
+    return DarkPoolResponse(trades=[], prints=prints, level_stats=stats)
+
+# Full-day trade ingestion: every print is scanned, only off-exchange and block-candidate prints are kept
+BLOCK_MIN_NOTIONAL = 200_000  # Lit prints below this can never be flagged as blocks, so they are not kept
+MARKET_TZ = ZoneInfo("America/New_York")
+SESSION_START_HOUR = 4  # Pre-market open, Eastern
+SESSION_END_HOUR = 20  # After-hours close, Eastern
+TAPE_SLICES = 16  # Concurrent time slices per day
+TODAY_REFRESH_SECONDS = 60
+
+# Trade-size sketch: log-spaced buckets with ~1% relative error, mergeable by addition
+SKETCH_GAMMA = 1.02
+SKETCH_LOG_GAMMA = float(np.log(SKETCH_GAMMA))
+SKETCH_BUCKETS = 1024  # Covers sizes up to ~6e8 shares
+
+class SizeSketch:
+    """Streaming quantile sketch of trade sizes.
+
+    Bucket i counts sizes in (gamma^(i-1), gamma^i], so a batch is folded in
+    with one np.bincount, days are merged by adding counts, and quantile or
+    percentile lookups are a searchsorted over the cumulative counts.
+    """
+    def __init__(self, counts: Optional[np.ndarray] = None):
+        self.counts = counts if counts is not None else np.zeros(SKETCH_BUCKETS, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    @staticmethod
+    def buckets(sizes: np.ndarray) -> np.ndarray:
+        sizes = np.maximum(np.asarray(sizes, dtype=np.float64), 1.0)
+        return np.clip(np.ceil(np.log(sizes) / SKETCH_LOG_GAMMA - 1e-9), 0, SKETCH_BUCKETS - 1).astype(np.int64)
+
+    def add(self, sizes: np.ndarray):
+        if len(sizes):
+            self.counts += np.bincount(self.buckets(sizes), minlength=SKETCH_BUCKETS)
+
+    def merge(self, other: "SizeSketch"):
+        self.counts += other.counts
+
+    def quantile(self, q: float) -> float:
+        total = self.count
+        if total == 0:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * total))
+        # Midpoint of the bucket's range keeps the relative error symmetric
+        return float(2 * SKETCH_GAMMA ** bucket / (SKETCH_GAMMA + 1)) if bucket else 1.0
+
+    def percentiles(self, sizes: np.ndarray) -> np.ndarray:
+        """Mid-rank percentile of each size within the distribution"""
+        total = self.count
+        if total == 0:
+            return np.full(len(sizes), np.nan)
+        cumulative = np.cumsum(self.counts)
+        buckets = self.buckets(sizes)
+        below = cumulative[buckets] - self.counts[buckets]
+        return (below + self.counts[buckets] / 2) / total * 100
+
+class DayTape:
+    """One symbol-day of off-exchange (TRF) and block prints as NumPy columns,
+    with the whole tape's trade count and volume kept alongside"""
+    def __init__(self, symbol: str, date: datetime.date, ts_ns=None, price=None, size=None, is_dark=None, trf_id=None,
+                 total_trades: int = 0, total_volume: int = 0, complete: bool = False, size_sketch: Optional[SizeSketch] = None):
+        self.symbol = symbol
+        self.date = date
+        self.ts_ns = ts_ns if ts_ns is not None else np.zeros(0, dtype=np.int64)
+        self.price = price if price is not None else np.zeros(0, dtype=np.float64)
+        self.size = size if size is not None else np.zeros(0, dtype=np.int64)
+        self.is_dark = is_dark if is_dark is not None else np.zeros(0, dtype=bool)
+        self.trf_id = trf_id if trf_id is not None else np.zeros(0, dtype=np.int16)
+        self.total_trades = total_trades
+        self.total_volume = total_volume
+        self.size_sketch = size_sketch or SizeSketch()  # Sizes of every trade on the tape, not only the kept prints
+        self.complete = complete
+        self.fetched_at = time.time()
+        self.fetched_at_ns = 0  # End of the range fetched so far, for topping up today's tape
+
+    def __len__(self) -> int:
+        return len(self.ts_ns)
+
+    def extend(self, other: "DayTape"):
+        """Append a later slice of the same day"""
+        self.ts_ns = np.concatenate([self.ts_ns, other.ts_ns])
+        self.price = np.concatenate([self.price, other.price])
+        self.size = np.concatenate([self.size, other.size])
+        self.is_dark = np.concatenate([self.is_dark, other.is_dark])
+        self.trf_id = np.concatenate([self.trf_id, other.trf_id])
+        self.total_trades += other.total_trades
+        self.total_volume += other.total_volume
+        self.size_sketch.merge(other.size_sketch)
+
+    def summary(self) -> TapeSummary:
+        return TapeSummary(
+            symbol=self.symbol,
+            date=self.date.isoformat(),
+            trades=self.total_trades,
+            volume=self.total_volume,
+            dark_prints=int(self.is_dark.sum()),
+            dark_volume=int(self.size[self.is_dark].sum()),
+            block_prints=int((~self.is_dark).sum()),
+            complete=self.complete
+        )
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, ts_ns=self.ts_ns, price=self.price, size=self.size, is_dark=self.is_dark,
+                            trf_id=self.trf_id, totals=np.array([self.total_trades, self.total_volume], dtype=np.int64),
+                            size_counts=self.size_sketch.counts)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, symbol: str, date: datetime.date, payload: bytes) -> "DayTape":
+        data = np.load(io.BytesIO(payload))
+        totals = data["totals"]
+        if "size_counts" in data.files:
+            sketch = SizeSketch(data["size_counts"])
+        else:
+            # Tapes stored before sketches were kept: approximate from the kept prints
+            sketch = SizeSketch()
+            sketch.add(data["size"])
+        return cls(symbol, date, data["ts_ns"], data["price"], data["size"], data["is_dark"], data["trf_id"],
+                   int(totals[0]), int(totals[1]), complete=True, size_sketch=sketch)
+
+def tape_storage_key(symbol: str, date: datetime.date) -> str:
+    return sanitize_key(f"dark_pool_tape_{symbol}_{date.isoformat()}")
+
+def session_bounds_ns(date: datetime.date) -> tuple:
+    """Extended-hours session for a date, as epoch nanoseconds"""
+    start = datetime.datetime(date.year, date.month, date.day, SESSION_START_HOUR, tzinfo=MARKET_TZ)
+    end = datetime.datetime(date.year, date.month, date.day, SESSION_END_HOUR, tzinfo=MARKET_TZ)
+    return int(start.timestamp()) * 1_000_000_000, int(end.timestamp()) * 1_000_000_000
+
+def trading_days(lookback_days: int) -> List[datetime.date]:
+    """Weekdays from lookback_days ago through today (Eastern), oldest first"""
+    today = datetime.datetime.now(MARKET_TZ).date()
+    days = [today - datetime.timedelta(days=offset) for offset in range(max(0, lookback_days), -1, -1)]
+    return [day for day in days if day.weekday() < 5]
+
+async def ingest_slice(symbol: str, date: datetime.date, start_ns: int, end_ns: int, api_key: str) -> DayTape:
+    """Page through every trade in [start_ns, end_ns), keeping dark and block-candidate prints as pages arrive"""
+    ts_ns, price, size, is_dark, trf_id = [], [], [], [], []
+    total_trades = total_volume = 0
+    sketch = SizeSketch()
+    page_sizes = []
+    url = (f"https://api.polygon.io/v3/trades/{symbol}?timestamp.gte={start_ns}&timestamp.lt={end_ns}"
+           f"&order=asc&sort=timestamp&limit=50000&apiKey={api_key}")
+    async for page in polygon_client.iter_pages(url, api_key, max_pages=1000, timeout=30.0):
+        for trade in page:
+            trade_size = trade.get("size", 0)
+            trade_price = trade.get("price", 0)
+            total_trades += 1
+            total_volume += trade_size
+            page_sizes.append(trade_size)
+            # Exchange ID 4 with a trf_id is a print reported to a FINRA TRF, i.e. off-exchange
+            dark = trade.get("exchange") == 4 and "trf_id" in trade
+            if dark or trade_size * trade_price >= BLOCK_MIN_NOTIONAL:
+                ts_ns.append(trade.get("sip_timestamp", 0))
+                price.append(trade_price)
+                size.append(trade_size)
+                is_dark.append(dark)
+                trf_id.append(trade.get("trf_id", -1))
+        sketch.add(np.array(page_sizes, dtype=np.int64))
+        page_sizes.clear()
+    return DayTape(symbol, date, np.array(ts_ns, dtype=np.int64), np.array(price, dtype=np.float64),
+                   np.array(size, dtype=np.int64), np.array(is_dark, dtype=bool), np.array(trf_id, dtype=np.int16),
+                   total_trades, total_volume, size_sketch=sketch)
+
+async def ingest_range(symbol: str, date: datetime.date, start_ns: int, end_ns: int, api_key: str, slices: int) -> DayTape:
+    """Ingest a time range as concurrent slices and stitch them back in order"""
+    step = max(1, (end_ns - start_ns) // slices)
+    bounds = [(lo, min(lo + step, end_ns)) for lo in range(start_ns, end_ns, step)]
+    parts = await asyncio.gather(*[ingest_slice(symbol, date, lo, hi, api_key) for lo, hi in bounds])
+    tape = DayTape(symbol, date)
+    for part in parts:
+        tape.extend(part)
+    return tape
+
+class TapeCache:
+    """Per-symbol, per-day tapes: memory first, then binary storage, then ingestion.
+
+    Finished days are ingested once, persisted and never fetched again. The
+    current day is kept in memory and topped up from its last print.
+    """
+    def __init__(self, max_days: int = 64):
+        self.max_days = max_days
+        self.tapes: "OrderedDict[tuple, DayTape]" = OrderedDict()
+        self.locks: Dict[tuple, asyncio.Lock] = {}
+
+    def _remember(self, key: tuple, tape: DayTape):
+        self.tapes[key] = tape
+        self.tapes.move_to_end(key)
+        while len(self.tapes) > self.max_days:
+            self.tapes.popitem(last=False)
+
+    async def get(self, symbol: str, date: datetime.date, api_key: str) -> DayTape:
+        key = (symbol, date)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            tape = self.tapes.get(key)
+            if tape is not None and tape.complete:
+                self.tapes.move_to_end(key)
+                return tape
+
+            start_ns, end_ns = session_bounds_ns(date)
+            now_ns = time.time_ns()
+            if end_ns <= now_ns:
+                # A finished day: storage, else a full concurrent ingest
+                try:
+                    tape = DayTape.from_bytes(symbol, date, db.storage.binary.get(tape_storage_key(symbol, date)))
+                except Exception:
+                    tape = await ingest_range(symbol, date, start_ns, end_ns, api_key, TAPE_SLICES)
+                    tape.complete = True
+                    try:
+                        db.storage.binary.put(tape_storage_key(symbol, date), tape.to_bytes())
+                    except Exception as e:
+                        print(f"Error saving dark pool tape for {symbol} {date}: {e}")
+                    print(f"Ingested {tape.total_trades} trades for {symbol} on {date}, kept {len(tape)} dark/block prints")
+            elif tape is None:
+                tape = await ingest_range(symbol, date, start_ns, min(now_ns, end_ns), api_key, TAPE_SLICES)
+                tape.fetched_at = time.time()
+            elif time.time() - tape.fetched_at > TODAY_REFRESH_SECONDS:
+                # Top up today's tape from just after the last fetch
+                tape.extend(await ingest_range(symbol, date, tape.fetched_at_ns, min(now_ns, end_ns), api_key, 1))
+                tape.fetched_at = time.time()
+            if not tape.complete:
+                tape.fetched_at_ns = min(now_ns, end_ns)
+            self._remember(key, tape)
+            return tape
+
+tape_cache = TapeCache()
+
+# Adaptive block detection: a print is a block when it is large for its own symbol
+BLOCK_PERCENTILE = 99.5  # Size percentile within the symbol's rolling trade-size distribution
+BLOCK_SKETCH_DAYS = 20  # Trading days in the rolling distribution and the ADV
+
+class BlockDetector:
+    """Rolling per-symbol trade-size distributions and incremental block flags.
+
+    Each observed tape contributes its day sketch; a symbol's distribution is
+    the sum of its last BLOCK_SKETCH_DAYS day sketches. Flags and percentiles
+    are computed once per kept print and cached per tape with the number of
+    rows consumed, so topping up today's tape only classifies the new rows.
+    """
+    def __init__(self, percentile: float = BLOCK_PERCENTILE, window_days: int = BLOCK_SKETCH_DAYS):
+        self.percentile = percentile
+        self.window_days = window_days
+        self.days: Dict[str, "OrderedDict[datetime.date, DayTape]"] = {}
+        self.flags: Dict[tuple, tuple] = {}  # (symbol, date) -> (percentiles, is_block, rows consumed)
+
+    def observe(self, tape: DayTape):
+        days = self.days.setdefault(tape.symbol, OrderedDict())
+        days[tape.date] = tape
+        for date in sorted(days)[:-self.window_days]:
+            del days[date]
+            self.flags.pop((tape.symbol, date), None)
+
+    def sketch(self, symbol: str) -> SizeSketch:
+        combined = SizeSketch()
+        for tape in self.days.get(symbol, {}).values():
+            combined.merge(tape.size_sketch)
+        return combined
+
+    def adv(self, symbol: str) -> float:
+        """Average daily volume over complete days, else the volume so far today"""
+        tapes = list(self.days.get(symbol, {}).values())
+        complete = [tape.total_volume for tape in tapes if tape.complete]
+        if complete:
+            return float(np.mean(complete))
+        return float(max((tape.total_volume for tape in tapes), default=0))
+
+    def classify(self, tape: DayTape) -> tuple:
+        """(size percentiles, block flags) for every kept print on the tape"""
+        key = (tape.symbol, tape.date)
+        percentiles, is_block, consumed = self.flags.get(key, (np.zeros(0, dtype=np.float32), np.zeros(0, dtype=bool), 0))
+        if consumed > len(tape):
+            percentiles, is_block, consumed = np.zeros(0, dtype=np.float32), np.zeros(0, dtype=bool), 0
+        if consumed < len(tape):
+            sketch = self.sketch(tape.symbol)
+            if sketch.count == 0:
+                sketch = tape.size_sketch
+            threshold = sketch.quantile(self.percentile / 100)
+            sizes = tape.size[consumed:]
+            notional = tape.price[consumed:] * sizes
+            percentiles = np.concatenate([percentiles, sketch.percentiles(sizes).astype(np.float32)])
+            is_block = np.concatenate([is_block, (sizes >= threshold) & (notional >= BLOCK_MIN_NOTIONAL)])
+            self.flags[key] = (percentiles, is_block, len(tape))
+        return percentiles, is_block
+
+    def profile(self, symbol: str) -> SizeProfile:
+        sketch = self.sketch(symbol)
+        return SizeProfile(
+            symbol=symbol,
+            days=len(self.days.get(symbol, {})),
+            trades=sketch.count,
+            median_size=sketch.quantile(0.5),
+            p90_size=sketch.quantile(0.9),
+            p99_size=sketch.quantile(0.99),
+            block_size=sketch.quantile(self.percentile / 100),
+            block_min_notional=BLOCK_MIN_NOTIONAL,
+            adv=self.adv(symbol)
+        )
+
+block_detector = BlockDetector()
+
+# Market-wide index of recent large prints, behind the "ALL" view
+MARKET_PRINT_MIN_NOTIONAL = 1_000_000
+MARKET_PRINT_RETENTION_DAYS = 7
+# Liquid names ingested in the background so the ALL view covers the market, not only requested symbols
+MARKET_PRINT_UNIVERSE = [
+    "SPY", "QQQ", "IWM", "DIA", "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "AMD", "AVGO", "NFLX",
+    "JPM", "BAC", "WFC", "XOM", "CVX", "UNH", "JNJ", "LLY", "V", "MA", "COST", "WMT", "HD", "INTC", "XLF", "XLE"
+]
+MARKET_PRINT_REFRESH_SECONDS = 300
+
+class MarketPrintIndex:
+    """Large off-exchange and block prints across every ingested symbol.
+
+    Rows are NumPy columns kept sorted by timestamp, with a notional-descending
+    permutation rebuilt on each write, so "latest N", "largest N" and "largest
+    N in a time window" are a searchsorted plus a slice or a partial sort.
+    Each symbol-day tape is fed once; for today's tape only rows appended
+    since the last feed are added.
+    """
+    def __init__(self, min_notional: float = MARKET_PRINT_MIN_NOTIONAL, retention_days: int = MARKET_PRINT_RETENTION_DAYS,
+                 capacity: int = 250_000):
+        self.min_notional = min_notional
+        self.retention_ns = retention_days * 86_400 * 1_000_000_000
+        self.capacity = capacity
+        self.symbols: List[str] = []
+        self.symbol_codes: Dict[str, int] = {}
+        self.ts_ns = np.zeros(0, dtype=np.int64)
+        self.symbol = np.zeros(0, dtype=np.int32)
+        self.price = np.zeros(0, dtype=np.float64)
+        self.size = np.zeros(0, dtype=np.int64)
+        self.notional = np.zeros(0, dtype=np.float64)
+        self.is_dark = np.zeros(0, dtype=bool)
+        self.by_notional = np.zeros(0, dtype=np.int64)
+        self.fed: Dict[tuple, int] = {}  # (symbol, date) -> tape rows already indexed
+        self.refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.ts_ns)
+
+    def add(self, symbol: str, ts_ns: np.ndarray, price: np.ndarray, size: np.ndarray, is_dark: np.ndarray):
+        """Index a batch of prints for one symbol, keeping those above the notional floor"""
+        notional = price * size
+        keep = notional >= self.min_notional
+        if not keep.any():
+            return
+        code = self.symbol_codes.get(symbol)
+        if code is None:
+            code = self.symbol_codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        ts_ns = np.concatenate([self.ts_ns, ts_ns[keep]])
+        order = np.argsort(ts_ns, kind="stable")
+        # Drop prints past retention, then the oldest beyond capacity
+        cutoff = max(time.time_ns() - self.retention_ns, int(ts_ns[order[-1]]) - self.retention_ns)
+        order = order[np.searchsorted(ts_ns[order], cutoff):][-self.capacity:]
+        self.ts_ns = ts_ns[order]
+        self.symbol = np.concatenate([self.symbol, np.full(int(keep.sum()), code, dtype=np.int32)])[order]
+        self.price = np.concatenate([self.price, price[keep]])[order]
+        self.size = np.concatenate([self.size, size[keep]])[order]
+        self.notional = np.concatenate([self.notional, notional[keep]])[order]
+        self.is_dark = np.concatenate([self.is_dark, is_dark[keep]])[order]
+        self.by_notional = np.argsort(self.notional, kind="stable")[::-1]
+
+    def add_tape(self, tape: DayTape):
+        key = (tape.symbol, tape.date)
+        start = self.fed.get(key, 0)
+        if start > len(tape):
+            start = 0
+        if start < len(tape):
+            self.add(tape.symbol, tape.ts_ns[start:], tape.price[start:], tape.size[start:], tape.is_dark[start:])
+            self.fed[key] = len(tape)
+
+    def top(self, limit: int = 20, sort_by: str = "time", symbol: Optional[str] = None, start_ns: Optional[int] = None,
+            end_ns: Optional[int] = None, dark: Optional[bool] = None, min_notional: float = 0) -> np.ndarray:
+        """Row indexes of the top prints, newest or largest first"""
+        if symbol is not None and symbol not in self.symbol_codes:
+            return np.zeros(0, dtype=np.int64)
+        unfiltered = symbol is None and start_ns is None and end_ns is None and dark is None and not min_notional
+        if sort_by == "notional" and unfiltered:
+            return self.by_notional[:limit]
+
+        lo = np.searchsorted(self.ts_ns, start_ns) if start_ns is not None else 0
+        hi = np.searchsorted(self.ts_ns, end_ns) if end_ns is not None else len(self.ts_ns)
+        rows = np.arange(lo, hi)
+        if symbol is not None:
+            rows = rows[self.symbol[rows] == self.symbol_codes[symbol]]
+        if dark is not None:
+            rows = rows[self.is_dark[rows] == dark]
+        if min_notional:
+            rows = rows[self.notional[rows] >= min_notional]
+        if sort_by == "notional":
+            if len(rows) > limit:
+                rows = rows[np.argpartition(self.notional[rows], -limit)[-limit:]]
+            return rows[np.argsort(self.notional[rows], kind="stable")[::-1]]
+        return rows[::-1][:limit]
+
+market_print_index = MarketPrintIndex()
+
+async def load_tape(symbol: str, lookback_days: int, api_key: str) -> List[DayTape]:
+    """Tapes for every trading day in the lookback window, fetched concurrently"""
+    tapes = await asyncio.gather(*[tape_cache.get(symbol, day, api_key) for day in trading_days(lookback_days)])
+    for tape in tapes:
+        block_detector.observe(tape)
+        market_print_index.add_tape(tape)
+    return tapes
+
+async def refresh_market_prints(api_key: str, lookback_days: int = 1):
+    """Ingest the liquid universe into the market-wide index"""
+    market_print_index.refreshed_at = time.time()
+    results = await asyncio.gather(*[load_tape(symbol, lookback_days, api_key) for symbol in MARKET_PRINT_UNIVERSE],
+                                   return_exceptions=True)
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    print(f"Market print index holds {len(market_print_index)} prints across {len(market_print_index.symbols)} symbols"
+          + (f" ({failed} symbols failed)" if failed else ""))
+
+market_refresh_task: Optional[asyncio.Task] = None
+
+def ensure_market_prints(api_key: str):
+    """Kick off a background universe refresh when the index is stale"""
+    global market_refresh_task
+    if time.time() - market_print_index.refreshed_at < MARKET_PRINT_REFRESH_SECONDS:
+        return
+    if market_refresh_task is None or market_refresh_task.done():
+        market_refresh_task = asyncio.create_task(refresh_market_prints(api_key))
+
+def market_prints(rows: np.ndarray) -> List[DarkPoolPrint]:
+    index = market_print_index
+    return [
+        DarkPoolPrint(ts_ns=ts_ns, symbol=index.symbols[code], price=price, size=size, notional=notional,
+                      type="DARK" if dark else "BLOCK")
+        for ts_ns, code, price, size, notional, dark in zip(
+            index.ts_ns[rows].tolist(), index.symbol[rows].tolist(), index.price[rows].tolist(),
+            index.size[rows].tolist(), index.notional[rows].tolist(), index.is_dark[rows].tolist())
+    ]
+
+# REST endpoint for top market-wide prints, by time or notional, optionally per symbol and window
+@router.get("/dark-pool/top-prints")
+async def get_top_prints(limit: int = 50, sort_by: str = "notional", symbol: Optional[str] = None,
+                         minutes: Optional[int] = None, formatted: bool = True) -> DarkPoolResponse:
+    try:
+        ensure_market_prints(get_polygon_api_key())
+        start_ns = time.time_ns() - minutes * 60 * 1_000_000_000 if minutes else None
+        rows = market_print_index.top(max(1, min(limit, 500)), sort_by, symbol.upper() if symbol else None, start_ns)
+        return dark_pool_response(market_prints(rows), None, formatted)
+    except Exception as e:
+        print(f"Error reading market print index: {e}")
+        return DarkPoolResponse(trades=[], error=f"Failed to read market prints: {str(e)}")
+
+# REST endpoint to ingest (or read back) full-day tapes for a symbol
+@router.get("/dark-pool/tape/{symbol}")
+async def get_dark_pool_tape(symbol: str, lookback_days: int = 0) -> List[TapeSummary]:
+    symbol = symbol.upper()
+    try:
+        tapes = await load_tape(symbol, lookback_days, get_polygon_api_key())
+        return [tape.summary() for tape in tapes]
+    except Exception as e:
+        print(f"Error ingesting dark pool tape for {symbol}: {e}")
+        raise HTTPException(status_code=502, detail=f"Failed to ingest trades for {symbol}: {str(e)}")
+
+# REST endpoint for a symbol's rolling trade-size distribution and block threshold
+@router.get("/dark-pool/size-profile/{symbol}")
+async def get_size_profile(symbol: str, lookback_days: int = BLOCK_SKETCH_DAYS) -> SizeProfile:
+    symbol = symbol.upper()
+    try:
+        await load_tape(symbol, lookback_days, get_polygon_api_key())
+        return block_detector.profile(symbol)
+    except Exception as e:
+        print(f"Error building size profile for {symbol}: {e}")
+        raise HTTPException(status_code=502, detail=f"Failed to build size profile for {symbol}: {str(e)}")
+
 # REST endpoint to fetch dark pool trades
 @router.get("/dark-pool-trades")
 async def get_dark_pool_trades(
-    symbol: str = "AAPL", 
-    show_dark_pool: bool = True, 
-    show_block_trades: bool = True, 
+    symbol: str = "AAPL",
+    show_dark_pool: bool = True,
+    show_block_trades: bool = True,
     min_value: int = 0,
-    lookback_days: int = 7
+    lookback_days: int = 7,
+    formatted: bool = True,
+    limit: int = 20
 ) -> DarkPoolResponse:
     try:
         symbol = symbol.upper()
+        limit = max(1, min(limit, 500))
         api_key = get_polygon_api_key()
-        
+
         print(f"Fetching dark pool data for {symbol}")
-        
+
+        # The ALL view is only ever a read of the market-wide print index, never a per-ticker fetch or synthetic data
+        if symbol == "ALL":
+            ensure_market_prints(api_key)
+            rows = np.zeros(0, dtype=np.int64)
+            if len(market_print_index) and (show_dark_pool or show_block_trades):
+                dark = None if show_dark_pool and show_block_trades else show_dark_pool
+                start_ns = time.time_ns() - lookback_days * 86_400 * 1_000_000_000 if lookback_days > 0 else None
+                rows = market_print_index.top(limit, "time", start_ns=start_ns, dark=dark, min_notional=min_value)
+            response = dark_pool_response(market_prints(rows), None, formatted)
+            if not len(market_print_index):
+                response.loading = market_refresh_task is not None and not market_refresh_task.done()
+                if not response.loading:
+                    response.error = "Market-wide dark pool prints are not available yet"
+            return response
+
         # Try to fetch data from Polygon.io's API
         try:
-            # First we need the current stock price and info
+            # Current stock price and info alongside the full tape for the lookback window
             stock_url = f"https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers/{symbol}?apiKey={api_key}"
-            stock_response = requests.get(stock_url, timeout=5.0)
-            
+            stock_data, tapes = await asyncio.gather(
+                polygon_client.get_json(stock_url, timeout=5.0),
+                load_tape(symbol, lookback_days, api_key)
+            )
+
             current_price = 0
             prev_close = 0
             volume = 0
-            
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                if 'ticker' in stock_data and 'day' in stock_data['ticker']:
-                    day_data = stock_data['ticker']['day']
-                    current_price = day_data.get('c', 0) 
-                    prev_close = day_data.get('p', current_price * 0.99)
-                    volume = day_data.get('v', 0)
-                    print(f"Retrieved current price for {symbol}: ${current_price}")
-            
-            # Try to fetch actual trades data from Polygon.io
-            # The /trades endpoint gives us access to trades with exchange IDs and TRF IDs
-            # Start with today's date
-            today = datetime.datetime.now()
-            
-            # Calculate the start date based on lookback_days
-            start_date = today - datetime.timedelta(days=lookback_days)
-            date_str = start_date.strftime("%Y-%m-%d")
-            end_date_str = today.strftime("%Y-%m-%d")
-            print(f"Fetching trades from {date_str} to {end_date_str}")
-            
-            # Build URL - we need to get trades to check for exchange ID 4 and trf_id
-            # We'll request a larger number to ensure we get enough dark pool trades
-            # If lookback_days is provided, use the timestamp parameter to filter by date
-            if lookback_days > 0:
-                trades_url = f"https://api.polygon.io/v3/trades/{symbol}?limit=100&order=desc&timestamp.gte={date_str}&apiKey={api_key}"
-            else:
-                trades_url = f"https://api.polygon.io/v3/trades/{symbol}?limit=100&order=desc&apiKey={api_key}"
-            trades_response = requests.get(trades_url, timeout=10.0)
-            
-            dark_pool_trades = []
-            real_data_available = False
-            
-            if trades_response.status_code == 200:
-                trades_data = trades_response.json()
-                trades = trades_data.get('results', [])
-                
-                if trades:
-                    print(f"Retrieved {len(trades)} trades for {symbol}")
-                    real_data_available = True
-                    
-                    # Process trades to find dark pool trades (exchange ID 4 with trf_id)
-                    trade_id = 1
-                    for trade in trades:
-                        # Check if this is a dark pool trade (exchange ID 4 and has trf_id)
-                        is_dark_pool = False
-                        is_block_trade = False
-                        
-                        # Exchange ID 4 and trf_id present indicates dark pool
-                        if trade.get('exchange') == 4 and 'trf_id' in trade:
-                            is_dark_pool = True
-                        
-                        # Large volume trades are block trades (>10,000 shares as threshold)
-                        size = trade.get('size', 0)
-                        if size >= 10000:
-                            is_block_trade = True
-                        
-                        # Skip if neither dark pool nor block trade, or filtered out
-                        if (is_dark_pool and not show_dark_pool) or \
-                           (is_block_trade and not is_dark_pool and not show_block_trades):
-                            continue
-                            
-                        # Get price and calculate value
-                        price = trade.get('price', 0)
-                        value = price * size
-                        
-                        # Skip if value is below minimum
-                        if value < min_value:
-                            continue
-                            
-                        # Format timestamp
-                        timestamp_ns = trade.get('timestamp', 0)
-                        if timestamp_ns > 0:
-                            trade_time = datetime.datetime.fromtimestamp(timestamp_ns / 1_000_000_000)
-                            time_str = trade_time.strftime("%H:%M:%S")
-                            date_str = trade_time.strftime("%m/%d/%y")
-                        else:
-                            time_str = datetime.datetime.now().strftime("%H:%M:%S")
-                            date_str = datetime.datetime.now().strftime("%m/%d/%y")
-                        
-                        # Create trade object
-                        trade_type = "DARK" if is_dark_pool else "BLOCK"
-                        
-                        dark_pool_trade = DarkPoolTrade(
-                            id=trade_id,
-                            time=time_str,
-                            date=date_str,
-                            symbol=symbol,
-                            shares=format_number(size),
-                            price=f"${price:.2f}",
-                            value=format_dollar(value),
-                            type=trade_type
-                        )
-                        
-                        dark_pool_trades.append(dark_pool_trade)
-                        trade_id += 1
-                        
-                        # Limit to 20 trades for display
-                        if len(dark_pool_trades) >= 20:
-                            break
-            
-            # If we have real trades, generate the levels based on those
-            if dark_pool_trades:  
-                # Generate price levels from the actual trades
-                levels = generate_price_levels(symbol, current_price, prev_close, volume)
-                
-                return DarkPoolResponse(
-                    trades=dark_pool_trades,
-                    levels=levels
-                )
+
+            if stock_data and 'ticker' in stock_data and 'day' in stock_data['ticker']:
+                day_data = stock_data['ticker']['day']
+                current_price = day_data.get('c', 0)
+                prev_close = day_data.get('p', current_price * 0.99)
+                volume = day_data.get('v', 0)
+                print(f"Retrieved current price for {symbol}: ${current_price}")
+
+            prints = []
+            if tapes:
+                ts_ns = np.concatenate([tape.ts_ns for tape in tapes])
+                prices = np.concatenate([tape.price for tape in tapes])
+                sizes = np.concatenate([tape.size for tape in tapes])
+                is_dark = np.concatenate([tape.is_dark for tape in tapes])
+                flags = [block_detector.classify(tape) for tape in tapes]
+                percentiles = np.concatenate([flag[0] for flag in flags])
+                is_block = np.concatenate([flag[1] for flag in flags])
+                notional = prices * sizes
+                adv = block_detector.adv(symbol) or float(volume)
+                print(f"Scanned {sum(tape.total_trades for tape in tapes)} trades for {symbol}, "
+                      f"{int(is_dark.sum())} off-exchange, {int(is_block.sum())} blocks")
+
+                # Dark prints and adaptive blocks (lit prints that are not blocks are never shown),
+                # value filter over the whole window, then the most recent
+                mask = ((is_dark & show_dark_pool) | (is_block & show_block_trades)) & (notional >= min_value)
+                rows = np.flatnonzero(mask)
+                rows = rows[np.argsort(ts_ns[rows], kind="stable")[::-1][:limit]]
+                adv_pct = sizes[rows] / adv * 100 if adv else np.full(len(rows), np.nan)
+                prints = [
+                    DarkPoolPrint(ts_ns=ts, symbol=symbol, price=price, size=size, notional=value, type="DARK" if dark else "BLOCK",
+                                  is_block=block, size_percentile=round(pct, 2), adv_pct=None if np.isnan(share) else round(share, 4))
+                    for ts, price, size, value, dark, block, pct, share in zip(
+                        ts_ns[rows].tolist(), prices[rows].tolist(), sizes[rows].tolist(), notional[rows].tolist(),
+                        is_dark[rows].tolist(), is_block[rows].tolist(), percentiles[rows].tolist(), adv_pct.tolist())
+                ]
+
+            # If we have real trades, bin their off-exchange prints into price levels
+            profile = profile_cache.window(tapes) if tapes else None
+            if prints and profile is not None:
+                if current_price <= 0:
+                    current_price = float(tapes[-1].price[-1])
+                stats = level_stats(symbol, current_price, prev_close or current_price, volume or tapes[-1].total_volume, profile)
+                return dark_pool_response(prints, stats, formatted)
         except Exception as e:
             print(f"Error fetching dark pool data from Polygon API: {e}")
             # Fall back to synthetic data
-        
+
         # Generate synthetic data if we couldn't get real data
-        return generate_synthetic_data(symbol, show_dark_pool, show_block_trades, min_value, lookback_days)
-            
+        return generate_synthetic_data(symbol, show_dark_pool, show_block_trades, min_value, lookback_days, formatted, limit)
+
     except Exception as e:
         print(f"Error generating dark pool data: {e}")
         return DarkPoolResponse(
@@ -218,277 +790,504 @@ async def get_dark_pool_trades(
             error=f"Failed to generate dark pool data: {str(e)}"
         )
 
-# Generate price levels for a symbol
-def generate_price_levels(symbol: str, current_price: float, prev_close: float, volume: int) -> DarkPoolLevels:
+# Volume-at-price over off-exchange prints
+VAP_SIGNIFICANCE_Z = 2.0  # Levels this many standard deviations above the mean bin volume are highlighted
+MAX_PRICE_LEVELS = 18
+
+def level_bin_size(price: float) -> float:
+    """Bin width of roughly 0.05% of price, snapped to a tick-friendly step"""
+    target = price * 0.0005
+    for step in (0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0):
+        if step >= target:
+            return step
+    return 25.0
+
+class VolumeProfile:
+    """Volume, notional and print count per price bin, grown in place.
+
+    Bins are integer multiples of bin_size stored densely from `offset`, so a
+    batch of prints is folded in with three np.bincount calls and profiles
+    with the same bin size can be summed by aligning offsets.
+    """
+    def __init__(self, bin_size: float):
+        self.bin_size = bin_size
+        self.offset = 0
+        self.volume = np.zeros(0, dtype=np.int64)
+        self.notional = np.zeros(0, dtype=np.float64)
+        self.prints = np.zeros(0, dtype=np.int64)
+        self.total_volume = 0
+
+    def _cover(self, lo: int, hi: int):
+        """Grow the dense range to include bins lo..hi"""
+        if len(self.volume) == 0:
+            self.offset = lo
+            n = hi - lo + 1
+            self.volume = np.zeros(n, dtype=np.int64)
+            self.notional = np.zeros(n, dtype=np.float64)
+            self.prints = np.zeros(n, dtype=np.int64)
+            return
+        left = max(0, self.offset - lo)
+        right = max(0, hi - (self.offset + len(self.volume) - 1))
+        if left or right:
+            self.volume = np.pad(self.volume, (left, right))
+            self.notional = np.pad(self.notional, (left, right))
+            self.prints = np.pad(self.prints, (left, right))
+            self.offset -= left
+
+    def add(self, prices: np.ndarray, sizes: np.ndarray):
+        if len(prices) == 0:
+            return
+        bins = np.rint(prices / self.bin_size).astype(np.int64)
+        self._cover(int(bins.min()), int(bins.max()))
+        positions = bins - self.offset
+        n = len(self.volume)
+        self.volume += np.bincount(positions, weights=sizes, minlength=n).astype(np.int64)
+        self.notional += np.bincount(positions, weights=prices * sizes, minlength=n)
+        self.prints += np.bincount(positions, minlength=n)
+        self.total_volume += int(sizes.sum())
+
+    def merge(self, other: "VolumeProfile"):
+        if len(other.volume) == 0:
+            return
+        self._cover(other.offset, other.offset + len(other.volume) - 1)
+        start = other.offset - self.offset
+        end = start + len(other.volume)
+        self.volume[start:end] += other.volume
+        self.notional[start:end] += other.notional
+        self.prints[start:end] += other.prints
+        self.total_volume += other.total_volume
+
+    def levels(self, max_levels: int = MAX_PRICE_LEVELS) -> List[LevelStat]:
+        """The heaviest bins, with share of volume and significance, highest price first"""
+        active = np.flatnonzero(self.volume)
+        if len(active) == 0:
+            return []
+        volume = self.volume[active]
+        std = volume.std()
+        z_scores = (volume - volume.mean()) / std if std > 0 else np.zeros(len(volume))
+        top = np.argsort(volume, kind="stable")[::-1][:max_levels]
+        top = top[np.argsort(active[top])[::-1]]
+        return [
+            LevelStat(
+                price=round(float((self.offset + active[i]) * self.bin_size), 2),
+                volume=int(volume[i]),
+                notional=float(self.notional[active[i]]),
+                share=float(volume[i] / self.total_volume * 100) if self.total_volume else 0.0,
+                prints=int(self.prints[active[i]]),
+                spread=round(float(self.bin_size) * 100, 2),
+                z_score=float(z_scores[i]),
+                significant=bool(z_scores[i] >= VAP_SIGNIFICANCE_Z)
+            )
+            for i in top.tolist()
+        ]
+
+class ProfileCache:
+    """Per-symbol, per-day volume profiles kept in step with the tape cache.
+
+    Each profile remembers how many of its tape's rows it has folded in, so
+    only prints appended since the last request are binned.
+    """
+    def __init__(self):
+        self.bin_sizes: Dict[str, float] = {}
+        self.profiles: Dict[tuple, tuple] = {}  # (symbol, date) -> (profile, rows consumed)
+
+    def profile(self, tape: DayTape) -> Optional[VolumeProfile]:
+        dark_prices = tape.price[tape.is_dark]
+        bin_size = self.bin_sizes.get(tape.symbol)
+        if bin_size is None:
+            if len(dark_prices) == 0:
+                return None
+            bin_size = self.bin_sizes[tape.symbol] = level_bin_size(float(np.median(dark_prices)))
+        key = (tape.symbol, tape.date)
+        profile, consumed = self.profiles.get(key, (None, 0))
+        if profile is None or consumed > len(tape):
+            profile, consumed = VolumeProfile(bin_size), 0
+        new_rows = slice(consumed, len(tape))
+        dark = tape.is_dark[new_rows]
+        profile.add(tape.price[new_rows][dark], tape.size[new_rows][dark])
+        self.profiles[key] = (profile, len(tape))
+        return profile
+
+    def window(self, tapes: List[DayTape]) -> Optional[VolumeProfile]:
+        """One profile across several days"""
+        combined = None
+        for tape in tapes:
+            profile = self.profile(tape)
+            if profile is None:
+                continue
+            if combined is None:
+                combined = VolumeProfile(profile.bin_size)
+            combined.merge(profile)
+        return combined
+
+profile_cache = ProfileCache()
+
+# Multi-day history: per-day off-exchange summaries and daily bars, kept per symbol
+HISTORY_LOOKBACK_DAYS = 30  # Calendar days backfilled on first request
+HISTORY_MAX_LOOKBACK_DAYS = 180  # Longest calendar lookback the history endpoint serves
+HISTORY_MAX_DAYS = (HISTORY_MAX_LOOKBACK_DAYS + 1) * 5 // 7 + 1  # Trading days retained: every weekday of the longest lookback
+HISTORY_BIN_MULTIPLE = 5  # Multi-day levels use coarser bins than a single session
+REACTION_DAYS = 3  # Sessions after a touch over which the reaction is measured
+
+class DarkPoolHistory:
+    """Off-exchange history for one symbol, summarised a day at a time.
+
+    Each finished day's tape is reduced once to its dark VWAP and a
+    volume-at-price profile on a per-symbol bin grid, and stored alongside the
+    daily bar. Analysis merges the stored day profiles and evaluates every
+    level against every bar as (days x levels) arrays, so a refresh only pays
+    for the days added since the last one.
+    """
+    def __init__(self, symbol: str, bin_size: Optional[float] = None, days: Optional[Dict[str, Dict[str, Any]]] = None,
+                 bars: Optional[Dict[str, Dict[str, float]]] = None, refreshed_on: Optional[str] = None):
+        self.symbol = symbol
+        self.bin_size = bin_size
+        self.days = days or {}  # ISO date -> day summary and profile bins
+        self.bars = bars or {}  # ISO date -> open/high/low/close/volume
+        self.refreshed_on = refreshed_on
+        self.analyses: Dict[str, DarkPoolHistoryResponse] = {}
+
+    def add_tape(self, tape: DayTape):
+        dark = tape.is_dark
+        prices, sizes = tape.price[dark], tape.size[dark]
+        if self.bin_size is None and len(prices):
+            self.bin_size = level_bin_size(float(np.median(prices))) * HISTORY_BIN_MULTIPLE
+        day = {"prints": int(len(prices)), "volume": int(sizes.sum()), "notional": float((prices * sizes).sum())}
+        if len(prices):
+            profile = VolumeProfile(self.bin_size)
+            profile.add(prices, sizes)
+            day.update(offset=profile.offset, bin_volume=profile.volume.tolist(),
+                       bin_notional=np.round(profile.notional, 2).tolist(), bin_prints=profile.prints.tolist())
+        self.days[tape.date.isoformat()] = day
+        self.analyses.clear()
+
+    def add_bars(self, results: List[Dict[str, Any]]):
+        for bar in results:
+            date = datetime.datetime.fromtimestamp(bar["t"] / 1000, MARKET_TZ).date().isoformat()
+            self.bars[date] = {"open": bar.get("o"), "high": bar.get("h"), "low": bar.get("l"), "close": bar.get("c"), "volume": bar.get("v")}
+        self.analyses.clear()
+
+    def prune(self):
+        for store in (self.days, self.bars):
+            for date in sorted(store)[:-HISTORY_MAX_DAYS]:
+                del store[date]
+
+    def day_profile(self, date: str) -> Optional[VolumeProfile]:
+        day = self.days.get(date)
+        if not day or "offset" not in day:
+            return None
+        profile = VolumeProfile(self.bin_size)
+        profile.offset = day["offset"]
+        profile.volume = np.array(day["bin_volume"], dtype=np.int64)
+        profile.notional = np.array(day["bin_notional"], dtype=np.float64)
+        profile.prints = np.array(day["bin_prints"], dtype=np.int64)
+        profile.total_volume = day["volume"]
+        return profile
+
+    async def refresh(self, api_key: str, lookback_days: int):
+        """Summarise finished days not seen yet and fetch the bars after the last one stored"""
+        today = datetime.datetime.now(MARKET_TZ).date()
+        wanted = [day for day in trading_days(lookback_days) if day < today]
+        missing = [day for day in wanted if day.isoformat() not in self.days]
+        if missing:
+            tapes = await asyncio.gather(*[tape_cache.get(self.symbol, day, api_key) for day in missing])
+            for tape in sorted(tapes, key=lambda tape: tape.date):
+                self.add_tape(tape)
+        if wanted:
+            start = wanted[0].isoformat()
+            if self.bars and min(self.bars) <= start:
+                start = (datetime.date.fromisoformat(max(self.bars)) + datetime.timedelta(days=1)).isoformat()
+            end = wanted[-1].isoformat()
+            if start <= end:
+                url = (f"https://api.polygon.io/v2/aggs/ticker/{self.symbol}/range/1/day/{start}/{end}"
+                       f"?adjusted=true&sort=asc&limit=5000&apiKey={api_key}")
+                data = await polygon_client.get_json(url, timeout=10.0)
+                self.add_bars((data or {}).get("results", []))
+        self.prune()
+        self.refreshed_on = today.isoformat()
+        print(f"Dark pool history for {self.symbol}: {len(missing)} new days, {len(self.days)} days stored")
+
+    def analyze(self, start: str) -> DarkPoolHistoryResponse:
+        cached = self.analyses.get(start)
+        if cached is not None:
+            return cached
+        dates = [date for date in sorted(self.days) if date >= start]
+        day_stats = []
+        window = VolumeProfile(self.bin_size) if self.bin_size else None
+        profiles = {}
+        for date in dates:
+            day = self.days[date]
+            bar = self.bars.get(date, {})
+            vwap = day["notional"] / day["volume"] if day["volume"] else None
+            close = bar.get("close")
+            day_stats.append(DarkPoolDayStat(
+                date=date,
+                prints=day["prints"],
+                dark_volume=day["volume"],
+                dark_notional=day["notional"],
+                vwap=round(vwap, 4) if vwap else None,
+                open=bar.get("open"), high=bar.get("high"), low=bar.get("low"), close=close,
+                close_vs_vwap_pct=round((close - vwap) / vwap * 100, 3) if vwap and close else None
+            ))
+            profile = self.day_profile(date)
+            if profile is not None:
+                profiles[date] = profile
+                window.merge(profile)
+
+        total_volume = sum(stat.dark_volume for stat in day_stats)
+        response = DarkPoolHistoryResponse(
+            symbol=self.symbol,
+            start=dates[0] if dates else None,
+            end=dates[-1] if dates else None,
+            vwap=round(sum(stat.dark_notional for stat in day_stats) / total_volume, 4) if total_volume else None,
+            days=day_stats,
+            levels=self.level_reactions(window.levels(), profiles, [date for date in sorted(self.bars) if date >= start]) if window else []
+        )
+        self.analyses[start] = response
+        return response
+
+    def level_reactions(self, levels: List[LevelStat], profiles: Dict[str, VolumeProfile], bar_dates: List[str]) -> List[LevelReaction]:
+        """Touch, hold and reaction statistics for every level against every later daily bar"""
+        if not levels or not bar_dates:
+            return []
+        level_prices = np.array([level.price for level in levels])
+        high = np.array([self.bars[date]["high"] for date in bar_dates], dtype=np.float64)
+        low = np.array([self.bars[date]["low"] for date in bar_dates], dtype=np.float64)
+        close = np.array([self.bars[date]["close"] for date in bar_dates], dtype=np.float64)
+        n = len(bar_dates)
+
+        # Bar index of each level's first off-exchange day; only later bars count as tests of it
+        first_seen = np.full(len(levels), n, dtype=np.int64)
+        bins = np.rint(level_prices / self.bin_size).astype(np.int64)
+        for date in sorted(profiles, reverse=True):
+            profile = profiles[date]
+            positions = bins - profile.offset
+            inside = (positions >= 0) & (positions < len(profile.volume))
+            traded = np.zeros(len(levels), dtype=bool)
+            traded[inside] = profile.volume[positions[inside]] > 0
+            first_seen[traded] = int(np.searchsorted(bar_dates, date))
+
+        tolerance = self.bin_size / 2
+        prev_close = np.concatenate([[np.nan], close[:-1]])
+        forward = np.concatenate([close[REACTION_DAYS:], np.full(min(REACTION_DAYS, n), np.nan)])
+        touched = ((low[:, None] <= level_prices + tolerance) & (high[:, None] >= level_prices - tolerance)
+                   & (np.arange(n)[:, None] > first_seen[None, :]) & ~np.isnan(prev_close)[:, None])
+        # Approached from above the level is a support test, from below a resistance test
+        from_above = prev_close[:, None] > level_prices
+        held = np.where(from_above, close[:, None] >= level_prices - tolerance, close[:, None] <= level_prices + tolerance)
+        direction = np.where(from_above, 1.0, -1.0)
+        reaction = (forward[:, None] - level_prices) / level_prices * 100 * direction
+        measured = touched & ~np.isnan(forward)[:, None]
+
+        touches = touched.sum(axis=0)
+        holds = (touched & held).sum(axis=0)
+        reaction_count = measured.sum(axis=0)
+        reaction_sum = np.where(measured, reaction, 0.0).sum(axis=0)
+        last_touch = np.where(touched.any(axis=0), n - 1 - np.argmax(touched[::-1], axis=0), -1)
+        last_close = close[-1]
+
+        return [
+            LevelReaction(
+                price=level.price,
+                volume=level.volume,
+                share=level.share,
+                significant=level.significant,
+                role="support" if level.price <= last_close else "resistance",
+                first_seen=bar_dates[first_seen[i]] if first_seen[i] < n else min(profiles),
+                touches=int(touches[i]),
+                holds=int(holds[i]),
+                hold_rate=round(float(holds[i] / touches[i]), 3) if touches[i] else None,
+                avg_reaction_pct=round(float(reaction_sum[i] / reaction_count[i]), 3) if reaction_count[i] else None,
+                last_touch=bar_dates[last_touch[i]] if last_touch[i] >= 0 else None
+            )
+            for i, level in enumerate(levels)
+        ]
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"symbol": self.symbol, "bin_size": self.bin_size, "days": self.days, "bars": self.bars, "refreshed_on": self.refreshed_on}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "DarkPoolHistory":
+        return cls(data["symbol"], data.get("bin_size"), data.get("days"), data.get("bars"), data.get("refreshed_on"))
+
+def history_storage_key(symbol: str) -> str:
+    return sanitize_key(f"dark_pool_history_{symbol}")
+
+class HistoryCache:
+    """Per-symbol histories: memory first, then JSON storage.
+
+    Missing days are ingested by one background task per symbol, at most once
+    a day or when a longer lookback is asked for, so requests answer from the
+    days already stored instead of waiting on full-day tapes.
+    """
+    def __init__(self):
+        self.histories: Dict[str, DarkPoolHistory] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def refreshing(self, symbol: str) -> bool:
+        task = self.tasks.get(symbol)
+        return task is not None and not task.done()
+
+    def get(self, symbol: str, api_key: str, lookback_days: int) -> DarkPoolHistory:
+        """The stored history, starting a background refresh if it is stale or too short"""
+        history = self.histories.get(symbol)
+        if history is None:
+            try:
+                history = DarkPoolHistory.from_json(db.storage.json.get(history_storage_key(symbol)))
+            except Exception:
+                history = DarkPoolHistory(symbol)
+            self.histories[symbol] = history
+
+        today = datetime.datetime.now(MARKET_TZ).date()
+        oldest_wanted = min(trading_days(lookback_days), default=today).isoformat()
+        covered = history.days and min(history.days) <= oldest_wanted
+        if (history.refreshed_on != today.isoformat() or not covered) and not self.refreshing(symbol):
+            self.tasks[symbol] = asyncio.create_task(self.refresh(history, api_key, lookback_days))
+        return history
+
+    async def refresh(self, history: DarkPoolHistory, api_key: str, lookback_days: int):
+        try:
+            await history.refresh(api_key, lookback_days)
+        except Exception as e:
+            print(f"Error refreshing dark pool history for {history.symbol}: {e}")
+            return
+        try:
+            db.storage.json.put(history_storage_key(history.symbol), history.to_json())
+        except Exception as e:
+            print(f"Error saving dark pool history for {history.symbol}: {e}")
+
+history_cache = HistoryCache()
+
+# REST endpoint for multi-day dark pool VWAP, volume-at-price and level reactions
+@router.get("/dark-pool/history/{symbol}")
+async def get_dark_pool_history(symbol: str, lookback_days: int = HISTORY_LOOKBACK_DAYS) -> DarkPoolHistoryResponse:
+    symbol = symbol.upper()
+    try:
+        lookback_days = max(1, min(lookback_days, HISTORY_MAX_LOOKBACK_DAYS))
+        history = history_cache.get(symbol, get_polygon_api_key(), lookback_days)
+        start = min(trading_days(lookback_days), default=datetime.datetime.now(MARKET_TZ).date()).isoformat()
+        response = history.analyze(start)
+        if history_cache.refreshing(symbol):
+            # Analyses are cached per start date, so flag a copy rather than the shared one
+            response = response.copy(update={"loading": True})
+        return response
+    except Exception as e:
+        print(f"Error analyzing dark pool history for {symbol}: {e}")
+        return DarkPoolHistoryResponse(symbol=symbol, days=[], levels=[], error=f"Failed to analyze dark pool history: {str(e)}")
+
+# Typical prices used when no quote is available
+DEFAULT_PRICES = {
+    "SPY": 400.0, "QQQ": 350.0, "AAPL": 175.0, "MSFT": 350.0, "GOOGL": 150.0,
+    "AMZN": 180.0, "TSLA": 200.0, "META": 450.0, "NVDA": 850.0, "AMD": 170.0, "INTC": 35.0
+}
+
+# Typical daily share volume used when none is available
+def estimate_volume(symbol: str) -> int:
+    if symbol in ["SPY", "QQQ"]:
+        return random.randint(50000000, 150000000)
+    elif symbol in ["AAPL", "MSFT", "TSLA"]:
+        return random.randint(30000000, 80000000)
+    elif symbol in ["AMZN", "GOOGL", "NVDA", "META"]:
+        return random.randint(10000000, 40000000)
+    return random.randint(1000000, 10000000)
+
+# Level statistics for a symbol from a volume profile
+def level_stats(symbol: str, current_price: float, prev_close: float, volume: int, profile: VolumeProfile) -> DarkPoolLevelStats:
+    return DarkPoolLevelStats(
+        ticker=symbol,
+        price=current_price,
+        prev_close=prev_close,
+        volume=volume,
+        date=datetime.date.today().isoformat(),
+        levels=profile.levels()
+    )
+
+# Level statistics for a symbol from synthetic off-exchange prints
+def generate_level_stats(symbol: str, current_price: float, prev_close: float, volume: int) -> DarkPoolLevelStats:
     # If price data is missing, use reasonable defaults
     if current_price <= 0:
-        if symbol == "SPY":
-            current_price = 400.0
-        elif symbol == "QQQ":
-            current_price = 350.0
-        elif symbol == "AAPL":
-            current_price = 175.0
-        elif symbol == "MSFT":
-            current_price = 350.0
-        elif symbol == "GOOGL":
-            current_price = 150.0
-        elif symbol == "AMZN":
-            current_price = 180.0
-        elif symbol == "TSLA":
-            current_price = 200.0
-        elif symbol == "META":
-            current_price = 450.0
-        elif symbol == "NVDA":
-            current_price = 850.0
-        else:
-            current_price = 100.0
-    
+        current_price = DEFAULT_PRICES.get(symbol, 100.0)
+
     # If prev_close is missing, estimate it
     if prev_close <= 0:
         prev_close = current_price * (1 - random.uniform(-0.02, 0.02))
-    
+
     # If volume is missing, estimate it based on typical volumes
     if volume <= 0:
-        if symbol in ["SPY", "QQQ"]:
-            volume = random.randint(50000000, 150000000)
-        elif symbol in ["AAPL", "MSFT", "TSLA"]:
-            volume = random.randint(30000000, 80000000)
-        elif symbol in ["AMZN", "GOOGL", "NVDA", "META"]:
-            volume = random.randint(10000000, 40000000)
-        else:
-            volume = random.randint(1000000, 10000000)
-    
-    # Calculate change and change percent
-    change = current_price - prev_close
-    change_percent = (change / prev_close) * 100
-    
-    # Format for display
-    price_str = f"${current_price:.2f}"
-    change_str = f"{'+' if change >= 0 else ''}{change:.2f}"
-    change_percent_str = f"{'+' if change >= 0 else ''}{change_percent:.2f}%"
-    
-    # Generate between 10-15 price levels
-    num_levels = random.randint(12, 18)
-    levels = []
-    
-    # Generate price range +/- 3% around current price
-    price_min = current_price * 0.97
-    price_max = current_price * 1.03
-    
-    # Total volume to distribute across levels (typically 20-50% of total volume)
-    dark_pool_volume_percent = random.uniform(0.2, 0.5)
-    dark_pool_volume = int(volume * dark_pool_volume_percent)
-    
-    # Track total volume for percentage calculation
-    total_level_volume = 0
-    level_volumes = []
-    
-    # Generate the price levels and random volumes
-    for i in range(num_levels):
-        # Random price within range, with more concentration around current price
-        price_offset = random.normalvariate(0, 0.7) 
-        price = current_price * (1 + price_offset * 0.01)
-        price = max(price_min, min(price_max, price))  # Keep within bounds
-        
-        # Random volume for this level
-        level_volume = int(random.uniform(0.02, 0.12) * dark_pool_volume)
-        level_volumes.append(level_volume)
-        total_level_volume += level_volume
-    
-    # Adjust to make total = 100%
-    adjusted_volumes = [int(v * dark_pool_volume / total_level_volume) for v in level_volumes]
-    
-    # Create the price levels
-    for i in range(num_levels):
-        # Random price within range, with more concentration around current price
-        price_offset = random.normalvariate(0, 0.7) 
-        price = current_price * (1 + price_offset * 0.01)
-        price = max(price_min, min(price_max, price))  # Keep within bounds
-        
-        # Volume from adjusted list
-        level_volume = adjusted_volumes[i]
-        
-        # Calculate notional value
-        notional = price * level_volume
-        
-        # Calculate percentage of total volume
-        percent = (level_volume / dark_pool_volume) * 100
-        
-        # Random spread (higher for higher volume levels)
-        spread = random.randint(20, 55)
-        
-        # Highlight some levels (based on volume - higher volume more likely to be highlighted)
-        highlight_probability = min(0.8, percent / 10)  # Higher percentage = higher chance
-        is_highlighted = random.random() < highlight_probability
-        
-        level = PriceLevel(
-            price=f"{price:.2f}",
-            volume=format_number(level_volume),
-            notional=format_dollar(notional),
-            percentage=f"{percent:.2f}%",
-            spread=str(spread),
-            isHighlighted=is_highlighted
-        )
-        
-        levels.append(level)
-    
-    # Sort by price (descending)
-    levels.sort(key=lambda x: float(x.price), reverse=True)
-    
-    # Get current date
-    current_date = datetime.datetime.now().strftime("%m/%d/%y")
-    
-    return DarkPoolLevels(
-        ticker=symbol,
-        price=price_str,
-        change=change_str,
-        changePercent=change_percent_str,
-        avgDailyVolume=format_number(volume),
-        date=current_date,
-        levels=levels
-    )
+        volume = estimate_volume(symbol)
+
+    # Typically 20-50% of volume prints off-exchange; spread it over prints clustered
+    # around the current price (within +/- 3%) and bin them like real ones
+    rng = np.random.default_rng()
+    dark_pool_volume = int(volume * rng.uniform(0.2, 0.5))
+    prices = np.clip(current_price * (1 + rng.normal(0, 0.007, 500)), current_price * 0.97, current_price * 1.03)
+    weights = rng.lognormal(0, 1, 500)
+    sizes = np.maximum(1, (weights / weights.sum() * dark_pool_volume)).astype(np.int64)
+
+    profile = VolumeProfile(level_bin_size(current_price) * 5)
+    profile.add(prices, sizes)
+    return level_stats(symbol, current_price, prev_close, volume, profile)
 
 # Generate synthetic dark pool and block trade data
-def generate_synthetic_data(symbol: str, show_dark_pool: bool, show_block_trades: bool, min_value: int, lookback_days: int = 7) -> DarkPoolResponse:
-    # For ALL tickers view, use a mix of popular stocks instead of ALL as the symbol
-    use_mixed_symbols = symbol == "ALL"
-    # Try to get a price estimate from common tickers
-    current_price = 0
-    if symbol == "SPY":
-        current_price = 400.0 + random.uniform(-10, 10)
-    elif symbol == "QQQ":
-        current_price = 350.0 + random.uniform(-8, 8)
-    elif symbol == "AAPL":
-        current_price = 175.0 + random.uniform(-5, 5)
-    elif symbol == "MSFT":
-        current_price = 350.0 + random.uniform(-8, 8)
-    elif symbol == "GOOGL":
-        current_price = 150.0 + random.uniform(-4, 4)
-    elif symbol == "AMZN":
-        current_price = 180.0 + random.uniform(-6, 6)
-    elif symbol == "TSLA":
-        current_price = 200.0 + random.uniform(-10, 10)
-    elif symbol == "META":
-        current_price = 450.0 + random.uniform(-10, 10)
-    elif symbol == "NVDA":
-        current_price = 850.0 + random.uniform(-20, 20)
-    else:
-        current_price = 100.0 + random.uniform(-5, 5)
-    
+def generate_synthetic_data(symbol: str, show_dark_pool: bool, show_block_trades: bool, min_value: int, lookback_days: int = 7,
+                            formatted: bool = True, limit: int = 20) -> DarkPoolResponse:
+    # Try to get a price estimate from common tickers (within about 2.5%)
+    base_price = DEFAULT_PRICES.get(symbol, 100.0)
+    current_price = base_price * (1 + random.uniform(-0.025, 0.025))
     prev_close = current_price * (1 - random.uniform(-0.02, 0.02))
-    
+
     # Estimate volume based on ticker
-    volume = 0
-    if symbol in ["SPY", "QQQ"]:
-        volume = random.randint(50000000, 150000000)
-    elif symbol in ["AAPL", "MSFT", "TSLA"]:
-        volume = random.randint(30000000, 80000000)
-    elif symbol in ["AMZN", "GOOGL", "NVDA", "META"]:
-        volume = random.randint(10000000, 40000000)
-    else:
-        volume = random.randint(1000000, 10000000)
-    
-    # Generate between 20-30 trades
-    num_trades = random.randint(20, 30)
-    dark_pool_trades = []
-    
+    volume = estimate_volume(symbol)
+
+    # Generate between 20-30 trades, or up to the requested limit
+    num_trades = max(random.randint(20, 30), limit)
+    prints = []
+
     # Get current date and time
     now = datetime.datetime.now()
-    current_date = now.strftime("%m/%d/%y")
-    
-    # Calculate the oldest date based on lookback_days
-    oldest_date = now - datetime.timedelta(days=lookback_days)
-    
+
     # Generate trades
-    for i in range(1, num_trades + 1):
+    for _ in range(num_trades):
         # Random time within the lookback period
         random_days_ago = random.randint(0, lookback_days)
         hours_ago = random.randint(0, 23) if random_days_ago > 0 else random.randint(0, now.hour)
         minutes_ago = random.randint(0, 59)
-        
         trade_time = now - datetime.timedelta(days=random_days_ago, hours=hours_ago, minutes=minutes_ago)
-        time_str = trade_time.strftime("%H:%M:%S")
-        date_str = trade_time.strftime("%m/%d/%y")
-        
+
         # Randomly decide if this is a dark pool or regular block trade
         is_dark_pool = random.random() < 0.6  # 60% dark pool, 40% block
-        
+
         # Skip if filtered out
         if (is_dark_pool and not show_dark_pool) or \
            (not is_dark_pool and not show_block_trades):
             continue
-        
+
         # Generate trade size (larger for dark pool)
         if is_dark_pool:
             size = random.randint(50000, 800000)
         else:
             size = random.randint(10000, 300000)
-        
+
         # Slight price variation
         price = current_price * (1 + random.uniform(-0.005, 0.005))
-        
-        # Calculate value
-        value = price * size
-        
+
         # Skip if value is below minimum
+        value = price * size
         if value < min_value:
             continue
-        
-        # Create trade
-        # If ALL tickers view, assign a real stock symbol instead of ALL
-        trade_symbol = symbol
-        if use_mixed_symbols:
-            # Choose from popular stocks
-            popular_stocks = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "META", "NVDA", "AMD", "INTC", "SPY", "QQQ"]
-            trade_symbol = random.choice(popular_stocks)
-            
-            # Adjust price based on the selected symbol
-            if trade_symbol == "SPY":
-                price = 400.0 + random.uniform(-10, 10)
-            elif trade_symbol == "QQQ":
-                price = 350.0 + random.uniform(-8, 8)
-            elif trade_symbol == "AAPL":
-                price = 175.0 + random.uniform(-5, 5)
-            elif trade_symbol == "MSFT":
-                price = 350.0 + random.uniform(-8, 8)
-            elif trade_symbol == "GOOGL":
-                price = 150.0 + random.uniform(-4, 4)
-            elif trade_symbol == "AMZN":
-                price = 180.0 + random.uniform(-6, 6)
-            elif trade_symbol == "TSLA":
-                price = 200.0 + random.uniform(-10, 10)
-            elif trade_symbol == "META":
-                price = 450.0 + random.uniform(-10, 10)
-            elif trade_symbol == "NVDA":
-                price = 850.0 + random.uniform(-20, 20)
-            elif trade_symbol == "AMD":
-                price = 170.0 + random.uniform(-5, 5)
-            elif trade_symbol == "INTC":
-                price = 35.0 + random.uniform(-2, 2)
-            
-            # Recalculate value with the new price
-            value = price * size
-        
-        dark_pool_trade = DarkPoolTrade(
-            id=i,
-            time=time_str,
-            date=date_str,  # Use the correct date_str variable
-            symbol=trade_symbol,
-            shares=format_number(size),
-            price=f"${price:.2f}",
-            value=format_dollar(value),
-            type="DARK" if is_dark_pool else "BLOCK"
-        )
-        
-        dark_pool_trades.append(dark_pool_trade)
-    
+
+        prints.append(DarkPoolPrint(
+            ts_ns=int(trade_time.timestamp() * 1_000_000_000),
+            symbol=symbol,
+            price=round(price, 2),
+            size=size,
+            notional=value,
+            type="DARK" if is_dark_pool else "BLOCK",
+            is_block=True  # Synthetic prints are all block-sized
+        ))
+
     # Sort by time (most recent first)
-    dark_pool_trades.sort(key=lambda x: x.time, reverse=True)
-    
-    # Generate price levels
-    price_levels = generate_price_levels(symbol, current_price, prev_close, volume)
-    
-    return DarkPoolResponse(
-        trades=dark_pool_trades,
-        levels=price_levels
-    )
+    prints.sort(key=lambda p: p.ts_ns, reverse=True)
+    prints = prints[:limit]
+
+    return dark_pool_response(prints, generate_level_stats(symbol, current_price, prev_close, volume), formatted)
@@ -1,6 +1,8 @@
 import databutton as db
 import json
 import requests
+import asyncio
+import time
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
@@ -59,6 +61,124 @@ def get_polygon_api_key():
         print(f"Error getting Polygon API key: {e}")
         raise HTTPException(status_code=500, detail="Could not retrieve API credentials")
 
+# Token bucket shared by every caller of the pooled client
+class RateLimiter:
+    """Token bucket that spaces requests to stay under a requests-per-second budget"""
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Hold back every caller, e.g. after the API answers 429"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+# Pooled HTTP client for Polygon REST calls made from async handlers
+class PolygonAsyncClient:
+    """Runs blocking requests calls on worker threads through one pooled session.
+
+    A semaphore bounds in-flight requests, a shared token bucket keeps the
+    request rate under the plan's limit, and a 429 backs the whole pool off
+    (honouring Retry-After) before the call is retried. A client with a
+    parent is a smaller budget inside the parent's: each call takes a token
+    from both buckets, so bulk jobs can't crowd out interactive requests.
+    """
+    def __init__(self, max_concurrency: int = 16, requests_per_second: float = 50.0, max_retries: int = 3,
+                 parent: Optional["PolygonAsyncClient"] = None):
+        self.parent = parent
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.limiter = RateLimiter(requests_per_second)
+        self.max_retries = max_retries
+
+    async def get(self, url: str, timeout: float = 10.0) -> Optional[requests.Response]:
+        """GET a URL, retrying rate-limited and failed calls with backoff"""
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            if self.parent is not None:
+                await self.parent.limiter.acquire()
+            try:
+                async with self.semaphore:
+                    response = await asyncio.to_thread(self.session.get, url, timeout=timeout)
+            except requests.RequestException as e:
+                print(f"Polygon request failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+            if response.status_code == 429:
+                retry_after = float(response.headers.get("Retry-After") or 2 ** attempt)
+                self.limiter.pause(retry_after)
+                if self.parent is not None:
+                    self.parent.limiter.pause(retry_after)
+                continue
+            return response
+        return None
+
+    async def get_json(self, url: str, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """GET a URL and decode JSON, None on any non-200 response"""
+        response = await self.get(url, timeout=timeout)
+        if response is None or response.status_code != 200:
+            if response is not None:
+                print(f"Polygon API error: {response.status_code} for {url.split('?')[0]}")
+            return None
+        return response.json()
+
+    async def gather_json(self, urls: List[str], timeout: float = 10.0) -> List[Optional[Dict[str, Any]]]:
+        """Fetch many URLs concurrently, results in the same order"""
+        return await asyncio.gather(*[self.get_json(url, timeout=timeout) for url in urls])
+
+    async def paginate(self, url: str, api_key: str, max_pages: int = 100, timeout: float = 10.0) -> List[Dict[str, Any]]:
+        """Follow Polygon next_url cursors and collect every page's results"""
+        results = []
+        for _ in range(max_pages):
+            data = await self.get_json(url, timeout=timeout)
+            if not data:
+                break
+            results.extend(data.get("results", []))
+            next_url = data.get("next_url")
+            if not next_url:
+                break
+            url = f"{next_url}&apiKey={api_key}"
+        return results
+
+    async def iter_pages(self, url: str, api_key: str, max_pages: int = 100, timeout: float = 10.0):
+        """Follow next_url cursors, yielding each page's results as it arrives.
+
+        Unlike paginate, a failed page or hitting max_pages raises, so callers
+        can tell a complete scan from a truncated one.
+        """
+        for _ in range(max_pages):
+            data = await self.get_json(url, timeout=timeout)
+            if data is None:
+                raise Exception(f"Polygon page request failed for {url.split('?')[0]}")
+            yield data.get("results", [])
+            next_url = data.get("next_url")
+            if not next_url:
+                return
+            url = f"{next_url}&apiKey={api_key}"
+        raise Exception(f"Stopped after {max_pages} pages for {url.split('?')[0]}")
+
+# Shared client instance
+polygon_client = PolygonAsyncClient()
+
 # Function to get historical bars from Polygon API
 def fetch_historical_bars_from_polygon(
     symbol: str,
@@ -0,0 +1,532 @@
+from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+import databutton as db
+import asyncio
+import datetime
+import io
+import time
+import numpy as np
+from zoneinfo import ZoneInfo
+from typing import Dict, List, Optional, Any
+from app.apis.market_data import polygon_client
+
+router = APIRouter()
+
+# Models for API responses
+class BarPanelStatus(BaseModel):
+    tickers: int
+    days: int
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+    refreshing: bool
+    last_refresh_seconds: Optional[float] = None
+
+class TickerIndicators(BaseModel):
+    ticker: str
+    timeframe: str
+    date: Optional[str] = None  # Date of the latest bar the values are for
+    values: Dict[str, Any]
+    error: Optional[str] = None
+
+# Storage key for the persisted daily bar panel
+BAR_PANEL_KEY = "market_daily_bar_panel"
+
+# Trading days of daily bars kept (about 17 months, enough for every weekly indicator window)
+BAR_HISTORY_DAYS = 360
+
+MARKET_TZ = ZoneInfo("America/New_York")
+GROUPED_BARS_READY_HOUR = 17  # Eastern; today's grouped bars are complete after the close
+EPOCH = datetime.date(1970, 1, 1)
+
+# Screener timeframes and the bar size their indicators are computed on
+TIMEFRAME_TIMESPANS = {"1d": "day", "1w": "week", "1m": "month", "3m": "month", "1y": "year"}
+
+# Indicator windows
+RSI_WINDOW = 14
+ATR_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_STDS = 20, 2.0
+KELTNER_WINDOW, KELTNER_ATRS = 20, 2.0
+STOCHASTIC_WINDOW, STOCHASTIC_SMOOTHING = 14, 3
+BANDWIDTH_WINDOW = 50  # Bollinger bandwidth average that squeezes and expansions are measured against
+
+# Bars a timespan needs before every indicator and signal is defined; the longest is the bandwidth
+# average over Bollinger bandwidths. Timespans the panel can't cover this far back (month and year
+# bars would need decades of daily history) get no frame, and the screener uses Polygon's values.
+INDICATOR_MIN_BARS = max(BOLLINGER_WINDOW + BANDWIDTH_WINDOW - 1, 50 + 5, MACD_SLOW + MACD_SIGNAL, RSI_WINDOW + 1)
+
+# Get Polygon API key
+def get_polygon_api_key():
+    api_key = db.secrets.get("POLYGON_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Polygon API key not found")
+    return api_key
+
+class BarPanel:
+    """Daily OHLCV bars for the whole US market as 2-D (ticker x day) arrays.
+
+    Filled from Polygon's grouped daily bars, one request per trading day for
+    every ticker, so the panel costs a call per day rather than per ticker.
+    Missing bars are NaN. New days are merged in as they become available and
+    the panel is persisted, so only days not seen before are fetched.
+    """
+    def __init__(self):
+        self.tickers: List[str] = []
+        self.ticker_index: Dict[str, int] = {}
+        self.dates = np.zeros(0, dtype=np.int32)  # Days since the epoch, ascending
+        self.open = np.zeros((0, 0), dtype=np.float32)
+        self.high = np.zeros((0, 0), dtype=np.float32)
+        self.low = np.zeros((0, 0), dtype=np.float32)
+        self.close = np.zeros((0, 0), dtype=np.float32)
+        self.volume = np.zeros((0, 0), dtype=np.float32)
+        self.empty_dates: set = set()  # Weekdays with no bars (holidays), not fetched again
+        self.version = 0
+        self.refresh_task: Optional[asyncio.Task] = None
+        self.last_refresh_seconds: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def date(self, column: int) -> datetime.date:
+        return EPOCH + datetime.timedelta(days=int(self.dates[column]))
+
+    def merge(self, days: Dict[datetime.date, List[Dict[str, Any]]]):
+        """Merge grouped daily results into the panel, keeping the latest BAR_HISTORY_DAYS days"""
+        self.apply(self.merged(days))
+
+    def merged(self, days: Dict[datetime.date, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """The panel's fields with grouped daily results merged in, built without changing the panel"""
+        update: Dict[str, Any] = {"empty_dates": self.empty_dates | {(day - EPOCH).days for day, results in days.items() if not results}}
+        days = {(day - EPOCH).days: results for day, results in days.items() if results}
+        if not days:
+            return update
+
+        known = set(self.ticker_index)
+        new_tickers = sorted({bar["T"] for results in days.values() for bar in results if bar.get("T") and bar["T"] not in known})
+        tickers = self.tickers + new_tickers
+        index = {ticker: row for row, ticker in enumerate(tickers)}
+        dates = np.array(sorted(set(self.dates.tolist()) | set(days)), dtype=np.int32)[-BAR_HISTORY_DAYS:]
+
+        columns = {}
+        old_columns = np.searchsorted(dates, self.dates)
+        kept = (old_columns < len(dates)) & (dates[np.minimum(old_columns, len(dates) - 1)] == self.dates) if len(dates) else np.zeros(0, dtype=bool)
+        for field in ("open", "high", "low", "close", "volume"):
+            column = np.full((len(tickers), len(dates)), np.nan, dtype=np.float32)
+            old = getattr(self, field)
+            if old.size:
+                column[:old.shape[0], old_columns[kept]] = old[:, kept]
+            columns[field] = column
+
+        for day, results in days.items():
+            col = int(np.searchsorted(dates, day))
+            if col >= len(dates) or dates[col] != day:
+                continue  # Older than the retained window
+            results = [bar for bar in results if bar.get("T") in index]
+            rows = np.array([index[bar["T"]] for bar in results], dtype=np.int64)
+            for field, key in (("open", "o"), ("high", "h"), ("low", "l"), ("close", "c"), ("volume", "v")):
+                columns[field][rows, col] = np.array([bar.get(key, np.nan) for bar in results], dtype=np.float32)
+
+        update.update(tickers=tickers, ticker_index=index, dates=dates, **columns)
+        return update
+
+    def apply(self, update: Dict[str, Any]):
+        """Swap in merged fields all at once, so readers never see a half-merged panel"""
+        for field, value in update.items():
+            setattr(self, field, value)
+        if "dates" in update:
+            self.version += 1
+
+    def missing_dates(self) -> List[datetime.date]:
+        """Weekdays in the history window with neither bars nor a known empty result"""
+        now = datetime.datetime.now(MARKET_TZ)
+        last = now.date() if now.hour >= GROUPED_BARS_READY_HOUR else now.date() - datetime.timedelta(days=1)
+        # Calendar span that covers BAR_HISTORY_DAYS trading days
+        first = last - datetime.timedelta(days=int(BAR_HISTORY_DAYS * 7 / 5) + 10)
+        have = set(self.dates.tolist()) | self.empty_dates
+        if len(self.dates):
+            first = max(first, self.date(0))
+        days = [first + datetime.timedelta(days=offset) for offset in range((last - first).days + 1)]
+        return [day for day in days if day.weekday() < 5 and (day - EPOCH).days not in have]
+
+    def save(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, tickers=np.array(self.tickers), dates=self.dates, open=self.open, high=self.high, low=self.low,
+            close=self.close, volume=self.volume, empty_dates=np.array(sorted(self.empty_dates), dtype=np.int32)
+        )
+        db.storage.binary.put(BAR_PANEL_KEY, buffer.getvalue())
+
+    def load(self) -> bool:
+        """Load the persisted panel, if there is one"""
+        try:
+            data = np.load(io.BytesIO(db.storage.binary.get(BAR_PANEL_KEY)))
+            self.tickers = data["tickers"].tolist()
+            self.ticker_index = {ticker: row for row, ticker in enumerate(self.tickers)}
+            self.dates = data["dates"]
+            for field in ("open", "high", "low", "close", "volume"):
+                setattr(self, field, data[field])
+            self.empty_dates = set(data["empty_dates"].tolist())
+            self.version += 1
+            print(f"Loaded daily bars for {len(self.tickers)} tickers over {len(self.dates)} days from storage")
+            return True
+        except Exception as e:
+            print(f"No stored daily bar panel available: {e}")
+            return False
+
+    async def refresh(self):
+        """Fetch grouped daily bars for every missing day concurrently and merge them"""
+        started = time.time()
+        api_key = get_polygon_api_key()
+        missing = self.missing_dates()
+        if not missing:
+            return
+        urls = [f"https://api.polygon.io/v2/aggs/grouped/locale/us/market/stocks/{day.isoformat()}?adjusted=true&apiKey={api_key}"
+                for day in missing]
+        pages = await polygon_client.gather_json(urls, timeout=30.0)
+        # Failed requests are left missing and retried on the next refresh; merging and saving run on a worker thread
+        days = {day: (page.get("results") or []) for day, page in zip(missing, pages) if page is not None}
+        self.apply(await asyncio.to_thread(self.merged, days))
+        self.last_refresh_seconds = time.time() - started
+        print(f"Merged grouped daily bars for {len(missing)} days in {self.last_refresh_seconds:.1f}s; "
+              f"panel holds {len(self.tickers)} tickers over {len(self.dates)} days")
+        try:
+            await asyncio.to_thread(self.save)
+        except Exception as e:
+            print(f"Error saving daily bar panel: {e}")
+
+    def ensure_fresh(self):
+        """Start a background refresh if there are days to fetch"""
+        if self.refresh_task is not None and not self.refresh_task.done():
+            return
+        if not self.missing_dates():
+            return
+        async def run():
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing daily bar panel: {e}")
+        self.refresh_task = asyncio.create_task(run())
+
+    def periods(self, timespan: str) -> int:
+        """Number of day, week, month or year bars the panel spans"""
+        if timespan == "day":
+            return len(self.dates)
+        if timespan == "week":
+            return len(np.unique((self.dates.astype(np.int64) + 3) // 7))
+        days = self.dates.astype("datetime64[D]")
+        return len(np.unique(days.astype("datetime64[M]" if timespan == "month" else "datetime64[Y]")))
+
+    def resample(self, timespan: str) -> tuple:
+        """(open, high, low, close, volume, period end columns) at day, week, month or year bars"""
+        if timespan == "day" or len(self.dates) == 0:
+            return self.open, self.high, self.low, self.close, self.volume, np.arange(len(self.dates))
+        days = [self.date(column) for column in range(len(self.dates))]
+        if timespan == "week":
+            periods = (self.dates.astype(np.int64) + 3) // 7  # Weeks starting Monday
+        elif timespan == "month":
+            periods = np.array([day.year * 12 + day.month for day in days])
+        else:
+            periods = np.array([day.year for day in days])
+        starts = np.flatnonzero(np.diff(periods, prepend=periods[0] - 1))
+        ends = np.append(starts[1:], len(periods)) - 1
+        traded = np.add.reduceat(~np.isnan(self.close), starts, axis=1) > 0
+        blank = lambda values: np.where(traded, values, np.nan).astype(np.float32)
+        return (
+            blank(backward_fill(self.open)[:, starts]),
+            blank(np.fmax.reduceat(self.high, starts, axis=1)),
+            blank(np.fmin.reduceat(self.low, starts, axis=1)),
+            blank(forward_fill(self.close)[:, ends]),
+            blank(np.add.reduceat(np.nan_to_num(self.volume), starts, axis=1)),
+            ends
+        )
+
+# Vectorized indicator math over (ticker x time) arrays, time along axis 1
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    return np.take_along_axis(values, index, axis=1)
+
+def backward_fill(values: np.ndarray) -> np.ndarray:
+    return forward_fill(values[:, ::-1])[:, ::-1]
+
+def shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    shifted = np.full(values.shape, np.nan, dtype=np.float64)
+    if periods < values.shape[1]:
+        shifted[:, periods:] = values[:, :values.shape[1] - periods]
+    return shifted
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean over the trailing window, NaN until the window holds only values"""
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=1, dtype=np.float64)
+    counts = np.cumsum(valid, axis=1)
+    sums = np.concatenate([np.zeros((values.shape[0], 1)), sums], axis=1)
+    counts = np.concatenate([np.zeros((values.shape[0], 1), dtype=counts.dtype), counts], axis=1)
+    result = np.full(values.shape, np.nan, dtype=np.float64)
+    if window <= values.shape[1]:
+        window_sums = sums[:, window:] - sums[:, :-window]
+        full = (counts[:, window:] - counts[:, :-window]) == window
+        result[:, window - 1:] = np.where(full, window_sums / window, np.nan)
+    return result
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    mean = rolling_mean(values, window)
+    variance = rolling_mean(np.asarray(values, dtype=np.float64) ** 2, window) - mean ** 2
+    return np.sqrt(np.maximum(variance, 0.0))
+
+def rolling_extreme(values: np.ndarray, window: int, reducer=np.fmax) -> np.ndarray:
+    """Trailing max (or min) over the window, by folding shifted views"""
+    result = np.full(values.shape, np.nan, dtype=np.float64)
+    if window > values.shape[1]:
+        return result
+    length = values.shape[1] - window + 1
+    extreme = np.asarray(values[:, window - 1:], dtype=np.float64)
+    for offset in range(1, window):
+        extreme = reducer(extreme, values[:, window - 1 - offset:window - 1 - offset + length])
+    result[:, window - 1:] = extreme
+    return result
+
+def ema(values: np.ndarray, window: int, wilder: bool = False) -> np.ndarray:
+    """Exponential average seeded at each series' first value, NaN until window values were seen"""
+    alpha = 1.0 / window if wilder else 2.0 / (window + 1)
+    result = np.full(values.shape, np.nan, dtype=np.float64)
+    state = np.full(values.shape[0], np.nan, dtype=np.float64)
+    seen = np.zeros(values.shape[0], dtype=np.int64)
+    for column in range(values.shape[1]):
+        current = values[:, column]
+        valid = ~np.isnan(current)
+        state = np.where(valid & np.isnan(state), current, state)
+        state = np.where(valid, state + alpha * (current - state), state)
+        seen += valid
+        result[:, column] = np.where(seen >= window, state, np.nan)
+    return result
+
+def rsi(close: np.ndarray, window: int = RSI_WINDOW) -> np.ndarray:
+    delta = close - shift(close)
+    average_gain = ema(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), window, wilder=True)
+    average_loss = ema(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), window, wilder=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(average_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + average_gain / average_loss))
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = ATR_WINDOW) -> np.ndarray:
+    previous_close = shift(close)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    return ema(true_range, window, wilder=True)
+
+def crossed(fast: np.ndarray, slow: np.ndarray) -> tuple:
+    """(crossed above, crossed below) on the latest bar, from the last two columns"""
+    if fast.shape[1] < 2:
+        none = np.zeros(fast.shape[0], dtype=bool)
+        return none, none
+    now, before = fast[:, -1] - slow[:, -1], fast[:, -2] - slow[:, -2]
+    return (before <= 0) & (now > 0), (before >= 0) & (now < 0)
+
+class IndicatorFrame:
+    """Latest indicator values and signals for every ticker at one timespan"""
+    def __init__(self, panel: BarPanel, timespan: str):
+        self.timespan = timespan
+        self.version = panel.version
+        self.ticker_index = panel.ticker_index
+        open_, high, low, close, volume, ends = panel.resample(timespan)
+        self.date = panel.date(int(ends[-1])).isoformat() if len(ends) else None
+        # Tickers without a bar in the latest period (delisted, halted) are left out
+        self.has_bar = ~np.isnan(close[:, -1]) if close.shape[1] else np.zeros(len(panel), dtype=bool)
+        high, low, close = forward_fill(high), forward_fill(low), forward_fill(close)
+
+        sma20, sma50 = rolling_mean(close, 20), rolling_mean(close, 50)
+        ema20 = ema(close, KELTNER_WINDOW)
+        average_range = atr(high, low, close)
+        macd_line = ema(close, MACD_FAST) - ema(close, MACD_SLOW)
+        macd_signal_line = ema(macd_line, MACD_SIGNAL)
+        middle = rolling_mean(close, BOLLINGER_WINDOW)
+        deviation = rolling_std(close, BOLLINGER_WINDOW)
+        upper, lower = middle + BOLLINGER_STDS * deviation, middle - BOLLINGER_STDS * deviation
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bandwidth = (upper - lower) / middle
+            highest = rolling_extreme(high, STOCHASTIC_WINDOW, np.fmax)
+            lowest = rolling_extreme(low, STOCHASTIC_WINDOW, np.fmin)
+            stoch_k = np.where(highest > lowest, (close - lowest) / (highest - lowest) * 100, 50.0)
+        stoch_k = np.where(np.isnan(highest), np.nan, stoch_k)
+        stoch_d = rolling_mean(stoch_k, STOCHASTIC_SMOOTHING)
+
+        last = lambda values: values[:, -1] if values.shape[1] else np.full(len(panel), np.nan)
+        previous = lambda values: values[:, -2] if values.shape[1] > 1 else np.full(len(panel), np.nan)
+        self.values: Dict[str, np.ndarray] = {
+            "close": last(close),
+            "rsi": last(rsi(close)),
+            "sma20": last(sma20),
+            "sma50": last(sma50),
+            "ema20": last(ema20),
+            "atr": last(average_range),
+            "macd": last(macd_line),
+            "macd_signal_line": last(macd_signal_line),
+            "macd_histogram": last(macd_line - macd_signal_line),
+            "bollinger_upper": last(upper),
+            "bollinger_middle": last(middle),
+            "bollinger_lower": last(lower),
+            "keltner_upper": last(ema20 + KELTNER_ATRS * average_range),
+            "keltner_lower": last(ema20 - KELTNER_ATRS * average_range),
+            "stochastic": last(stoch_k),
+            "stochastic_d": last(stoch_d),
+        }
+        v = self.values
+
+        # Signals, in the vocabulary of the screener filters
+        sma_up, sma_down = crossed(sma20, sma50)
+        self.signals: Dict[str, np.ndarray] = {}
+        self.signals["sma_status"] = np.select(
+            [sma_up, sma_down, v["sma20"] > v["sma50"], v["sma20"] < v["sma50"]],
+            ["crossing_above", "crossing_below", "above", "below"], default="")
+
+        macd_up, macd_down = crossed(macd_line, macd_signal_line)
+        histogram = v["macd_histogram"]
+        self.signals["macd_signal"] = np.select(
+            [macd_up, macd_down, histogram > 0, histogram < 0],
+            ["bullish_crossover", "bearish_crossover", "bullish", "bearish"], default="")
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent_b = (v["close"] - v["bollinger_lower"]) / (v["bollinger_upper"] - v["bollinger_lower"])
+            width_ratio = last(bandwidth) / last(rolling_mean(bandwidth, BANDWIDTH_WINDOW))
+        self.signals["bollinger_position"] = np.select(
+            [percent_b >= 0.8, percent_b <= 0.2, (percent_b > 0.2) & (percent_b < 0.8)], ["upper", "lower", "middle"], default="")
+        self.signals["bollinger_width"] = np.select([width_ratio <= 0.75, width_ratio >= 1.25], ["squeeze", "expansion"], default="")
+
+        # Channel trend (ATR change over the last bar) takes precedence over the position, as before
+        with np.errstate(divide="ignore", invalid="ignore"):
+            atr_change = v["atr"] / previous(average_range) - 1
+        self.signals["keltner_position"] = np.select(
+            [atr_change <= -0.05, atr_change >= 0.05, v["close"] > v["keltner_upper"], v["close"] < v["keltner_lower"],
+             ~np.isnan(v["keltner_upper"])],
+            ["narrowing", "widening", "above_upper", "below_lower", "within"], default="")
+
+        stoch_up, stoch_down = crossed(stoch_k, stoch_d)
+        self.signals["stochastic_signal"] = np.select(
+            [stoch_up, stoch_down, v["stochastic"] <= 20, v["stochastic"] >= 80],
+            ["bullish_crossover", "bearish_crossover", "oversold", "overbought"], default="")
+
+        sma50_rising = v["sma50"] > (sma50[:, -6] if sma50.shape[1] > 5 else np.nan)
+        sma50_falling = v["sma50"] < (sma50[:, -6] if sma50.shape[1] > 5 else np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = np.abs(v["close"] / v["sma50"] - 1)
+        self.signals["trend"] = np.select(
+            [(v["close"] > v["sma20"]) & (v["sma20"] > v["sma50"]) & sma50_rising,
+             (v["close"] < v["sma20"]) & (v["sma20"] < v["sma50"]) & sma50_falling,
+             distance < 0.02,
+             v["close"] > v["sma50"],
+             v["close"] < v["sma50"]],
+            ["strong_uptrend", "strong_downtrend", "sideways", "weak_uptrend", "weak_downtrend"], default="")
+
+    def row(self, ticker: str) -> Optional[int]:
+        row = self.ticker_index.get(ticker)
+        if row is None or row >= len(self.has_bar) or not self.has_bar[row]:
+            return None
+        return row
+
+    def lookup(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """Latest values and signals for a ticker, None when it has no recent bar"""
+        row = self.row(ticker)
+        if row is None:
+            return None
+        result: Dict[str, Any] = {name: (None if np.isnan(values[row]) else round(float(values[row]), 4))
+                                  for name, values in self.values.items()}
+        result.update({name: (str(values[row]) or None) for name, values in self.signals.items()})
+        return result
+
+class IndicatorEngine:
+    """Indicator frames per timespan, recomputed only when the bar panel changes"""
+    def __init__(self, panel: BarPanel):
+        self.panel = panel
+        self.frames: Dict[str, IndicatorFrame] = {}
+        self.lock = asyncio.Lock()
+
+    def build(self, timespan: str) -> IndicatorFrame:
+        started = time.time()
+        frame = self.frames[timespan] = IndicatorFrame(self.panel, timespan)
+        print(f"Computed {timespan} indicators for {len(self.panel)} tickers in {time.time() - started:.2f}s")
+        return frame
+
+    def supports(self, timespan: str) -> bool:
+        """True when the panel holds enough bars at the timespan for every indicator window"""
+        return len(self.panel) > 0 and self.panel.periods(timespan) >= INDICATOR_MIN_BARS
+
+    def is_current(self, timespan: str) -> bool:
+        frame = self.frames.get(timespan)
+        return frame is not None and frame.version == self.panel.version
+
+    async def prepare(self, timeframe: Optional[str]) -> Optional[IndicatorFrame]:
+        """Build a stale frame once, on a worker thread, so lookups after it are cached.
+
+        None when the panel is too short for the timeframe; callers fall back to Polygon's indicators.
+        """
+        timespan = TIMEFRAME_TIMESPANS.get(timeframe or "1d", "day")
+        if not self.supports(timespan):
+            return None
+        async with self.lock:
+            if not self.is_current(timespan):
+                await asyncio.to_thread(self.build, timespan)
+        return self.frames[timespan]
+
+    def frame(self, timeframe: Optional[str]) -> Optional[IndicatorFrame]:
+        """The current frame if one is built; never builds on the caller's thread, use prepare for that"""
+        timespan = TIMEFRAME_TIMESPANS.get(timeframe or "1d", "day")
+        return self.frames[timespan] if self.supports(timespan) and self.is_current(timespan) else None
+
+    def latest(self, ticker: str, timeframe: Optional[str]) -> Optional[Dict[str, Any]]:
+        frame = self.frame(timeframe)
+        return frame.lookup(ticker) if frame is not None else None
+
+# Global bar panel and engine, seeded from storage at startup
+bar_panel = BarPanel()
+bar_panel.load()
+indicator_engine = IndicatorEngine(bar_panel)
+
+def get_indicator_engine() -> Optional[IndicatorEngine]:
+    """The engine, or None (after starting a background load) while the panel is empty"""
+    try:
+        bar_panel.ensure_fresh()
+    except Exception as e:
+        print(f"Error scheduling daily bar refresh: {e}")
+    return indicator_engine if len(bar_panel) else None
+
+def panel_status() -> BarPanelStatus:
+    return BarPanelStatus(
+        tickers=len(bar_panel),
+        days=len(bar_panel.dates),
+        first_date=bar_panel.date(0).isoformat() if len(bar_panel.dates) else None,
+        last_date=bar_panel.date(len(bar_panel.dates) - 1).isoformat() if len(bar_panel.dates) else None,
+        refreshing=bar_panel.refresh_task is not None and not bar_panel.refresh_task.done(),
+        last_refresh_seconds=bar_panel.last_refresh_seconds
+    )
+
+# REST endpoint for the state of the daily bar panel
+@router.get("/indicators/status")
+async def get_indicator_status() -> BarPanelStatus:
+    return panel_status()
+
+# REST endpoint to fetch any missing days now
+@router.post("/indicators/refresh")
+async def refresh_indicator_bars() -> BarPanelStatus:
+    try:
+        await bar_panel.refresh()
+    except Exception as e:
+        print(f"Error refreshing daily bar panel: {e}")
+        raise HTTPException(status_code=502, detail=f"Failed to refresh daily bars: {str(e)}")
+    return panel_status()
+
+# REST endpoint for one ticker's latest indicator values and signals
+@router.get("/indicators/{ticker}")
+async def get_ticker_indicators(ticker: str, timeframe: str = "1d") -> TickerIndicators:
+    ticker = ticker.upper()
+    engine = get_indicator_engine()
+    if engine is None:
+        return TickerIndicators(ticker=ticker, timeframe=timeframe, values={}, error="Daily bars are still loading")
+    frame = await engine.prepare(timeframe)
+    if frame is None:
+        return TickerIndicators(ticker=ticker, timeframe=timeframe, values={},
+                                error=f"Not enough daily history to compute {timeframe} indicators")
+    values = frame.lookup(ticker)
+    if values is None:
+        return TickerIndicators(ticker=ticker, timeframe=timeframe, date=frame.date, values={}, error=f"No recent bars for {ticker}")
+    return TickerIndicators(ticker=ticker, timeframe=timeframe, date=frame.date, values=values)
@@ -0,0 +1,302 @@
+from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+import databutton as db
+import asyncio
+import datetime
+import io
+import time
+import numpy as np
+from zoneinfo import ZoneInfo
+from typing import Dict, List, Optional, Any
+from app.apis.market_data import polygon_client
+
+router = APIRouter()
+
+# Models for API responses
+class ContractReferenceStatus(BaseModel):
+    loaded_date: Optional[str] = None
+    contracts: int
+    underlyings: int
+    refreshing: bool
+    last_refresh_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ContractListResponse(BaseModel):
+    underlying: str
+    contracts: List[Dict[str, Any]]
+    error: Optional[str] = None
+
+# Storage key for the persisted daily contract table
+CONTRACT_STORE_KEY = "options_contract_reference"
+
+# Expiration windows (in days from today) that are paginated concurrently during a bulk load
+REFRESH_WINDOWS = [(0, 7), (7, 14), (14, 30), (30, 60), (60, 120), (120, 240), (240, 400), (400, 800), (800, None)]
+
+# Seconds before a failed bulk load is retried
+REFRESH_RETRY_SECONDS = 900.0
+
+EPOCH = datetime.date(1970, 1, 1)
+
+# Contracts are loaded and expired by the market date, not the server-local date
+MARKET_TZ = ZoneInfo("America/New_York")
+
+def market_today() -> datetime.date:
+    return datetime.datetime.now(MARKET_TZ).date()
+
+# Get Polygon API key
+def get_polygon_api_key():
+    api_key = db.secrets.get("POLYGON_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Polygon API key not found")
+    return api_key
+
+class ContractReferenceStore:
+    """The listed options contract universe, bulk-loaded once a day.
+
+    Contracts are held as compact NumPy columns sorted by (underlying, expiry,
+    strike): dictionary-encoded underlying and OCC root, expiry as days since
+    the epoch, strike and a call flag. Per-underlying row offsets make a lookup
+    a slice, and tickers are rebuilt from the columns only for returned rows.
+    The table is persisted so a restart does not need to reload it.
+    """
+    def __init__(self):
+        self.underlyings: List[str] = []
+        self.roots: List[str] = []
+        self.underlying_index: Dict[str, int] = {}
+        self.underlying_code = np.zeros(0, dtype=np.int32)
+        self.root_code = np.zeros(0, dtype=np.int32)
+        self.expiry = np.zeros(0, dtype=np.int32)
+        self.strike = np.zeros(0, dtype=np.float64)
+        self.is_call = np.zeros(0, dtype=bool)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.loaded_date: Optional[datetime.date] = None
+        self.refresh_task: Optional[asyncio.Task] = None
+        self.retry_after = 0.0
+        self.last_refresh_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_date is not None
+
+    def _set_columns(self, underlyings, roots, underlying_code, root_code, expiry, strike, is_call, loaded_date):
+        # Sort by (underlying, expiry, strike) so each underlying is one contiguous, ordered slice
+        order = np.lexsort((strike, expiry, underlying_code))
+        self.underlyings = list(underlyings)
+        self.roots = list(roots)
+        self.underlying_index = {u: i for i, u in enumerate(self.underlyings)}
+        self.underlying_code = underlying_code[order]
+        self.root_code = root_code[order]
+        self.expiry = expiry[order]
+        self.strike = strike[order]
+        self.is_call = is_call[order]
+        self.offsets = np.searchsorted(self.underlying_code, np.arange(len(self.underlyings) + 1))
+        self.loaded_date = loaded_date
+
+    def build(self, results: List[Dict[str, Any]], loaded_date: datetime.date):
+        """Build the table from /v3/reference/options/contracts results"""
+        underlyings: Dict[str, int] = {}
+        roots: Dict[str, int] = {}
+        n = len(results)
+        underlying_code = np.empty(n, dtype=np.int32)
+        root_code = np.empty(n, dtype=np.int32)
+        expiry = np.empty(n, dtype=np.int32)
+        strike = np.empty(n, dtype=np.float64)
+        is_call = np.empty(n, dtype=bool)
+
+        count = 0
+        for result in results:
+            ticker = result.get("ticker") or ""
+            underlying = result.get("underlying_ticker")
+            expiration = result.get("expiration_date")
+            if not ticker.startswith("O:") or not underlying or not expiration:
+                continue
+            # The OCC root is everything before the 15-character date/type/strike suffix
+            root = ticker[2:-15]
+            underlying_code[count] = underlyings.setdefault(underlying, len(underlyings))
+            root_code[count] = roots.setdefault(root, len(roots))
+            expiry[count] = (datetime.date.fromisoformat(expiration) - EPOCH).days
+            strike[count] = result.get("strike_price") or 0.0
+            is_call[count] = result.get("contract_type") == "call"
+            count += 1
+
+        self._set_columns(underlyings.keys(), roots.keys(), underlying_code[:count], root_code[:count],
+                          expiry[:count], strike[:count], is_call[:count], loaded_date)
+
+    def rows_for(self, underlying: str, min_expiry: Optional[datetime.date] = None, max_expiry: Optional[datetime.date] = None,
+                 strike_min: Optional[float] = None, strike_max: Optional[float] = None) -> np.ndarray:
+        """Row indexes for an underlying, optionally limited by expiry and strike"""
+        code = self.underlying_index.get(underlying.upper())
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        start, end = self.offsets[code], self.offsets[code + 1]
+        expiry = self.expiry[start:end]
+        lo = start + (np.searchsorted(expiry, (min_expiry - EPOCH).days, side="left") if min_expiry else 0)
+        hi = start + (np.searchsorted(expiry, (max_expiry - EPOCH).days, side="right") if max_expiry else end - start)
+        rows = np.arange(lo, hi)
+        if strike_min is not None:
+            rows = rows[self.strike[rows] >= strike_min]
+        if strike_max is not None:
+            rows = rows[self.strike[rows] <= strike_max]
+        return rows
+
+    def contract(self, row: int) -> Dict[str, Any]:
+        """A row in the shape of the reference endpoint's results"""
+        expiry = EPOCH + datetime.timedelta(days=int(self.expiry[row]))
+        strike = float(self.strike[row])
+        contract_type = "call" if self.is_call[row] else "put"
+        return {
+            "ticker": f"O:{self.roots[self.root_code[row]]}{expiry.strftime('%y%m%d')}{'C' if self.is_call[row] else 'P'}{int(round(strike * 1000)):08d}",
+            "underlying_ticker": self.underlyings[self.underlying_code[row]],
+            "expiration_date": expiry.isoformat(),
+            "strike_price": strike,
+            "contract_type": contract_type
+        }
+
+    def contracts_for(self, underlying: str, **filters) -> List[Dict[str, Any]]:
+        return [self.contract(row) for row in self.rows_for(underlying, **filters).tolist()]
+
+    def near_the_money(self, underlying: str, spot: float, limit: int, band_pct: float = 10.0) -> List[Dict[str, Any]]:
+        """Up to `limit` unexpired contracts within band_pct of spot, nearest expiries first"""
+        rows = self.rows_for(underlying, min_expiry=market_today())
+        if len(rows) == 0 or spot <= 0:
+            return self.contracts_for(underlying, min_expiry=market_today())[:limit]
+        distance = np.abs(self.strike[rows] - spot)
+        rows = rows[distance <= spot * band_pct / 100.0]
+        # Within each expiry, closest strikes first
+        order = np.lexsort((np.abs(self.strike[rows] - spot), self.expiry[rows]))
+        return [self.contract(row) for row in rows[order][:limit].tolist()]
+
+    def expirations_for(self, underlying: str) -> List[str]:
+        """Listed expiration dates for an underlying"""
+        rows = self.rows_for(underlying, min_expiry=market_today())
+        return [(EPOCH + datetime.timedelta(days=int(days))).isoformat() for days in np.unique(self.expiry[rows])]
+
+    def has_options(self, underlying: str) -> bool:
+        code = self.underlying_index.get(underlying.upper())
+        return code is not None and self.offsets[code + 1] > self.offsets[code]
+
+    def save(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            underlyings=np.array(self.underlyings), roots=np.array(self.roots),
+            underlying_code=self.underlying_code, root_code=self.root_code,
+            expiry=self.expiry, strike=self.strike, is_call=self.is_call,
+            loaded_date=np.array([self.loaded_date.isoformat()])
+        )
+        db.storage.binary.put(CONTRACT_STORE_KEY, buffer.getvalue())
+
+    def load(self) -> bool:
+        """Load the persisted table, if there is one"""
+        try:
+            data = np.load(io.BytesIO(db.storage.binary.get(CONTRACT_STORE_KEY)))
+            self._set_columns(
+                data["underlyings"].tolist(), data["roots"].tolist(),
+                data["underlying_code"], data["root_code"], data["expiry"], data["strike"], data["is_call"],
+                datetime.date.fromisoformat(str(data["loaded_date"][0]))
+            )
+            print(f"Loaded {len(self.strike)} option contracts from storage ({self.loaded_date})")
+            return True
+        except Exception as e:
+            print(f"No stored option contract reference available: {e}")
+            return False
+
+    async def refresh(self):
+        """Bulk-load every active contract, one concurrent paginated scan per expiry window"""
+        started = time.time()
+        api_key = get_polygon_api_key()
+        today = market_today()
+        urls = []
+        for start_days, end_days in REFRESH_WINDOWS:
+            url = (f"https://api.polygon.io/v3/reference/options/contracts?expired=false&limit=1000"
+                   f"&expiration_date.gte={(today + datetime.timedelta(days=start_days)).isoformat()}")
+            if end_days is not None:
+                url += f"&expiration_date.lt={(today + datetime.timedelta(days=end_days)).isoformat()}"
+            urls.append(f"{url}&apiKey={api_key}")
+
+        async def scan(url: str) -> List[Dict[str, Any]]:
+            # A failed or capped page raises, so a truncated universe never replaces the current table
+            results = []
+            async for page in polygon_client.iter_pages(url, api_key, max_pages=2000, timeout=20.0):
+                results.extend(page)
+            return results
+
+        pages = await asyncio.gather(*[scan(url) for url in urls])
+        results = [result for page in pages for result in page]
+        if not results:
+            raise Exception("Polygon returned no option contracts")
+
+        self.build(results, today)
+        self.last_refresh_seconds = time.time() - started
+        print(f"Loaded {len(self.strike)} option contracts for {len(self.underlyings)} underlyings in {self.last_refresh_seconds:.1f}s")
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Error saving option contract reference: {e}")
+
+    def ensure_fresh(self):
+        """Start a background refresh if today's universe isn't loaded yet"""
+        if self.loaded_date == market_today() or time.time() < self.retry_after:
+            return
+        if self.refresh_task is None or self.refresh_task.done():
+            # Raises before the coroutine exists when there is no running loop
+            asyncio.get_running_loop()
+            async def run():
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    # A failed load waits out the retry window instead of restarting on the next lookup
+                    self.retry_after = time.time() + REFRESH_RETRY_SECONDS
+                    print(f"Error refreshing option contract reference: {e}")
+            self.refresh_task = asyncio.create_task(run())
+
+# Global contract store, seeded from storage at startup
+contract_store = ContractReferenceStore()
+contract_store.load()
+
+def get_contract_store() -> Optional[ContractReferenceStore]:
+    """The contract store when it holds a universe, kicking off the daily refresh if due"""
+    try:
+        contract_store.ensure_fresh()
+    except RuntimeError:
+        # No running event loop, e.g. called from a worker thread
+        pass
+    return contract_store if contract_store.loaded else None
+
+# REST endpoint to check the contract reference store
+@router.get("/options/contracts/status")
+async def get_contract_reference_status() -> ContractReferenceStatus:
+    return ContractReferenceStatus(
+        loaded_date=contract_store.loaded_date.isoformat() if contract_store.loaded_date else None,
+        contracts=len(contract_store.strike),
+        underlyings=len(contract_store.underlyings),
+        refreshing=contract_store.refresh_task is not None and not contract_store.refresh_task.done(),
+        last_refresh_seconds=contract_store.last_refresh_seconds
+    )
+
+# REST endpoint to force a bulk reload of the contract universe
+@router.post("/options/contracts/refresh")
+async def refresh_contract_reference() -> ContractReferenceStatus:
+    try:
+        await contract_store.refresh()
+        return await get_contract_reference_status()
+    except Exception as e:
+        print(f"Error refreshing option contract reference: {e}")
+        status = await get_contract_reference_status()
+        status.error = f"Failed to refresh option contracts: {str(e)}"
+        return status
+
+# REST endpoint to list an underlying's contracts from memory
+@router.get("/options/contracts/{underlying}")
+async def get_option_contracts(underlying: str, max_dte: Optional[int] = None,
+                               strike_min: Optional[float] = None, strike_max: Optional[float] = None) -> ContractListResponse:
+    underlying = underlying.upper()
+    store = get_contract_store()
+    if store is None:
+        return ContractListResponse(underlying=underlying, contracts=[], error="Option contract reference is still loading")
+    max_expiry = market_today() + datetime.timedelta(days=max_dte) if max_dte is not None else None
+    return ContractListResponse(
+        underlying=underlying,
+        contracts=store.contracts_for(underlying, min_expiry=market_today(), max_expiry=max_expiry,
+                                      strike_min=strike_min, strike_max=strike_max)
+    )
@@ -1,11 +1,21 @@
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
 import databutton as db
-import requests
 import json
 import datetime
 import random
+import asyncio
+import math
+import time
+import heapq
+import numpy as np
+from collections import deque
 from typing import List, Dict, Optional, Any
+from app.apis.market_data import polygon_client
+from app.apis.options_contracts import get_contract_store
+from app.apis.polygon_options import (
+    feed_manager, live_quote_book, normalize_option_symbol, parse_option_symbol, snapshot_results_to_events
+)
 
 router = APIRouter()
 
@@ -17,6 +27,11 @@ class OptionsFlowRequest(BaseModel):
     show_puts: Optional[bool] = True
     show_sweeps: Optional[bool] = True
     show_blocks: Optional[bool] = True
+    max_contracts: Optional[int] = 250  # Contracts scanned for recent trades
+    side: Optional[str] = None  # Only prints at this aggressor side: Ask, Bid or Mid
+    sort_by: Optional[str] = "time"  # "time" or "premium", descending
+    limit: Optional[int] = None  # Page size; None returns every matching print
+    cursor: Optional[str] = None  # next_cursor from the previous page
 
 class FlowItem(BaseModel):
     time: str
@@ -34,9 +49,38 @@ class FlowItem(BaseModel):
     premium: str
     sector: str
     heatScore: int
+    side: Optional[str] = None  # Aggressor side vs the prevailing quote: Ask, Bid or Mid
 
 class OptionsFlowResponse(BaseModel):
     data: List[FlowItem]
+    total: Optional[int] = None  # Matching prints across all pages
+    next_cursor: Optional[str] = None
+    error: Optional[str] = None
+
+class UnusualActivityResponse(BaseModel):
+    data: List[FlowItem]
+    contracts_tracked: int
+    underlyings_tracked: int
+    market_wide: bool
+    error: Optional[str] = None
+
+class MarketWideScanRequest(BaseModel):
+    enabled: bool = True
+
+class FlowAggregateResponse(BaseModel):
+    symbol: str
+    window: str
+    bucket_seconds: int
+    prints: int
+    call_premium: float
+    put_premium: float
+    net_premium: float  # Call minus put premium
+    bullish_premium: float  # Calls bought at the ask plus puts sold at the bid
+    bearish_premium: float  # Puts bought at the ask plus calls sold at the bid
+    neutral_premium: float  # Mid-market or unknown side
+    top_strikes: List[Dict[str, Any]]
+    top_expiries: List[Dict[str, Any]]
+    series: List[Dict[str, Any]]  # One entry per bucket, oldest first
     error: Optional[str] = None
 
 # Get Polygon API key
@@ -96,6 +140,792 @@ def format_premium(value: float) -> str:
         else:
             return f"{value:.1f}"
 
+# Fixed-capacity, time-indexed store of classified flow prints
+FLOW_TYPES = ["Sweep", "Block"]
+FLOW_SIDES = [None, "Ask", "Bid", "Mid"]
+EPOCH = datetime.date(1970, 1, 1)
+
+class FlowStore:
+    """Ring buffer of flow prints held as NumPy columns.
+
+    Every print gets a monotonically increasing sequence number and lives in
+    slot seq % capacity, so the newest `capacity` prints are always retained.
+    Per-underlying and per-type deques of sequence numbers act as secondary
+    indexes (overwritten entries are dropped lazily). Queries filter and sort
+    the columns vectorized; only the requested page is turned back into dicts.
+    """
+    def __init__(self, capacity: int = 5000):
+        self.capacity = capacity
+        self.next_seq = 0
+        self.underlyings: List[str] = []
+        self.underlying_codes: Dict[str, int] = {}
+        self.seq = np.full(capacity, -1, dtype=np.int64)
+        self.ts_ns = np.zeros(capacity, dtype=np.int64)
+        self.underlying = np.zeros(capacity, dtype=np.int32)
+        self.expiry = np.zeros(capacity, dtype=np.int32)  # Days since the epoch
+        self.is_call = np.zeros(capacity, dtype=bool)
+        self.strike = np.zeros(capacity, dtype=np.float64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.size = np.zeros(capacity, dtype=np.int64)
+        self.premium = np.zeros(capacity, dtype=np.float64)
+        self.otm = np.zeros(capacity, dtype=np.float64)
+        self.spot = np.zeros(capacity, dtype=np.float64)
+        self.open_interest = np.zeros(capacity, dtype=np.int64)
+        self.iv = np.zeros(capacity, dtype=np.float64)
+        self.score = np.zeros(capacity, dtype=np.int8)
+        self.type_code = np.zeros(capacity, dtype=np.int8)
+        self.side_code = np.zeros(capacity, dtype=np.int8)
+        self.by_underlying: Dict[int, deque] = {}
+        self.by_type: Dict[int, deque] = {code: deque() for code in range(len(FLOW_TYPES))}
+
+    def __len__(self) -> int:
+        return min(self.next_seq, self.capacity)
+
+    @property
+    def oldest_seq(self) -> int:
+        return max(0, self.next_seq - self.capacity)
+
+    def _trim(self, index: deque):
+        oldest = self.oldest_seq
+        while index and index[0] < oldest:
+            index.popleft()
+
+    def append(self, event: Dict[str, Any]):
+        """Store one classified print (the detector's event dict)"""
+        seq = self.next_seq
+        self.next_seq += 1
+        slot = seq % self.capacity
+        code = self.underlying_codes.get(event["underlying"])
+        if code is None:
+            code = self.underlying_codes[event["underlying"]] = len(self.underlyings)
+            self.underlyings.append(event["underlying"])
+
+        spot = event.get("spot") or 0.0
+        strike = event["strike"]
+        is_call = event["call_put"] == "C"
+        otm = 0.0
+        if spot > 0:
+            otm = max(0.0, ((strike - spot) if is_call else (spot - strike)) / spot * 100)
+
+        self.seq[slot] = seq
+        self.ts_ns[slot] = event["ts_ns"]
+        self.underlying[slot] = code
+        self.expiry[slot] = (datetime.date.fromisoformat(event["expiry"]) - EPOCH).days
+        self.is_call[slot] = is_call
+        self.strike[slot] = strike
+        self.price[slot] = event["price"]
+        self.size[slot] = event["size"]
+        self.premium[slot] = event["premium"]
+        self.otm[slot] = otm
+        self.spot[slot] = spot
+        self.open_interest[slot] = event.get("open_interest") or 0
+        self.iv[slot] = event["iv"] if event.get("iv") is not None else np.nan
+        self.score[slot] = event["score"]
+        self.type_code[slot] = FLOW_TYPES.index(event["type"])
+        self.side_code[slot] = FLOW_SIDES.index(event.get("side"))
+
+        index = self.by_underlying.setdefault(code, deque())
+        index.append(seq)
+        self._trim(index)
+        type_index = self.by_type[self.type_code[slot]]
+        type_index.append(seq)
+        self._trim(type_index)
+        # Once per lap, prune indexes of underlyings that stopped printing
+        if slot == self.capacity - 1:
+            for stale_code, stale_index in list(self.by_underlying.items()):
+                self._trim(stale_index)
+                if not stale_index:
+                    del self.by_underlying[stale_code]
+
+    def event(self, slot: int) -> Dict[str, Any]:
+        """A stored print as a plain dict, the shape flow_item_from_event formats"""
+        iv = float(self.iv[slot])
+        return {
+            "ts_ns": int(self.ts_ns[slot]),
+            "underlying": self.underlyings[self.underlying[slot]],
+            "expiry": (EPOCH + datetime.timedelta(days=int(self.expiry[slot]))).isoformat(),
+            "call_put": "C" if self.is_call[slot] else "P",
+            "strike": float(self.strike[slot]),
+            "price": float(self.price[slot]),
+            "size": int(self.size[slot]),
+            "premium": float(self.premium[slot]),
+            "otm": float(self.otm[slot]),
+            "spot": float(self.spot[slot]) or None,
+            "open_interest": int(self.open_interest[slot]),
+            "iv": None if math.isnan(iv) else iv,
+            "score": int(self.score[slot]),
+            "type": FLOW_TYPES[self.type_code[slot]],
+            "side": FLOW_SIDES[self.side_code[slot]]
+        }
+
+    def query(self, underlying: Optional[str] = None, min_premium: float = 0, calls: bool = True, puts: bool = True,
+              types: Optional[List[str]] = None, side: Optional[str] = None, sort_by: str = "time",
+              cursor: Optional[tuple] = None, limit: Optional[int] = None):
+        """Filter, sort (descending) and page stored prints.
+
+        Returns (events for the page, total matches, next cursor or None). A
+        cursor is the (sort key, seq) of a page's last print, so pages stay
+        stable while new prints arrive.
+        """
+        # Candidate sequence numbers from the narrowest index available
+        if underlying is not None:
+            code = self.underlying_codes.get(underlying)
+            if code is None or code not in self.by_underlying:
+                return [], 0, None
+            index = self.by_underlying[code]
+            self._trim(index)
+            seqs = np.fromiter(index, dtype=np.int64, count=len(index))
+        elif types is not None and len(types) == 1:
+            index = self.by_type[FLOW_TYPES.index(types[0])]
+            self._trim(index)
+            seqs = np.fromiter(index, dtype=np.int64, count=len(index))
+        else:
+            seqs = np.arange(self.oldest_seq, self.next_seq, dtype=np.int64)
+        slots = seqs % self.capacity
+
+        mask = self.premium[slots] >= min_premium
+        if not calls:
+            mask &= ~self.is_call[slots]
+        if not puts:
+            mask &= self.is_call[slots]
+        if types is not None:
+            mask &= np.isin(self.type_code[slots], [FLOW_TYPES.index(t) for t in types])
+        if side is not None:
+            mask &= self.side_code[slots] == FLOW_SIDES.index(side)
+        seqs, slots = seqs[mask], slots[mask]
+        total = len(seqs)
+
+        keys = self.premium[slots] if sort_by == "premium" else self.ts_ns[slots]
+        if cursor is not None:
+            cursor_key, cursor_seq = cursor
+            after = (keys < cursor_key) | ((keys == cursor_key) & (seqs < cursor_seq))
+            seqs, slots, keys = seqs[after], slots[after], keys[after]
+
+        order = np.lexsort((seqs, keys))[::-1]
+        next_cursor = None
+        if limit is not None and len(order) > limit:
+            order = order[:limit]
+            last = order[-1]
+            next_cursor = (keys[last].item(), int(seqs[last]))
+        page = [self.event(slot) for slot in slots[order].tolist()]
+        return page, total, next_cursor
+
+def encode_flow_cursor(sort_by: str, cursor: Optional[tuple]) -> Optional[str]:
+    if cursor is None:
+        return None
+    return f"{sort_by}:{cursor[0]!r}:{cursor[1]}"
+
+def decode_flow_cursor(sort_by: str, cursor: Optional[str]) -> Optional[tuple]:
+    """Parse a next_cursor string, rejecting one issued for a different sort"""
+    if not cursor:
+        return None
+    cursor_sort, key, seq = cursor.split(":")
+    if cursor_sort != sort_by:
+        raise ValueError(f"cursor was issued for sort_by={cursor_sort}")
+    return (float(key) if sort_by == "premium" else int(key)), int(seq)
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+# Streaming sweep/block detector over the options trade stream
+class FlowDetector:
+    """Incremental options-flow classifier, O(1) work per trade.
+
+    Fills of the same contract that arrive within sweep_window_ms of the first
+    fill form one group. A group that hit two or more exchanges is a Sweep; a
+    single-venue group at least block_min_size contracts or block_min_premium
+    dollars is a Block; anything smaller is treated as noise. Open groups wait
+    in a deadline-ordered queue, so closing expired ones is amortized O(1).
+    Each classified print gets its aggressor side against the quote prevailing
+    when the group opened and an unusual-activity score from day volume versus
+    open interest, and lands in the FlowStore that /options/flow reads.
+    Per-contract volume, dedup and symbol state roll over when trades move
+    to a new day, so scores and memory reset each session.
+    """
+    def __init__(self, sweep_window_ms: int = 500, block_min_size: int = 100,
+                 block_min_premium: float = 50_000, buffer_size: int = 5000, quote_book=None):
+        self.sweep_window_ns = sweep_window_ms * 1_000_000
+        self.block_min_size = block_min_size
+        self.block_min_premium = block_min_premium
+        self.open_groups: Dict[str, Dict[str, Any]] = {}
+        self.pending = deque()  # (deadline_ns, contract, group) in arrival order
+        self.contract_meta: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.contract_stats: Dict[str, Dict[str, Any]] = {}  # open interest / IV per contract
+        self.spot: Dict[str, float] = {}  # Last known underlying price
+        self.day_volume: Dict[str, int] = {}
+        self.last_seen: Dict[str, tuple] = {}  # contract -> (last ts, fill keys at that ts)
+        self.session_day = 0  # Trade timestamps' day number (UTC) that the per-contract maps belong to
+        self.last_event_ns = 0  # Latest trade timestamp, the feed's clock (delayed feeds lag wall time)
+        self.store = FlowStore(buffer_size)
+        self.listeners: List[Any] = []
+        self.trades_processed = 0
+        self.quote_book = quote_book if quote_book is not None else live_quote_book
+        self.recorder = None  # Optional capture writer that sees every accepted trade
+
+    def add_listener(self, callback):
+        """Register a callback for every classified flow print"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def _meta(self, contract: str) -> Optional[Dict[str, Any]]:
+        meta = self.contract_meta.get(contract)
+        if meta is None and contract not in self.contract_meta:
+            meta = parse_option_symbol(contract)
+            self.contract_meta[contract] = meta
+        return meta
+
+    def _roll_session(self, ts_ns: int):
+        day = ts_ns // NS_PER_DAY
+        if day > self.session_day:
+            # Groups still open belong to the previous session
+            if self.session_day:
+                self.flush()
+            self.day_volume.clear()
+            self.last_seen.clear()
+            self.contract_meta.clear()
+            self.session_day = day
+
+    def update_contract_stats(self, snapshot_results: List[Dict[str, Any]]):
+        """Record open interest and IV from REST snapshot results"""
+        for result in snapshot_results:
+            ticker = result.get("details", {}).get("ticker")
+            if ticker:
+                self.contract_stats[normalize_option_symbol(ticker)] = {
+                    "open_interest": result.get("open_interest") or 0,
+                    "iv": result.get("implied_volatility")
+                }
+
+    def process_trade(self, contract: str, price: float, size: int, exchange: int, ts_ns: int):
+        """Feed one option trade (timestamps in epoch nanoseconds)"""
+        contract = normalize_option_symbol(contract)
+        if size <= 0 or price <= 0:
+            return
+        self._roll_session(ts_ns)
+        if self._meta(contract) is None:
+            return
+        
+        # Drop prints already seen, e.g. when REST pages overlap the stream
+        fill_key = (exchange, size, price)
+        last_ts, last_keys = self.last_seen.get(contract, (0, ()))
+        if ts_ns < last_ts or (ts_ns == last_ts and fill_key in last_keys):
+            return
+        self.last_seen[contract] = (ts_ns, last_keys + (fill_key,) if ts_ns == last_ts else (fill_key,))
+        
+        self.trades_processed += 1
+        if self.recorder is not None:
+            self.recorder.record_trade(contract, price, size, exchange, ts_ns)
+        self.day_volume[contract] = self.day_volume.get(contract, 0) + size
+        self.last_event_ns = max(self.last_event_ns, ts_ns)
+        self.close_expired(ts_ns)
+        
+        group = self.open_groups.get(contract)
+        if group is None:
+            quote = self.quote_book.get_quote(contract) or {}
+            group = {
+                "start": ts_ns, "end": ts_ns, "size": 0, "notional": 0.0, "fills": 0,
+                "exchanges": set(), "bid": quote.get("bid"), "ask": quote.get("ask")
+            }
+            self.open_groups[contract] = group
+            self.pending.append((ts_ns + self.sweep_window_ns, contract, group))
+        group["end"] = ts_ns
+        group["size"] += size
+        group["notional"] += price * size
+        group["fills"] += 1
+        group["exchanges"].add(exchange)
+
+    def close_expired(self, now_ns: Optional[int] = None):
+        """Close every group whose sweep window ended before now_ns, by default the latest trade's time"""
+        if now_ns is None:
+            now_ns = self.last_event_ns
+        while self.pending and self.pending[0][0] < now_ns:
+            _, contract, group = self.pending.popleft()
+            if self.open_groups.get(contract) is group:
+                self._close(contract)
+
+    def flush(self, contracts: Optional[List[str]] = None):
+        """Close all open groups, e.g. at the end of a replay, or only those of the given contracts.
+
+        A REST batch closes just its own contracts, so live groups still inside
+        their sweep window aren't split.
+        """
+        if contracts is not None:
+            for contract in {normalize_option_symbol(contract) for contract in contracts}:
+                if contract in self.open_groups:
+                    # The group's pending entry is skipped once the contract no longer maps to it
+                    self._close(contract)
+            return
+        while self.pending:
+            _, contract, group = self.pending.popleft()
+            if self.open_groups.get(contract) is group:
+                self._close(contract)
+
+    def _close(self, contract: str):
+        group = self.open_groups.pop(contract)
+        meta = self.contract_meta[contract]
+        size = group["size"]
+        price = group["notional"] / size
+        premium = group["notional"] * 100  # 100 shares per contract
+        
+        if len(group["exchanges"]) >= 2 and group["fills"] >= 2:
+            trade_type = "Sweep"
+        elif size >= self.block_min_size or premium >= self.block_min_premium:
+            trade_type = "Block"
+        else:
+            return
+        
+        # Aggressor side from the quote prevailing when the group opened
+        bid, ask = group["bid"], group["ask"]
+        side = None
+        if ask is not None and price >= ask:
+            side = "Ask"
+        elif bid is not None and price <= bid:
+            side = "Bid"
+        elif bid is not None and ask is not None:
+            side = "Mid"
+        
+        # Unusual activity: day volume against open interest, boosted by premium
+        stats = self.contract_stats.get(contract, {})
+        open_interest = stats.get("open_interest") or 0
+        day_volume = self.day_volume.get(contract, size)
+        vol_oi = day_volume / open_interest if open_interest else None
+        score = math.log2(1 + 4 * (vol_oi if vol_oi is not None else 0.5)) * 2 + max(0.0, math.log10(max(premium, 1)) - 3)
+        
+        event = {
+            "ts_ns": group["end"],
+            "underlying": meta["underlying"],
+            "contract": contract,
+            "expiry": meta["expirationDate"],
+            "call_put": "C" if meta["contractType"] == "call" else "P",
+            "strike": meta["strike"],
+            "price": price,
+            "size": size,
+            "premium": premium,
+            "fills": group["fills"],
+            "exchanges": len(group["exchanges"]),
+            "type": trade_type,
+            "side": side,
+            "spot": self.spot.get(meta["underlying"]),
+            "open_interest": open_interest,
+            "iv": stats.get("iv"),
+            "day_volume": day_volume,
+            "vol_oi": vol_oi,
+            "unusual": score,
+            "score": min(10, max(1, int(round(score))))
+        }
+        self.store.append(event)
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Error in flow listener: {e}")
+
+    def on_stream_events(self, events: List[Dict[str, Any]]):
+        """Feed manager listener: consume real trade events from the stream"""
+        for event in events:
+            if event.get("ev") == "T" and not event.get("backfill"):
+                self.process_trade(event.get("sym", ""), event.get("p", 0), int(event.get("s") or 0),
+                                   event.get("x", 0), int(event.get("t") or 0) * 1_000_000)
+
+    def recent(self, underlying: str) -> List[Dict[str, Any]]:
+        """Stored flow prints for an underlying, most recent first"""
+        self.close_expired()
+        return self.store.query(underlying)[0]
+
+# Global detector, fed by the upstream options stream
+flow_detector = FlowDetector()
+feed_manager.add_listener(flow_detector.on_stream_events)
+
+def feed_is_live(symbol: str) -> bool:
+    """True when the upstream stream is connected and carrying this underlying"""
+    return feed_manager.connected and (symbol in feed_manager.subscriptions or "*" in feed_manager.subscriptions)
+
+# Market-wide unusual options activity across every underlying
+class UnusualActivityScanner:
+    """Rolling per-contract activity plus a top-K heap of the most unusual prints.
+
+    Every classified print updates its contract's session volume, premium and
+    volume/OI ratio in O(1) and competes for a slot in a K-sized min-heap keyed
+    by the detector's unusual score, so the market-wide leaderboard is always
+    ready and reading it costs O(K). Stats roll over at the start of each day.
+    """
+    def __init__(self, top_k: int = 200):
+        self.top_k = top_k
+        self.heap: List[tuple] = []  # (unusual score, sequence, event)
+        self.contracts: Dict[str, Dict[str, Any]] = {}
+        self.underlyings: Dict[str, Dict[str, float]] = {}
+        self.session = datetime.date.today()
+        self.sequence = 0
+
+    def _roll_session(self):
+        today = datetime.date.today()
+        if today != self.session:
+            self.heap.clear()
+            self.contracts.clear()
+            self.underlyings.clear()
+            self.session = today
+
+    def on_flow(self, event: Dict[str, Any]):
+        """Detector listener: account for one classified print"""
+        self._roll_session()
+        stats = self.contracts.setdefault(event["contract"], {"volume": 0, "premium": 0.0, "prints": 0, "vol_oi": None})
+        stats["volume"] += event["size"]
+        stats["premium"] += event["premium"]
+        stats["prints"] += 1
+        stats["vol_oi"] = event["vol_oi"]
+        totals = self.underlyings.setdefault(event["underlying"], {"volume": 0, "premium": 0.0, "prints": 0})
+        totals["volume"] += event["size"]
+        totals["premium"] += event["premium"]
+        totals["prints"] += 1
+        
+        self.sequence += 1
+        entry = (event["unusual"], self.sequence, event)
+        if len(self.heap) < self.top_k:
+            heapq.heappush(self.heap, entry)
+        elif entry[0] > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def top(self, limit: int, underlying: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most unusual prints, highest score first"""
+        self._roll_session()
+        entries = self.heap if underlying is None else [e for e in self.heap if e[2]["underlying"] == underlying]
+        return [event for _, _, event in sorted(entries, reverse=True)[:limit]]
+
+unusual_scanner = UnusualActivityScanner()
+flow_detector.add_listener(unusual_scanner.on_flow)
+
+# Incremental premium aggregation over rolling time windows
+FLOW_WINDOWS = {
+    # name: (bucket seconds, buckets, resets at midnight)
+    "5m": (10, 30, False),
+    "1h": (60, 60, False),
+    "day": (300, 288, True)
+}
+
+def flow_sentiment(call_put: str, side: Optional[str]) -> str:
+    """Bullish/bearish reading of a print from its type and aggressor side"""
+    if side == "Ask":
+        return "bullish" if call_put == "C" else "bearish"
+    if side == "Bid":
+        return "bearish" if call_put == "C" else "bullish"
+    return "neutral"
+
+class RollingFlowWindow:
+    """Premium totals over the last n fixed-size time buckets.
+
+    Buckets live in a ring indexed by bucket number. Adding a print touches one
+    bucket plus the running window totals; advancing the head clears the
+    buckets that fell out of the window and subtracts them from the totals, so
+    totals are always ready to read. Strike and expiry premiums are kept the
+    same way, so only the top-N selection runs at read time.
+    """
+    def __init__(self, bucket_seconds: int, buckets: int, resets_daily: bool = False):
+        self.bucket_ns = bucket_seconds * 1_000_000_000
+        self.n = buckets
+        self.resets_daily = resets_daily
+        self.head: Optional[int] = None
+        self.ring: List[Optional[Dict[str, Any]]] = [None] * buckets
+        self.totals = self._empty_bucket(None)
+
+    @staticmethod
+    def _empty_bucket(index: Optional[int]) -> Dict[str, Any]:
+        return {"index": index, "prints": 0, "call": 0.0, "put": 0.0, "bullish": 0.0, "bearish": 0.0,
+                "neutral": 0.0, "strikes": {}, "expiries": {}}
+
+    def _day(self, index: int) -> datetime.date:
+        return datetime.date.fromtimestamp(index * self.bucket_ns / 1_000_000_000)
+
+    def _evict(self, slot: int):
+        bucket = self.ring[slot]
+        if bucket is None:
+            return
+        self.ring[slot] = None
+        totals = self.totals
+        for field in ("prints", "call", "put", "bullish", "bearish", "neutral"):
+            totals[field] -= bucket[field]
+        for field in ("strikes", "expiries"):
+            running = totals[field]
+            for key, premium in bucket[field].items():
+                remaining = running[key] - premium
+                if remaining <= 1e-6:
+                    del running[key]
+                else:
+                    running[key] = remaining
+
+    def advance(self, index: int):
+        """Move the head forward to bucket `index`, expiring buckets that left the window"""
+        if self.head is not None and index <= self.head:
+            return
+        if self.head is None or index - self.head >= self.n or (self.resets_daily and self._day(index) != self._day(self.head)):
+            for slot in range(self.n):
+                self._evict(slot)
+        else:
+            for stale in range(self.head + 1, index + 1):
+                self._evict(stale % self.n)
+        self.head = index
+
+    def add(self, event: Dict[str, Any]):
+        index = event["ts_ns"] // self.bucket_ns
+        self.advance(index)
+        if index <= self.head - self.n or (self.resets_daily and self._day(index) != self._day(self.head)):
+            return  # Older than the window
+        slot = index % self.n
+        bucket = self.ring[slot]
+        if bucket is None:
+            bucket = self.ring[slot] = self._empty_bucket(index)
+
+        premium = event["premium"]
+        side_key = "call" if event["call_put"] == "C" else "put"
+        sentiment = flow_sentiment(event["call_put"], event.get("side"))
+        strike_key = (event["strike"], event["call_put"])
+        for target in (bucket, self.totals):
+            target["prints"] += 1
+            target[side_key] += premium
+            target[sentiment] += premium
+            target["strikes"][strike_key] = target["strikes"].get(strike_key, 0.0) + premium
+            target["expiries"][event["expiry"]] = target["expiries"].get(event["expiry"], 0.0) + premium
+
+    def series(self) -> List[Dict[str, Any]]:
+        """Per-bucket premium, oldest first"""
+        if self.head is None:
+            return []
+        series = []
+        for index in range(self.head - self.n + 1, self.head + 1):
+            bucket = self.ring[index % self.n]
+            if bucket is None or bucket["index"] != index:
+                bucket = self._empty_bucket(index)
+            series.append({
+                "t": index * self.bucket_ns // 1_000_000_000,
+                "prints": bucket["prints"],
+                "call_premium": round(bucket["call"], 2),
+                "put_premium": round(bucket["put"], 2),
+                "bullish_premium": round(bucket["bullish"], 2),
+                "bearish_premium": round(bucket["bearish"], 2)
+            })
+        return series
+
+class FlowAggregator:
+    """Rolling 5m / 1h / day premium aggregates per underlying and market-wide ("*")"""
+    def __init__(self, windows: Dict[str, tuple] = FLOW_WINDOWS):
+        self.windows = windows
+        self.by_symbol: Dict[str, Dict[str, RollingFlowWindow]] = {}
+        self.last_event_ns = 0  # Windows are read as of the latest print, so replays and delayed feeds line up
+
+    def _windows_for(self, symbol: str) -> Dict[str, RollingFlowWindow]:
+        windows = self.by_symbol.get(symbol)
+        if windows is None:
+            windows = self.by_symbol[symbol] = {
+                name: RollingFlowWindow(*spec) for name, spec in self.windows.items()
+            }
+        return windows
+
+    def on_flow(self, event: Dict[str, Any]):
+        """Detector listener: fold one classified print into every window"""
+        self.last_event_ns = max(self.last_event_ns, event["ts_ns"])
+        for symbol in (event["underlying"], "*"):
+            for window in self._windows_for(symbol).values():
+                window.add(event)
+
+    def read(self, symbol: str, window_name: str, top: int = 10) -> FlowAggregateResponse:
+        bucket_seconds = self.windows[window_name][0]
+        windows = self.by_symbol.get(symbol)
+        # A symbol with no flow reads as an empty, unstored window
+        window = windows[window_name] if windows is not None else RollingFlowWindow(*self.windows[window_name])
+        if windows is not None and self.last_event_ns:
+            window.advance(self.last_event_ns // window.bucket_ns)
+        totals = window.totals
+        top_strikes = heapq.nlargest(top, totals["strikes"].items(), key=lambda item: item[1])
+        top_expiries = heapq.nlargest(top, totals["expiries"].items(), key=lambda item: item[1])
+        return FlowAggregateResponse(
+            symbol=symbol,
+            window=window_name,
+            bucket_seconds=bucket_seconds,
+            prints=totals["prints"],
+            call_premium=round(totals["call"], 2),
+            put_premium=round(totals["put"], 2),
+            net_premium=round(totals["call"] - totals["put"], 2),
+            bullish_premium=round(totals["bullish"], 2),
+            bearish_premium=round(totals["bearish"], 2),
+            neutral_premium=round(totals["neutral"], 2),
+            top_strikes=[{"strike": strike, "callPut": call_put, "premium": round(premium, 2)}
+                         for (strike, call_put), premium in top_strikes],
+            top_expiries=[{"expiry": expiry, "premium": round(premium, 2)} for expiry, premium in top_expiries],
+            series=window.series()
+        )
+
+flow_aggregator = FlowAggregator()
+flow_detector.add_listener(flow_aggregator.on_flow)
+
+def flow_item_from_event(event: Dict[str, Any], sector: str) -> FlowItem:
+    """Format a numeric flow print for display"""
+    spot = event["spot"] or 0
+    strike = event["strike"]
+    otm_pct = event.get("otm", 0.0)
+    if "otm" not in event and spot > 0:
+        otm_pct = (strike - spot) / spot * 100 if event["call_put"] == "C" else (spot - strike) / spot * 100
+    expiry = datetime.datetime.strptime(event["expiry"], "%Y-%m-%d").strftime("%m/%d/%y")
+    iv = event["iv"]
+    return FlowItem(
+        time=datetime.datetime.fromtimestamp(event["ts_ns"] / 1_000_000_000).strftime("%H:%M:%S"),
+        ticker=event["underlying"],
+        expiry=expiry,
+        callPut=event["call_put"],
+        spot=f"${spot:.2f}",
+        strike=f"${strike:.1f}",
+        otm=f"{max(0.0, round(otm_pct, 1)):.1f}%",
+        price=f"${event['price']:.2f}",
+        size=event["size"],
+        openInterest=f"{event['open_interest']:,}",
+        impliedVol=f"{iv * 100:.0f}%" if iv else "-",
+        type=event["type"],
+        premium=format_premium(event["premium"]),
+        sector=sector,
+        heatScore=event["score"],
+        side=event["side"]
+    )
+
+def query_flow(store: FlowStore, symbol: str, request: OptionsFlowRequest, cursor: Optional[tuple]) -> OptionsFlowResponse:
+    """One page of filtered, sorted flow for a symbol, formatted for display"""
+    types = [t for t, shown in (("Sweep", request.show_sweeps), ("Block", request.show_blocks)) if shown]
+    sort_by = request.sort_by or "time"
+    events, total, next_cursor = store.query(
+        symbol, min_premium=request.min_premium or 0, calls=request.show_calls, puts=request.show_puts,
+        types=types, side=request.side, sort_by=sort_by, cursor=cursor, limit=request.limit
+    )
+    sector = get_symbol_sector(symbol)
+    return OptionsFlowResponse(
+        data=[flow_item_from_event(event, sector) for event in events],
+        total=total,
+        next_cursor=encode_flow_cursor(sort_by, next_cursor)
+    )
+
+# REST endpoint for the market-wide unusual options activity leaderboard
+@router.get("/options/unusual")
+async def get_unusual_options_activity(limit: int = 50, symbol: Optional[str] = None) -> UnusualActivityResponse:
+    try:
+        flow_detector.close_expired()
+        events = unusual_scanner.top(max(1, min(limit, unusual_scanner.top_k)), symbol.upper() if symbol else None)
+        return UnusualActivityResponse(
+            data=[flow_item_from_event(event, get_symbol_sector(event["underlying"])) for event in events],
+            contracts_tracked=len(unusual_scanner.contracts),
+            underlyings_tracked=len(unusual_scanner.underlyings),
+            market_wide="*" in feed_manager.subscriptions
+        )
+    except Exception as e:
+        print(f"Error reading unusual options activity: {e}")
+        return UnusualActivityResponse(data=[], contracts_tracked=0, underlyings_tracked=0, market_wide=False,
+                                       error=f"Failed to read unusual options activity: {str(e)}")
+
+# REST endpoint for rolling premium aggregates (use symbol "*" for market-wide)
+@router.get("/options/flow/aggregate")
+async def get_flow_aggregate(symbol: str, window: str = "1h", top: int = 10) -> FlowAggregateResponse:
+    symbol = symbol.upper()
+    try:
+        if window not in FLOW_WINDOWS:
+            raise ValueError(f"window must be one of {', '.join(FLOW_WINDOWS)}")
+        flow_detector.close_expired()
+        return flow_aggregator.read(symbol, window, max(1, min(top, 100)))
+    except Exception as e:
+        print(f"Error aggregating options flow for {symbol}: {e}")
+        return FlowAggregateResponse(
+            symbol=symbol, window=window, bucket_seconds=0, prints=0, call_premium=0, put_premium=0, net_premium=0,
+            bullish_premium=0, bearish_premium=0, neutral_premium=0, top_strikes=[], top_expiries=[], series=[],
+            error=f"Failed to aggregate options flow: {str(e)}"
+        )
+
+# REST endpoint to switch the market-wide trade stream feeding the scanner on or off
+@router.post("/options/unusual/stream")
+async def set_market_wide_scan(request: MarketWideScanRequest):
+    active = "*" in feed_manager.subscriptions
+    if request.enabled and not active:
+        await feed_manager.subscribe("*")
+    elif not request.enabled and active:
+        await feed_manager.unsubscribe("*")
+    return {"market_wide": "*" in feed_manager.subscriptions, "feed": feed_manager.status()}
+
+# Synthetic flow per symbol, kept for a few minutes so cursors stay valid across pages
+SYNTHETIC_FLOW_TTL = 300
+synthetic_flow_stores: Dict[str, tuple] = {}  # symbol -> (generated at, FlowStore)
+
+def synthetic_flow_store(symbol: str, current_price: float) -> FlowStore:
+    """Random but plausible flow prints for a symbol, generated unfiltered"""
+    cached = synthetic_flow_stores.get(symbol)
+    if cached and time.time() - cached[0] < SYNTHETIC_FLOW_TTL:
+        return cached[1]
+
+    # Generate more flow items to support pagination
+    num_items = random.randint(120, 250)  # Generate enough for multiple pages
+    store = FlowStore(num_items)
+
+    # Get current date and time
+    now = datetime.datetime.now()
+
+    # Generate expiration dates (weekly and monthly options)
+    expirations = []
+
+    # Add weekly expirations (next 4 Fridays)
+    friday = now.date() + datetime.timedelta((4 - now.weekday()) % 7)
+    for i in range(4):
+        expirations.append(friday + datetime.timedelta(days=i*7))
+
+    # Add monthly expirations (3rd Friday of next 3 months)
+    for i in range(1, 4):
+        month = (now.month + i - 1) % 12 + 1
+        year = now.year + (now.month + i - 1) // 12
+        # First day of month
+        first = datetime.date(year, month, 1)
+        # First Friday of month
+        friday = first + datetime.timedelta((4 - first.weekday()) % 7)
+        # Third Friday of month
+        expirations.append(friday + datetime.timedelta(days=14))
+
+    for _ in range(num_items):
+        # Random time within the last two hours
+        item_time = now - datetime.timedelta(minutes=random.randint(0, 120), seconds=random.randint(0, 59))
+
+        # Call or Put
+        call_put = "C" if random.random() < 0.6 else "P"  # Slight bias toward calls
+
+        # Strike price (distributed around current price), 60% within 5% of it
+        strike_pct = random.uniform(0.85, 1.15)
+        if random.random() < 0.6:
+            strike_pct = random.uniform(0.95, 1.05)
+        strike = round(current_price * strike_pct, 1)
+
+        # OTM percentage
+        if call_put == "C":
+            otm_pct = max(0, round((strike - current_price) / current_price * 100, 1))
+            price = max(0.05, round(((current_price / strike) * 0.1) * (1 + otm_pct*0.01), 2))
+        else:
+            otm_pct = max(0, round((current_price - strike) / current_price * 100, 1))
+            price = max(0.05, round(((strike / current_price) * 0.1) * (1 + otm_pct*0.01), 2))
+
+        # Size
+        size = random.randint(1, 50) * 100  # Contracts come in lots of 100
+
+        # Premium = price * size, with some much larger trades to get K and M values
+        premium = price * size * 100
+        if random.random() < 0.4:
+            premium *= random.choice([10, 100, 1000])
+
+        store.append({
+            "ts_ns": int(item_time.timestamp() * 1_000_000_000),
+            "underlying": symbol,
+            "expiry": random.choice(expirations).isoformat(),
+            "call_put": call_put,
+            "strike": strike,
+            "price": price,
+            "size": size,
+            "premium": premium,
+            "type": "Sweep" if random.random() < 0.7 else "Block",
+            "side": random.choice(["Ask", "Ask", "Bid", "Mid"]),
+            "spot": current_price,
+            "open_interest": random.randint(100, 10000),
+            "iv": random.randint(20, 60) / 100,
+            "score": random.randint(1, 10)
+        })
+
+    synthetic_flow_stores[symbol] = (time.time(), store)
+    return store
+
 # REST endpoint to fetch options flow data
 @router.post("/options/flow")
 async def get_options_flow(request: OptionsFlowRequest) -> OptionsFlowResponse:
@@ -106,144 +936,93 @@ async def get_options_flow(request: OptionsFlowRequest) -> OptionsFlowResponse:
         
         print(f"Fetching options flow data for {symbol} with min premium ${min_premium}")
         
+        max_contracts = max(1, request.max_contracts or 250)
+        cursor = decode_flow_cursor(request.sort_by or "time", request.cursor)
+        
         # Try to fetch data from Polygon.io's API
         try:
-            # First we need the current stock price
+            # While the stream carries this symbol the detector buffer is already current
+            if feed_is_live(symbol):
+                flow_detector.close_expired()
+                response = query_flow(flow_detector.store, symbol, request, cursor)
+                if response.total:
+                    print(f"Returning {len(response.data)} of {response.total} streamed flow items for {symbol}")
+                    return response
+            
+            # Contracts come from the in-memory reference store when it lists this symbol;
+            # otherwise the reference endpoint is paged alongside the other requests
+            store = get_contract_store()
+            use_store = store is not None and store.has_options(symbol)
+            
+            # Current stock price, the option contract list and the options snapshot
+            # (quotes, open interest, IV), fetched together
             stock_url = f"https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers/{symbol}?apiKey={api_key}"
-            stock_response = requests.get(stock_url, timeout=5.0)
+            options_url = f"https://api.polygon.io/v3/reference/options/contracts?underlying_ticker={symbol}&limit={min(max_contracts, 1000)}&apiKey={api_key}"
+            snapshot_url = f"https://api.polygon.io/v3/snapshot/options/{symbol}?limit=250&apiKey={api_key}"
+            stock_data, contracts, options_snapshot = await asyncio.gather(
+                polygon_client.get_json(stock_url, timeout=5.0),
+                polygon_client.paginate(options_url, api_key, max_pages=(max_contracts + 999) // 1000, timeout=8.0) if not use_store else asyncio.sleep(0, result=[]),
+                polygon_client.get_json(snapshot_url, timeout=8.0)
+            )
             
             current_price = 0
-            if stock_response.status_code == 200:
-                stock_data = stock_response.json()
-                if 'ticker' in stock_data and 'day' in stock_data['ticker']:
-                    current_price = stock_data['ticker']['day'].get('c', 0) or stock_data['ticker']['day'].get('o', 100)
-                    print(f"Retrieved current price for {symbol}: ${current_price}")
+            if stock_data and 'ticker' in stock_data and 'day' in stock_data['ticker']:
+                current_price = stock_data['ticker']['day'].get('c', 0) or stock_data['ticker']['day'].get('o', 100)
+                print(f"Retrieved current price for {symbol}: ${current_price}")
+            
+            # With the price known, scan the nearest expiries' near-the-money contracts
+            if use_store:
+                contracts = store.near_the_money(symbol, current_price, max_contracts)
             
-            # Try to fetch actual options data from Polygon.io
-            options_url = f"https://api.polygon.io/v3/reference/options/contracts?underlying_ticker={symbol}&limit=50&apiKey={api_key}"
-            options_response = requests.get(options_url, timeout=8.0)
+            # Prevailing quotes and open interest for side and unusual-activity scoring
+            if options_snapshot:
+                snapshot_results = options_snapshot.get('results', [])
+                live_quote_book.apply_events(snapshot_results_to_events(snapshot_results))
+                flow_detector.update_contract_stats(snapshot_results)
             
             real_data_available = False
             option_contracts = []
             
-            if options_response.status_code == 200:
-                options_data = options_response.json()
-                contracts = options_data.get('results', [])
-                
-                if contracts:
-                    print(f"Retrieved {len(contracts)} option contracts for {symbol}")
-                    real_data_available = True
-                    option_contracts = contracts
+            if contracts:
+                print(f"Retrieved {len(contracts)} option contracts for {symbol}" + (" from the reference store" if use_store else ""))
+                real_data_available = True
+                option_contracts = contracts[:max_contracts]
             
-            # If we have real options data and current price, let's try to fetch trades
+            # If we have real options data and current price, run recent trades through the detector
             if real_data_available and current_price > 0:
-                flow_items = []
-                sector = get_symbol_sector(symbol)
+                flow_detector.spot[symbol] = current_price
                 
-                # Limit to top 10 contracts by open interest or volume to avoid API rate limits
-                for contract in option_contracts[:10]:
-                    try:
-                        contract_ticker = contract.get('ticker')
-                        expiry_iso = contract.get('expiration_date')
-                        strike_price = contract.get('strike_price')
-                        contract_type = "C" if contract.get('contract_type') == "call" else "P"
-                        
-                        # Format expiry date from ISO to MM/DD/YY
-                        expiry_date = datetime.datetime.fromisoformat(expiry_iso.replace('Z', '+00:00'))
-                        expiry = expiry_date.strftime("%m/%d/%y")
-                        
-                        # Get recent trades for this contract
-                        trades_url = f"https://api.polygon.io/v3/trades/{contract_ticker}?limit=5&apiKey={api_key}"
-                        trades_response = requests.get(trades_url, timeout=5.0)
-                        
-                        if trades_response.status_code == 200:
-                            trades_data = trades_response.json()
-                            trades = trades_data.get('results', [])
-                            
-                            for trade in trades:
-                                trade_price = trade.get('p', 0)
-                                trade_size = trade.get('s', 0)
-                                
-                                # Skip tiny trades
-                                if trade_size < 3:
-                                    continue
-                                    
-                                # Calculate premium
-                                premium_val = trade_price * trade_size * 100  # 100 shares per contract
-                                
-                                # Skip if premium is below minimum
-                                if premium_val < min_premium:
-                                    continue
-                                
-                                # Format premium for display
-                                premium = format_premium(premium_val)
-                                
-                                # Determine trade type based on size
-                                trade_type = "Block" if trade_size >= 20 else "Sweep"
-                                
-                                # Format timestamp
-                                timestamp_ns = trade.get('t', 0)
-                                if timestamp_ns > 0:
-                                    trade_time = datetime.datetime.fromtimestamp(timestamp_ns / 1_000_000_000)
-                                    time_str = trade_time.strftime("%H:%M:%S")
-                                else:
-                                    time_str = datetime.datetime.now().strftime("%H:%M:%S")
-                                
-                                # Calculate OTM percentage
-                                otm_pct = 0
-                                if contract_type == "C":
-                                    otm_pct = max(0, round((strike_price - current_price) / current_price * 100, 1))
-                                else:
-                                    otm_pct = max(0, round((current_price - strike_price) / current_price * 100, 1))
-                                
-                                # Get approximate open interest and implied volatility from contract data
-                                oi = contract.get('open_interest', 0) or random.randint(100, 10000)
-                                iv = random.randint(20, 60)  # Polygon doesn't provide IV in free tier
-                                
-                                # Determine heat score based on trade size and premium
-                                # Higher premium and larger size = higher heat score
-                                base_heat = min(10, max(1, int(trade_size / 10)))  # 1-10 based on size
-                                premium_heat = min(10, max(1, int(premium_val / 10000)))  # 1-10 based on premium
-                                heat_score = min(10, max(1, (base_heat + premium_heat) // 2))
-                                
-                                flow_item = FlowItem(
-                                    time=time_str,
-                                    ticker=symbol,
-                                    expiry=expiry,
-                                    callPut=contract_type,
-                                    spot=f"${current_price:.2f}",
-                                    strike=f"${strike_price:.1f}",
-                                    otm=f"{otm_pct:.1f}%",
-                                    price=f"${trade_price:.2f}",
-                                    size=trade_size,
-                                    openInterest=f"{oi:,}",
-                                    impliedVol=f"{iv}%",
-                                    type=trade_type,
-                                    premium=premium,
-                                    sector=sector,
-                                    heatScore=heat_score
-                                )
-                                
-                                # Apply filters
-                                if (
-                                    (contract_type == "C" and not request.show_calls) or
-                                    (contract_type == "P" and not request.show_puts) or
-                                    (trade_type == "Sweep" and not request.show_sweeps) or
-                                    (trade_type == "Block" and not request.show_blocks)
-                                ):
-                                    continue
-                                    
-                                flow_items.append(flow_item)
-                    except Exception as e:
-                        print(f"Error processing contract {contract.get('ticker', 'unknown')}: {e}")
-                        continue
+                # Recent trades for every contract, fetched concurrently through the
+                # pooled client (bounded in-flight requests, shared rate limit)
+                trades_urls = [
+                    f"https://api.polygon.io/v3/trades/{contract.get('ticker')}?limit=50&apiKey={api_key}"
+                    for contract in option_contracts
+                ]
+                trade_pages = await polygon_client.gather_json(trades_urls, timeout=5.0)
+                print(f"Fetched trades for {len(trade_pages)} contracts concurrently")
                 
-                # If we have real flow items, return them
-                if flow_items:
-                    # Sort by time (most recent first)
-                    flow_items.sort(key=lambda x: x.time, reverse=True)
-                    print(f"Returning {len(flow_items)} real flow items for {symbol}")
-                    return OptionsFlowResponse(data=flow_items)
+                # Replay them in time order so fills group into sweeps across contracts' exchanges
+                trades = []
+                for contract, trades_data in zip(option_contracts, trade_pages):
+                    for trade in (trades_data or {}).get('results', []):
+                        # v3 trades use long field names, stream-style payloads short ones
+                        trades.append((
+                            trade.get('sip_timestamp', trade.get('t', 0)),
+                            contract.get('ticker'),
+                            trade.get('price', trade.get('p', 0)),
+                            trade.get('size', trade.get('s', 0)),
+                            trade.get('exchange', trade.get('x', 0))
+                        ))
+                trades.sort(key=lambda trade: trade[0])
+                for ts_ns, ticker, price, size, exchange in trades:
+                    flow_detector.process_trade(ticker, price, size, exchange, ts_ns)
+                flow_detector.flush([trade[1] for trade in trades if trade[1]])
+            
+            # Serve whatever the detector has classified for this symbol
+            response = query_flow(flow_detector.store, symbol, request, cursor)
+            if response.total:
+                print(f"Returning {len(response.data)} of {response.total} real flow items for {symbol}")
+                return response
             
             # If we couldn't get real data or no items passed filters, fall back to synthetic
             print(f"No real data available for {symbol}, using synthetic data")
@@ -271,139 +1050,7 @@ async def get_options_flow(request: OptionsFlowRequest) -> OptionsFlowResponse:
                 else:
                     current_price = 100.0
             
-            # Generate more flow items to support pagination
-            num_items = random.randint(120, 250)  # Generate enough for multiple pages
-            sector = get_symbol_sector(symbol)
-            
-            # Get current date and time
-            now = datetime.datetime.now()
-            
-            # Generate expiration dates (weekly and monthly options)
-            expirations = []
-            
-            # Add weekly expirations (next 4 Fridays)
-            friday = now + datetime.timedelta((4 - now.weekday()) % 7)
-            for i in range(4):
-                expiry_date = friday + datetime.timedelta(days=i*7)
-                expirations.append(expiry_date.strftime("%m/%d/%y"))
-            
-            # Add monthly expirations (3rd Friday of next 3 months)
-            for i in range(1, 4):
-                month = (now.month + i - 1) % 12 + 1
-                year = now.year + (now.month + i - 1) // 12
-                # First day of month
-                first = datetime.datetime(year, month, 1)
-                # First Friday of month
-                friday = first + datetime.timedelta((4 - first.weekday()) % 7)
-                # Third Friday of month
-                third_friday = friday + datetime.timedelta(days=14)
-                expirations.append(third_friday.strftime("%m/%d/%y"))
-            
-            # Generate flow items
-            flow_items = []
-            for _ in range(num_items):
-                # Random time within the last hour
-                minutes_ago = random.randint(0, 120)  # Up to 2 hours ago
-                seconds_offset = random.randint(0, 59)
-                item_time = now - datetime.timedelta(minutes=minutes_ago, seconds=seconds_offset)
-                time_str = item_time.strftime("%H:%M:%S")
-                
-                # Call or Put
-                call_put = "C" if random.random() < 0.6 else "P"  # Slight bias toward calls
-                
-                # Strike price (distributed around current price)
-                strike_pct = random.uniform(0.85, 1.15) if call_put == "C" else random.uniform(0.85, 1.15)
-                
-                # Ensure we have a good mix of options near current price
-                # 60% chance of being within 5% of current price
-                if random.random() < 0.6:
-                    strike_pct = random.uniform(0.95, 1.05)
-                    
-                strike = round(current_price * strike_pct, 1)
-                
-                # OTM percentage
-                otm_pct = 0
-                if call_put == "C":
-                    otm_pct = max(0, round((strike - current_price) / current_price * 100, 1))
-                else:
-                    otm_pct = max(0, round((current_price - strike) / current_price * 100, 1))
-                
-                # Option price
-                price = 0
-                if call_put == "C":
-                    price = max(0.05, round(((current_price / strike) * 0.1) * (1 + otm_pct*0.01), 2))
-                else:
-                    price = max(0.05, round(((strike / current_price) * 0.1) * (1 + otm_pct*0.01), 2))
-                
-                # Size
-                size = random.randint(1, 50) * 100  # Contracts come in lots of 100
-                
-                # Premium = price * size
-                premium_val = price * size * 100  # Add multiply by 100 to make values larger
-                
-                # Skip if premium is below minimum
-                if premium_val < min_premium:
-                    continue
-                
-                # Apply random multiplier for some large trades to ensure we get K and M values
-                if random.random() < 0.4:  # 40% of trades
-                    multiplier = random.choice([10, 100, 1000])  # Some trades much larger
-                    premium_val *= multiplier
-                
-                premium = format_premium(premium_val)
-                
-                # Skip if premium is below minimum
-                if premium_val < min_premium:
-                    continue
-                
-                # Type: Sweep or Block
-                trade_type = "Sweep" if random.random() < 0.7 else "Block"
-                
-                # Expiry (randomly choose one)
-                expiry = random.choice(expirations)
-                
-                # Heat score (1-10)
-                heat_score = random.randint(1, 10)
-                
-                # Implied volatility
-                iv = random.randint(20, 60)
-                
-                # Open interest
-                oi = random.randint(100, 10000)
-                
-                flow_item = FlowItem(
-                    time=time_str,
-                    ticker=symbol,
-                    expiry=expiry,
-                    callPut=call_put,
-                    spot=f"${current_price:.2f}",
-                    strike=f"${strike:.1f}",
-                    otm=f"{otm_pct:.1f}%",
-                    price=f"${price:.2f}",
-                    size=size,
-                    openInterest=f"{oi:,}",
-                    impliedVol=f"{iv}%",
-                    type=trade_type,
-                    premium=premium,
-                    sector=sector,
-                    heatScore=heat_score
-                )
-                
-                # Apply filters
-                if (
-                    (call_put == "C" and not request.show_calls) or
-                    (call_put == "P" and not request.show_puts) or
-                    (trade_type == "Sweep" and not request.show_sweeps) or
-                    (trade_type == "Block" and not request.show_blocks)
-                ):
-                    continue
-                    
-                flow_items.append(flow_item)
-            
-            # Sort by time (most recent first)
-            flow_items.sort(key=lambda x: x.time, reverse=True)
-            
-            return OptionsFlowResponse(data=flow_items)
+            return query_flow(synthetic_flow_store(symbol, current_price), symbol, request, cursor)
                 
         except Exception as e:
             print(f"Error fetching options flow data from Polygon API: {e}")
@@ -0,0 +1,301 @@
+from pydantic import BaseModel
+from fastapi import APIRouter
+import asyncio
+import datetime
+import json
+import os
+import re
+import tempfile
+import time
+import numpy as np
+from typing import Dict, List, Optional, Any
+from app.apis.polygon_options import LiveQuoteBook, feed_manager, normalize_option_symbol
+from app.apis.options_flow import FlowDetector, FlowItem, flow_detector, flow_item_from_event, get_symbol_sector
+
+router = APIRouter()
+
+# Models for capture and replay
+class CaptureStartRequest(BaseModel):
+    session: Optional[str] = None  # Defaults to a timestamped name
+    include_quotes: bool = True  # Quotes for contracts clients subscribe to; the market-wide feed carries trades only
+    chunk_records: int = 100_000
+
+class CaptureSession(BaseModel):
+    session: str
+    chunks: int
+    trades: int
+    quotes: int
+    start: Optional[str] = None
+    end: Optional[str] = None
+    active: bool = False
+    error: Optional[str] = None
+
+class ReplayRequest(BaseModel):
+    session: str
+    speed: Optional[float] = None  # Multiple of real time; None replays as fast as possible
+    sweep_window_ms: int = 500
+    block_min_size: int = 100
+    block_min_premium: float = 50_000
+    limit: int = 50  # Largest classified prints returned
+
+class ReplayResponse(BaseModel):
+    session: str
+    trades: int
+    quotes: int
+    prints: int
+    sweeps: int
+    blocks: int
+    total_premium: float
+    elapsed_seconds: float
+    trades_per_second: float
+    data: List[FlowItem]
+    error: Optional[str] = None
+
+# Captures are written as numbered compressed chunks under one directory per session
+CAPTURE_DIR = os.path.join(tempfile.gettempdir(), "options_captures")
+
+# One record per trade or quote; a chunk stores its own contract dictionary
+CAPTURE_DTYPE = np.dtype([
+    ("ts_ns", "<i8"), ("kind", "u1"), ("contract", "<i4"),
+    ("price", "<f8"), ("size", "<i4"), ("exchange", "<i2"),
+    ("bid", "<f8"), ("ask", "<f8"), ("bid_size", "<i4"), ("ask_size", "<i4")
+])
+KIND_TRADE = 0
+KIND_QUOTE = 1
+
+def session_dir(session: str) -> str:
+    return os.path.join(CAPTURE_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", session))
+
+class OptionsCaptureWriter:
+    """Records normalized option trades, and quotes where the feed streams them, to chunked, compressed files.
+
+    Records are buffered in memory and written as one np.savez_compressed
+    chunk every chunk_records records, sorted by timestamp. Chunks are
+    compressed and written on a worker thread, one after another, so the feed
+    never waits on the disk. A manifest.json next to the chunks lists them
+    with record counts and the time span.
+
+    Every trade is captured. Quotes stream only for contracts some client has
+    subscribed to, so a capture holds quotes for those contracts alone.
+    """
+    def __init__(self, session: str, include_quotes: bool = True, chunk_records: int = 100_000):
+        self.session = session
+        self.directory = session_dir(session)
+        self.include_quotes = include_quotes
+        self.chunk_records = max(1000, chunk_records)
+        self.rows: List[tuple] = []
+        self.contracts: Dict[str, int] = {}
+        self.chunks: List[Dict[str, Any]] = []
+        self.next_chunk = 0
+        self.writing: Optional[asyncio.Task] = None
+        self.trades = 0
+        self.quotes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _code(self, contract: str) -> int:
+        code = self.contracts.get(contract)
+        if code is None:
+            code = self.contracts[contract] = len(self.contracts)
+        return code
+
+    def record_trade(self, contract: str, price: float, size: int, exchange: int, ts_ns: int):
+        self.rows.append((ts_ns, KIND_TRADE, self._code(contract), price, size, exchange, np.nan, np.nan, 0, 0))
+        self.trades += 1
+        if len(self.rows) >= self.chunk_records:
+            self.flush()
+
+    def record_quote(self, contract: str, bid: float, ask: float, bid_size: int, ask_size: int, ts_ns: int):
+        self.rows.append((ts_ns, KIND_QUOTE, self._code(contract), np.nan, 0, 0, bid, ask, bid_size, ask_size))
+        self.quotes += 1
+        if len(self.rows) >= self.chunk_records:
+            self.flush()
+
+    def on_stream_events(self, events: List[Dict[str, Any]]):
+        """Quotes from the upstream stream; trades arrive through the flow detector"""
+        if not self.include_quotes:
+            return
+        for event in events:
+            if event.get("ev") == "Q" and event.get("sym") and not event.get("backfill"):
+                self.record_quote(normalize_option_symbol(event["sym"]), event.get("bp", np.nan), event.get("ap", np.nan),
+                                  int(event.get("bs") or 0), int(event.get("as") or 0), int(event.get("t") or 0) * 1_000_000)
+
+    def flush(self):
+        """Hand buffered records off to be written as the next chunk"""
+        if not self.rows:
+            return
+        rows, contracts = self.rows, self.contracts
+        name = f"chunk-{self.next_chunk:06d}.npz"
+        self.next_chunk += 1
+        self.rows = []
+        self.contracts = {}
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No running loop, e.g. replaying on a worker thread: write inline
+            self.write_chunk(name, rows, contracts)
+            return
+        self.writing = loop.create_task(self._write_after(self.writing, name, rows, contracts))
+
+    async def _write_after(self, previous: Optional[asyncio.Task], name: str, rows: List[tuple], contracts: Dict[str, int]):
+        # Chunks are written in order, so the manifest always lists a prefix of the capture
+        if previous is not None:
+            await previous
+        try:
+            await asyncio.to_thread(self.write_chunk, name, rows, contracts)
+        except Exception as e:
+            print(f"Error writing options capture chunk {name}: {e}")
+
+    def write_chunk(self, name: str, rows: List[tuple], contracts: Dict[str, int]):
+        records = np.array(rows, dtype=CAPTURE_DTYPE)
+        records = records[np.argsort(records["ts_ns"], kind="stable")]
+        np.savez_compressed(os.path.join(self.directory, name), records=records, contracts=np.array(list(contracts)))
+        self.chunks.append({
+            "file": name, "records": len(records),
+            "start_ns": int(records["ts_ns"][0]), "end_ns": int(records["ts_ns"][-1])
+        })
+        self.write_manifest()
+
+    def write_manifest(self):
+        with open(os.path.join(self.directory, "manifest.json"), "w") as f:
+            json.dump({"session": self.session, "chunks": self.chunks, "trades": self.trades, "quotes": self.quotes}, f)
+
+    async def close(self):
+        self.flush()
+        if self.writing is not None:
+            await self.writing
+        await asyncio.to_thread(self.write_manifest)
+
+def read_manifest(session: str) -> Dict[str, Any]:
+    with open(os.path.join(session_dir(session), "manifest.json")) as f:
+        return json.load(f)
+
+def session_summary(manifest: Dict[str, Any], active: bool = False) -> CaptureSession:
+    chunks = manifest.get("chunks", [])
+    def iso(ns):
+        return datetime.datetime.fromtimestamp(ns / 1_000_000_000).isoformat()
+    return CaptureSession(
+        session=manifest["session"],
+        chunks=len(chunks),
+        trades=manifest.get("trades", 0),
+        quotes=manifest.get("quotes", 0),
+        start=iso(min(c["start_ns"] for c in chunks)) if chunks else None,
+        end=iso(max(c["end_ns"] for c in chunks)) if chunks else None,
+        active=active
+    )
+
+def iter_capture(session: str):
+    """Yield (records, contract symbols) for each chunk of a capture, in order"""
+    manifest = read_manifest(session)
+    directory = session_dir(session)
+    for chunk in manifest["chunks"]:
+        with np.load(os.path.join(directory, chunk["file"])) as data:
+            yield data["records"], data["contracts"].tolist()
+
+def replay_capture(session: str, detector: FlowDetector, quote_book: LiveQuoteBook, speed: Optional[float] = None) -> Dict[str, int]:
+    """Feed a capture through a detector in timestamp order.
+
+    With speed=None records are replayed back to back; otherwise the original
+    gaps between records are reproduced divided by speed.
+    """
+    trades = quotes = 0
+    first_ts = None
+    started = time.time()
+    for records, symbols in iter_capture(session):
+        for ts_ns, kind, code, price, size, exchange, bid, ask, bid_size, ask_size in records.tolist():
+            if speed:
+                if first_ts is None:
+                    first_ts = ts_ns
+                delay = (ts_ns - first_ts) / 1_000_000_000 / speed - (time.time() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            if kind == KIND_TRADE:
+                detector.process_trade(symbols[code], price, size, exchange, ts_ns)
+                trades += 1
+            else:
+                quote_book.apply_event({"ev": "Q", "sym": symbols[code], "bp": bid, "ap": ask,
+                                        "bs": bid_size, "as": ask_size, "t": ts_ns // 1_000_000})
+                quotes += 1
+    detector.flush()
+    return {"trades": trades, "quotes": quotes}
+
+# The capture in progress, if any
+active_capture: Optional[OptionsCaptureWriter] = None
+
+def capture_stream_events(events: List[Dict[str, Any]]):
+    if active_capture is not None:
+        active_capture.on_stream_events(events)
+
+feed_manager.add_listener(capture_stream_events)
+
+# REST endpoint to start recording the live flow pipeline's input
+@router.post("/options/capture/start")
+async def start_capture(request: CaptureStartRequest) -> CaptureSession:
+    global active_capture
+    if active_capture is not None:
+        return CaptureSession(session=active_capture.session, chunks=len(active_capture.chunks), trades=active_capture.trades,
+                              quotes=active_capture.quotes, active=True, error="A capture is already running")
+    session = request.session or datetime.datetime.now().strftime("options-%Y%m%d-%H%M%S")
+    active_capture = OptionsCaptureWriter(session, request.include_quotes, request.chunk_records)
+    flow_detector.recorder = active_capture
+    print(f"Started options capture {session} in {active_capture.directory}")
+    return CaptureSession(session=session, chunks=0, trades=0, quotes=0, active=True)
+
+# REST endpoint to stop recording and finalize the capture
+@router.post("/options/capture/stop")
+async def stop_capture() -> CaptureSession:
+    global active_capture
+    if active_capture is None:
+        return CaptureSession(session="", chunks=0, trades=0, quotes=0, error="No capture is running")
+    writer = active_capture
+    active_capture = None
+    flow_detector.recorder = None
+    try:
+        await writer.close()
+        return session_summary(read_manifest(writer.session))
+    except Exception as e:
+        print(f"Error finalizing options capture {writer.session}: {e}")
+        return CaptureSession(session=writer.session, chunks=len(writer.chunks), trades=writer.trades, quotes=writer.quotes,
+                              error=f"Failed to finalize capture: {str(e)}")
+
+# REST endpoint to list recorded captures
+@router.get("/options/capture/sessions")
+async def list_captures() -> List[CaptureSession]:
+    sessions = []
+    if os.path.isdir(CAPTURE_DIR):
+        for name in sorted(os.listdir(CAPTURE_DIR)):
+            try:
+                manifest = read_manifest(name)
+                sessions.append(session_summary(manifest, active_capture is not None and active_capture.session == manifest["session"]))
+            except Exception as e:
+                print(f"Skipping unreadable capture {name}: {e}")
+    return sessions
+
+# REST endpoint to replay a capture through a fresh detector, e.g. to compare thresholds
+@router.post("/options/replay")
+async def replay_options_capture(request: ReplayRequest) -> ReplayResponse:
+    detector = FlowDetector(request.sweep_window_ms, request.block_min_size, request.block_min_premium,
+                            buffer_size=100_000, quote_book=LiveQuoteBook())
+    try:
+        started = time.time()
+        counts = await asyncio.to_thread(replay_capture, request.session, detector, detector.quote_book, request.speed)
+        elapsed = time.time() - started
+
+        store = detector.store
+        rows = np.arange(len(store))
+        events, total, _ = store.query(sort_by="premium", limit=max(0, request.limit))
+        return ReplayResponse(
+            session=request.session,
+            trades=counts["trades"],
+            quotes=counts["quotes"],
+            prints=total,
+            sweeps=int((store.type_code[rows] == 0).sum()),
+            blocks=int((store.type_code[rows] == 1).sum()),
+            total_premium=round(float(store.premium[rows].sum()), 2),
+            elapsed_seconds=round(elapsed, 3),
+            trades_per_second=round(counts["trades"] / elapsed, 1) if elapsed > 0 else 0.0,
+            data=[flow_item_from_event(event, get_symbol_sector(event["underlying"])) for event in events]
+        )
+    except Exception as e:
+        print(f"Error replaying options capture {request.session}: {e}")
+        return ReplayResponse(session=request.session, trades=0, quotes=0, prints=0, sweeps=0, blocks=0, total_premium=0,
+                              elapsed_seconds=0, trades_per_second=0, data=[], error=f"Failed to replay capture: {str(e)}")
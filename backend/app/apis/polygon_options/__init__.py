@@ -6,13 +6,43 @@ import asyncio
 import websockets
 import time
 import datetime
+import re
+import numpy as np
 from typing import Dict, List, Optional, Any
 
+# MessagePack is optional, clients asking for it get the packed binary frame otherwise
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
 router = APIRouter()
 
 # Models for API requests and responses
 class OptionsSymbolRequest(BaseModel):
     symbol: str
+    # Optional server-side chain filters
+    expirations: Optional[List[str]] = None  # Exact expiration dates (YYYY-MM-DD)
+    min_dte: Optional[int] = None
+    max_dte: Optional[int] = None
+    max_expirations: Optional[int] = None  # Only the next N matching expirations
+    strike_min: Optional[float] = None
+    strike_max: Optional[float] = None
+    strike_range_pct: Optional[float] = None  # Strike window around spot, e.g. 10 for +/-10%
+    min_delta: Optional[float] = None  # Absolute delta window, e.g. 0.2 to 0.8
+    max_delta: Optional[float] = None
+    contract_type: Optional[str] = None  # 'call' or 'put'
+    min_open_interest: Optional[int] = None
+    min_volume: Optional[int] = None
+    fields: Optional[List[str]] = None  # Contract fields to return, all when omitted
+
+class SyntheticChainRequest(BaseModel):
+    symbol: str
+    underlying_price: Optional[float] = None
+    num_expirations: Optional[int] = None
+    num_strikes: Optional[int] = None
+    seed: Optional[int] = None
 
 class OptionsChainResponse(BaseModel):
     symbol: str
@@ -25,8 +55,164 @@ class OptionsChainResponse(BaseModel):
 # Store active WebSocket connections
 active_connections: Dict[str, WebSocket] = {}
 
-# Store polygon.io WebSocket connection
-polygon_ws = None
+# OCC option symbol, e.g. O:SPY250117C00400000 (root, YYMMDD, C/P, strike * 1000)
+OCC_SYMBOL_PATTERN = re.compile(r'^(?:O:)?([A-Z0-9.]{1,6})(\d{6})([CP])(\d{8})$')
+
+def normalize_option_symbol(symbol: str) -> str:
+    """Return the canonical O:-prefixed form of an option symbol"""
+    symbol = symbol.upper()
+    return symbol if symbol.startswith("O:") else f"O:{symbol}"
+
+def parse_option_symbol(symbol: str) -> Optional[Dict[str, Any]]:
+    """Split an OCC option symbol into underlying, expiry, type and strike"""
+    match = OCC_SYMBOL_PATTERN.match(symbol.upper())
+    if not match:
+        return None
+    root, date_str, option_type, strike_str = match.groups()
+    return {
+        "underlying": root,
+        "expirationDate": f"20{date_str[0:2]}-{date_str[2:4]}-{date_str[4:6]}",
+        "contractType": "call" if option_type == "C" else "put",
+        "strike": int(strike_str) / 1000
+    }
+
+def price_or_nan(value) -> float:
+    # A zero bid is a real quote on deep out-of-the-money contracts, only a missing price is NaN
+    return np.nan if value is None else value
+
+class LiveQuoteBook:
+    """Latest bid/ask/last per option contract, updated in place from the stream.
+
+    Each contract owns a fixed slot in a set of preallocated NumPy columns, so a
+    stream event is a handful of array writes. Writes only happen on the event
+    loop and columns are swapped (never resized in place) when the book grows,
+    so readers can take values without any locking.
+    """
+    def __init__(self, capacity: int = 4096):
+        self.slots: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.by_underlying: Dict[str, List[int]] = {}
+        self.sequence = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        old_size = len(self.symbols)
+        columns = {
+            "bid": np.full(capacity, np.nan),
+            "ask": np.full(capacity, np.nan),
+            "bid_size": np.zeros(capacity, dtype=np.int64),
+            "ask_size": np.zeros(capacity, dtype=np.int64),
+            "last": np.full(capacity, np.nan),
+            "last_size": np.zeros(capacity, dtype=np.int64),
+            "volume": np.zeros(capacity, dtype=np.int64),
+            "updated": np.zeros(capacity, dtype=np.int64),  # Epoch milliseconds
+            "seq": np.zeros(capacity, dtype=np.int64),  # Book sequence of the last write
+        }
+        for name, column in columns.items():
+            if old_size:
+                column[:old_size] = getattr(self, name)[:old_size]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def slot_for(self, symbol: str) -> int:
+        """Get (or assign) the slot for a contract symbol"""
+        symbol = normalize_option_symbol(symbol)
+        slot = self.slots.get(symbol)
+        if slot is not None:
+            return slot
+        slot = len(self.symbols)
+        if slot >= self.capacity:
+            self._allocate(self.capacity * 2)
+        self.symbols.append(symbol)
+        self.slots[symbol] = slot
+        parsed = parse_option_symbol(symbol)
+        underlying = parsed["underlying"] if parsed else symbol
+        self.by_underlying.setdefault(underlying, []).append(slot)
+        return slot
+
+    def apply_event(self, event: Dict[str, Any]):
+        """Apply a single Polygon options stream event (T, Q or AM/A)"""
+        event_type = event.get("ev")
+        symbol = event.get("sym")
+        if not symbol or event_type not in ("T", "Q", "AM", "A"):
+            return
+        slot = self.slot_for(symbol)
+        if event_type == "T":
+            size = int(event.get("s") or 0)
+            self.last[slot] = price_or_nan(event.get("p"))
+            self.last_size[slot] = size
+            self.volume[slot] += size
+            self.updated[slot] = event.get("t") or int(time.time() * 1000)
+        elif event_type == "Q":
+            self.bid[slot] = price_or_nan(event.get("bp"))
+            self.ask[slot] = price_or_nan(event.get("ap"))
+            self.bid_size[slot] = int(event.get("bs") or 0)
+            self.ask_size[slot] = int(event.get("as") or 0)
+            self.updated[slot] = event.get("t") or int(time.time() * 1000)
+        else:
+            # Aggregates carry the bar close and the accumulated day volume
+            self.last[slot] = price_or_nan(event.get("c"))
+            if event.get("av"):
+                self.volume[slot] = int(event["av"])
+            self.updated[slot] = event.get("e") or int(time.time() * 1000)
+        self.sequence += 1
+        self.seq[slot] = self.sequence
+
+    def apply_events(self, events: List[Dict[str, Any]]):
+        for event in events:
+            if isinstance(event, dict):
+                self.apply_event(event)
+
+    def _row(self, slot: int) -> Dict[str, Any]:
+        def value(column):
+            v = column[slot]
+            return None if np.isnan(v) else float(v)
+        return {
+            "symbol": self.symbols[slot],
+            "bid": value(self.bid),
+            "ask": value(self.ask),
+            "bidSize": int(self.bid_size[slot]),
+            "askSize": int(self.ask_size[slot]),
+            "last": value(self.last),
+            "lastSize": int(self.last_size[slot]),
+            "volume": int(self.volume[slot]),
+            "updated": int(self.updated[slot])
+        }
+
+    def get_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Current quote for a contract, or None if it has not traded/quoted"""
+        slot = self.slots.get(normalize_option_symbol(symbol))
+        return self._row(slot) if slot is not None else None
+
+    def snapshot(self, underlying: str, since_seq: int = 0) -> List[Dict[str, Any]]:
+        """Quotes for an underlying's contracts changed after since_seq"""
+        slots = np.asarray(self.by_underlying.get(underlying.upper(), []), dtype=np.int64)
+        if since_seq and len(slots):
+            slots = slots[self.seq[slots] > since_seq]
+        return [self._row(int(slot)) for slot in slots]
+
+# Global live book shared by the stream, the chain endpoint and the gamma engine
+live_quote_book = LiveQuoteBook()
+
+def apply_live_quotes(chain_data: Dict[str, Dict[str, Dict[str, Any]]]) -> int:
+    """Overlay live bid/ask/last from the quote book onto chain contracts in place"""
+    updated = 0
+    if not live_quote_book.slots:
+        return updated
+    for expiry_chain in chain_data.values():
+        for side in ("calls", "puts"):
+            for contract in expiry_chain.get(side, {}).values():
+                quote = live_quote_book.get_quote(contract.get("symbol", ""))
+                if not quote:
+                    continue
+                if quote["bid"] is not None:
+                    contract["bidPrice"] = quote["bid"]
+                if quote["ask"] is not None:
+                    contract["askPrice"] = quote["ask"]
+                if quote["last"] is not None:
+                    contract["lastPrice"] = quote["last"]
+                updated += 1
+    return updated
 
 # Get Polygon API key
 def get_polygon_api_key():
@@ -35,74 +221,355 @@ def get_polygon_api_key():
         raise HTTPException(status_code=500, detail="Polygon API key not found")
     return api_key
 
-# Connect to Polygon WebSocket
-async def connect_to_polygon():
-    global polygon_ws
-    api_key = get_polygon_api_key()
-    
-    try:
-        # Connect to Polygon.io WebSocket (delayed endpoint based on documentation)
-        polygon_ws = await websockets.connect("wss://delayed.polygon.io/options")
-        
-        # Authenticate
-        auth_message = {"action": "auth", "params": api_key}
-        await polygon_ws.send(json.dumps(auth_message))
-        
-        # Verify authentication success
-        response = await polygon_ws.recv()
-        response_data = json.loads(response)
+# Resilient manager for the upstream Polygon options WebSocket
+class PolygonFeedManager:
+    """Keeps one upstream Polygon options socket alive for all clients.
+
+    The manager reconnects with exponential backoff, re-sends every active
+    subscription after a reconnect, treats a silent socket as dead (idle
+    timeout followed by a ping probe) and back-fills the gap from the REST
+    snapshot endpoint so the live book and clients pick up where they left off.
+    """
+    def __init__(self, url: str = "wss://delayed.polygon.io/options", channels: tuple = ("T", "Q", "AM"),
+                 idle_timeout: float = 30.0, initial_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.url = url
+        self.channels = channels
+        self.idle_timeout = idle_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.ws = None
+        self.connected = False
+        self.task: Optional[asyncio.Task] = None
+        # Reference counts per underlying, so a symbol stays subscribed while any client wants it
+        self.subscriptions: Dict[str, int] = {}
+        self.listeners: List[Any] = []
+        self.last_message_at = 0.0
+        self.disconnected_at: Optional[float] = None
+        self.reconnects = 0
+
+    def add_listener(self, callback):
+        """Register a callback that receives every batch of upstream events"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def ensure_started(self):
+        """Start the connection loop if it isn't already running"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def _params(self, symbols) -> str:
+        # "*" is the market-wide trade firehose used by the unusual-activity scanner
+        return ",".join(
+            "T.*" if symbol == "*" else f"{channel}.O:{symbol}*"
+            for symbol in symbols for channel in (("T",) if symbol == "*" else self.channels)
+        )
+
+    async def subscribe(self, symbol: str) -> bool:
+        symbol = symbol.upper()
+        self.ensure_started()
+        self.subscriptions[symbol] = self.subscriptions.get(symbol, 0) + 1
+        if self.subscriptions[symbol] == 1 and self.connected:
+            try:
+                await self.ws.send(json.dumps({"action": "subscribe", "params": self._params([symbol])}))
+            except Exception as e:
+                # The run loop resubscribes everything once it reconnects
+                print(f"Error subscribing to options data for {symbol}: {e}")
+        print(f"Subscribed to options data for {symbol}")
+        return True
+
+    async def unsubscribe(self, symbol: str):
+        symbol = symbol.upper()
+        count = self.subscriptions.get(symbol, 0) - 1
+        if count > 0:
+            self.subscriptions[symbol] = count
+            return
+        self.subscriptions.pop(symbol, None)
+        if self.connected:
+            try:
+                await self.ws.send(json.dumps({"action": "unsubscribe", "params": self._params([symbol])}))
+            except Exception as e:
+                print(f"Error unsubscribing from options data for {symbol}: {e}")
+
+    async def _connect(self):
+        api_key = get_polygon_api_key()
+        self.ws = await websockets.connect(self.url)
+        await self.ws.send(json.dumps({"action": "auth", "params": api_key}))
         
-        if not response_data or response_data[0]["status"] != "auth_success":
-            print(f"Authentication failed: {response_data}")
-            await polygon_ws.close()
-            polygon_ws = None
-            return False
+        # Polygon sends a "connected" status before the auth result
+        for _ in range(2):
+            response_data = json.loads(await asyncio.wait_for(self.ws.recv(), timeout=10.0))
+            statuses = [m.get("status") for m in response_data if isinstance(m, dict)]
+            if "auth_success" in statuses:
+                break
+            if "auth_failed" in statuses:
+                raise Exception(f"Authentication failed: {response_data}")
+        else:
+            raise Exception(f"Authentication not confirmed: {response_data}")
         
+        self.connected = True
+        self.last_message_at = time.time()
         print("Successfully connected to Polygon.io WebSocket")
-        return True
-    except Exception as e:
-        print(f"Error connecting to Polygon.io WebSocket: {e}")
-        if polygon_ws:
-            await polygon_ws.close()
-        polygon_ws = None
-        return False
+
+    async def run(self):
+        backoff = self.initial_backoff
+        while True:
+            try:
+                await self._connect()
+                backoff = self.initial_backoff
+                if self.subscriptions:
+                    await self.ws.send(json.dumps({"action": "subscribe", "params": self._params(self.subscriptions)}))
+                    print(f"Resubscribed to {len(self.subscriptions)} options symbols")
+                if self.disconnected_at is not None:
+                    asyncio.create_task(self.backfill(list(self.subscriptions)))
+                await self._read_loop()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Polygon options feed error: {e}")
+            finally:
+                if self.connected:
+                    self.disconnected_at = time.time()
+                self.connected = False
+                if self.ws:
+                    try:
+                        await self.ws.close()
+                    except Exception:
+                        pass
+                self.ws = None
+            
+            # Exponential backoff with jitter before the next attempt
+            delay = backoff * (0.5 + np.random.random())
+            self.reconnects += 1
+            print(f"Reconnecting to Polygon.io in {delay:.1f}s (attempt {self.reconnects})")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _read_loop(self):
+        while True:
+            try:
+                raw = await asyncio.wait_for(self.ws.recv(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Quiet markets are normal, a socket that won't answer a ping isn't
+                pong = await self.ws.ping()
+                await asyncio.wait_for(pong, timeout=10.0)
+                continue
+            self.last_message_at = time.time()
+            events = json.loads(raw)
+            if isinstance(events, dict):
+                events = [events]
+            events = [e for e in events if isinstance(e, dict) and e.get("ev") != "status"]
+            if events:
+                await self.dispatch(events)
+
+    async def dispatch(self, events: List[Dict[str, Any]]):
+        """Push a batch of events into the live book, listeners and clients"""
+        live_quote_book.apply_events(events)
+        for listener in self.listeners:
+            try:
+                listener(events)
+            except Exception as e:
+                print(f"Error in options feed listener: {e}")
+        await broadcast_events(events)
+
+    async def backfill(self, symbols: List[str]):
+        """Fill the gap left by a disconnect from the REST snapshot endpoint"""
+        import requests
+        gap = time.time() - (self.disconnected_at or time.time())
+        print(f"Back-filling {len(symbols)} symbols after a {gap:.1f}s gap")
+        api_key = get_polygon_api_key()
+        for symbol in symbols:
+            url = f"https://api.polygon.io/v3/snapshot/options/{symbol}?limit=250&apiKey={api_key}"
+            try:
+                response = await asyncio.to_thread(requests.get, url, timeout=10.0)
+                if response.status_code != 200:
+                    print(f"Back-fill snapshot error for {symbol}: {response.status_code}")
+                    continue
+                events = snapshot_results_to_events(response.json().get("results", []))
+                if events:
+                    await self.dispatch(events)
+            except Exception as e:
+                print(f"Error back-filling {symbol}: {e}")
+        self.disconnected_at = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "subscriptions": sorted(self.subscriptions),
+            "reconnects": self.reconnects,
+            "last_message_at": self.last_message_at,
+            "disconnected_at": self.disconnected_at
+        }
+
+def snapshot_results_to_events(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Convert REST snapshot results into stream-shaped quote/aggregate events.
+
+    Back-filled events are tagged so trade consumers can tell them apart from
+    real prints.
+    """
+    events = []
+    for result in results:
+        ticker = result.get("details", {}).get("ticker")
+        if not ticker:
+            continue
+        last_quote = result.get("last_quote", {})
+        last_trade = result.get("last_trade", {})
+        day_data = result.get("day", {})
+        if last_quote.get("bid") is not None or last_quote.get("ask") is not None:
+            events.append({
+                "ev": "Q", "sym": ticker, "backfill": True,
+                "bp": last_quote.get("bid"), "ap": last_quote.get("ask"),
+                "bs": last_quote.get("bid_size", 0), "as": last_quote.get("ask_size", 0),
+                "t": (last_quote.get("last_updated") or 0) // 1_000_000
+            })
+        close = last_trade.get("price") or day_data.get("close")
+        if close:
+            events.append({
+                "ev": "A", "sym": ticker, "backfill": True,
+                "c": close, "av": day_data.get("volume", 0),
+                "e": (last_trade.get("sip_timestamp") or 0) // 1_000_000
+            })
+    return events
+
+# Global feed manager
+feed_manager = PolygonFeedManager()
+
+# Client subscriptions per client id (underlying symbols)
+client_subscriptions: Dict[str, set] = {}
+
+# Wire format chosen by each client for tick batches
+client_formats: Dict[str, str] = {}
+
+# Tick batch wire formats. "json" is the verbose default; "binary" is a packed frame:
+#   b"OT", version (u8), symbol count (u16), then per symbol: length (u8) + ASCII bytes,
+#   then record count (u32) followed by little-endian TICK_RECORD_DTYPE records.
+# "msgpack" sends the same compact tuples as MessagePack when the package is installed.
+WIRE_FORMATS = ("json", "binary", "msgpack")
+TICK_FRAME_MAGIC = b"OT"
+TICK_FRAME_VERSION = 1
+EVENT_CODES = {"T": 1, "Q": 2, "AM": 3, "A": 4}
+TICK_RECORD_DTYPE = np.dtype([
+    ("sym", "<u2"),     # Index into the frame's symbol table
+    ("ev", "u1"),       # EVENT_CODES value
+    ("price", "<f8"),   # Trade price, bid, or bar close
+    ("price2", "<f8"),  # Ask (quotes only, NaN otherwise)
+    ("size", "<u4"),    # Trade size, bid size, or accumulated volume
+    ("size2", "<u4"),   # Ask size (quotes only)
+    ("t", "<u8"),       # Epoch milliseconds
+])
+
+def compact_tick(event: Dict[str, Any]) -> tuple:
+    """Map a stream event onto (sym, ev, price, price2, size, size2, t)"""
+    event_type = event.get("ev")
+    if event_type == "Q":
+        return (event.get("sym"), EVENT_CODES["Q"], price_or_nan(event.get("bp")), price_or_nan(event.get("ap")),
+                int(event.get("bs") or 0), int(event.get("as") or 0), int(event.get("t") or 0))
+    if event_type in ("AM", "A"):
+        return (event.get("sym"), EVENT_CODES[event_type], price_or_nan(event.get("c")), np.nan,
+                int(event.get("av") or event.get("v") or 0), 0, int(event.get("e") or 0))
+    return (event.get("sym"), EVENT_CODES["T"], price_or_nan(event.get("p")), np.nan,
+            int(event.get("s") or 0), 0, int(event.get("t") or 0))
+
+def encode_tick_batch(events: List[Dict[str, Any]], wire_format: str = "json"):
+    """Encode a batch of stream events once, ready to be sent to any number of clients"""
+    if wire_format == "json":
+        return json.dumps(events)
+    
+    ticks = [compact_tick(event) for event in events if event.get("ev") in EVENT_CODES and event.get("sym")]
+    if wire_format == "msgpack" and MSGPACK_AVAILABLE:
+        return msgpack.packb(ticks, use_bin_type=True)
+    
+    symbols: Dict[str, int] = {}
+    records = np.zeros(len(ticks), dtype=TICK_RECORD_DTYPE)
+    for i, (sym, code, price, price2, size, size2, timestamp) in enumerate(ticks):
+        records[i] = (symbols.setdefault(sym, len(symbols)), code, price, price2, size, size2, timestamp)
+    header = bytearray(TICK_FRAME_MAGIC)
+    header += np.array([TICK_FRAME_VERSION], dtype="u1").tobytes()
+    header += np.array([len(symbols)], dtype="<u2").tobytes()
+    for sym in symbols:
+        encoded_sym = sym.encode("ascii")
+        header += bytes([len(encoded_sym)]) + encoded_sym
+    header += np.array([len(records)], dtype="<u4").tobytes()
+    return bytes(header) + records.tobytes()
+
+async def send_frame(websocket: WebSocket, frame):
+    """Send a pre-encoded frame as text or binary"""
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+async def broadcast_events(events: List[Dict[str, Any]]):
+    """Forward upstream events to the clients subscribed to their underlying.
+
+    Each underlying's batch is encoded at most once per wire format and the same
+    frame is shared by every subscriber using that format.
+    """
+    by_underlying: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        parsed = parse_option_symbol(event.get("sym", ""))
+        if parsed:
+            by_underlying.setdefault(parsed["underlying"], []).append(event)
+    
+    frames: Dict[tuple, Any] = {}
+    for client_id, symbols in list(client_subscriptions.items()):
+        websocket = active_connections.get(client_id)
+        if not websocket:
+            continue
+        wire_format = client_formats.get(client_id, "json")
+        for symbol in symbols:
+            batch = by_underlying.get(symbol)
+            if not batch:
+                continue
+            key = (symbol, wire_format)
+            if key not in frames:
+                frames[key] = encode_tick_batch(batch, wire_format)
+            try:
+                await send_frame(websocket, frames[key])
+            except Exception as e:
+                print(f"Error sending options data to client {client_id}: {e}")
+                break
+
+# Connect to Polygon WebSocket (the feed manager owns the connection and retries on its own)
+async def connect_to_polygon():
+    feed_manager.ensure_started()
+    return True
 
 # Subscribe to options for a symbol
 async def subscribe_to_options(symbol: str):
-    if not polygon_ws:
-        success = await connect_to_polygon()
-        if not success:
-            return False
-    
-    try:
-        # Format for options is typically: AM.O:SYMBOL
-        subscribe_message = {"action": "subscribe", "params": f"AM.O:{symbol}*"}
-        await polygon_ws.send(json.dumps(subscribe_message))
-        print(f"Subscribed to options data for {symbol}")
-        return True
-    except Exception as e:
-        print(f"Error subscribing to options data: {e}")
-        return False
+    return await feed_manager.subscribe(symbol)
 
 # WebSocket endpoint for streaming options data
 @router.websocket("/ws/options/{client_id}")
-async def websocket_options_endpoint(websocket: WebSocket, client_id: str):
+async def websocket_options_endpoint(websocket: WebSocket, client_id: str, format: str = "json"):
     print(f"WebSocket connection attempt from client {client_id}")
     await websocket.accept()
     active_connections[client_id] = websocket
+    client_formats[client_id] = format if format in WIRE_FORMATS else "json"
     print(f"Client {client_id} connected successfully")
     
     # For testing, send a simple success message immediately
     await websocket.send_json({"status": "connected", "message": "WebSocket connection established"})
     
+    # Conflated snapshot tasks for this client, keyed by underlying symbol
+    snapshot_tasks: Dict[str, asyncio.Task] = {}
+    
+    async def send_snapshots(symbol: str, interval: float):
+        # Only the latest state of each contract changed since the last send goes out,
+        # however many ticks arrived in between
+        last_seq = 0
+        while True:
+            quotes = live_quote_book.snapshot(symbol, since_seq=last_seq)
+            last_seq = live_quote_book.sequence
+            if quotes:
+                await websocket.send_json({"type": "snapshot", "symbol": symbol, "quotes": quotes})
+            await asyncio.sleep(interval)
+    
+    # Underlying symbols this client receives upstream events for
+    client_subscriptions[client_id] = set()
+    
     try:
-        # Connect to Polygon if not already connected
-        if not polygon_ws:
-            success = await connect_to_polygon()
-            if not success:
-                await websocket.send_json({"error": "Failed to connect to Polygon.io"})
-                await websocket.close()
-                return
+        # Make sure the upstream feed is running, the manager keeps retrying on its own
+        await connect_to_polygon()
         
         # Listen for messages from client (to subscribe to specific symbols)
         async def receive_from_client():
@@ -113,26 +580,62 @@ async def websocket_options_endpoint(websocket: WebSocket, client_id: str):
                     print(f"Received from client: {message}")
                     
                     if message.get("action") == "subscribe" and message.get("symbol"):
-                        symbol = message["symbol"]
-                        success = await subscribe_to_options(symbol)
+                        symbol = message["symbol"].upper()
+                        success = True
+                        if symbol not in client_subscriptions[client_id]:
+                            success = await subscribe_to_options(symbol)
                         
                         if success:
+                            client_subscriptions[client_id].add(symbol)
                             await websocket.send_json({"status": "subscribed", "symbol": symbol})
                         else:
                             await websocket.send_json({"error": f"Failed to subscribe to {symbol}"})
+                    
+                    elif message.get("action") == "format" and message.get("format") in WIRE_FORMATS:
+                        # Opt in to a compact tick encoding; control messages stay JSON
+                        client_formats[client_id] = message["format"]
+                        effective = message["format"]
+                        if effective == "msgpack" and not MSGPACK_AVAILABLE:
+                            effective = "binary"
+                        await websocket.send_json({"status": "format", "format": effective})
+                    
+                    elif message.get("action") == "unsubscribe" and message.get("symbol"):
+                        symbol = message["symbol"].upper()
+                        if symbol in client_subscriptions[client_id]:
+                            client_subscriptions[client_id].discard(symbol)
+                            await feed_manager.unsubscribe(symbol)
+                        await websocket.send_json({"status": "unsubscribed", "symbol": symbol})
+                    
+                    elif message.get("action") == "snapshot" and message.get("symbol"):
+                        symbol = message["symbol"].upper()
+                        # Clamp the interval so a client can't spin the loop
+                        interval = min(max(float(message.get("interval", 1.0)), 0.1), 60.0)
+                        if symbol in snapshot_tasks:
+                            snapshot_tasks[symbol].cancel()
+                        snapshot_tasks[symbol] = asyncio.create_task(send_snapshots(symbol, interval))
+                        await websocket.send_json({"status": "snapshot_subscribed", "symbol": symbol, "interval": interval})
+                    
+                    elif message.get("action") == "unsnapshot" and message.get("symbol"):
+                        symbol = message["symbol"].upper()
+                        task = snapshot_tasks.pop(symbol, None)
+                        if task:
+                            task.cancel()
+                        await websocket.send_json({"status": "snapshot_unsubscribed", "symbol": symbol})
             except Exception as e:
                 print(f"Error receiving from client: {e}")
         
-        # Forward messages from Polygon to client
+        # Real upstream events reach the client through broadcast_events; while the
+        # upstream feed is down, keep the client alive with synthetic data instead
         async def forward_from_polygon():
             try:
-                # For testing, generate some synthetic options data
                 count = 0
                 # First send an immediate message to confirm connection
-                await websocket.send_json({"status": "connected", "message": "WebSocket connection active and sending synthetic data"})
+                await websocket.send_json({"status": "connected", "message": "WebSocket connection active"})
                 
                 while True:
                     await asyncio.sleep(5)  # Send a message every 5 seconds
+                    if feed_manager.connected:
+                        continue
                     count += 1
                     
                     # Log that we're about to send data
@@ -179,20 +682,13 @@ async def websocket_options_endpoint(websocket: WebSocket, client_id: str):
                                 "t": int(time.time() * 1000)  # Current timestamp
                             })
                     
-                    # Send synthetic data
-                    await websocket.send_json(sample_data)
+                    # Synthetic ticks go to this client only; the shared live book holds real data alone
+                    await send_frame(websocket, encode_tick_batch(sample_data, client_formats.get(client_id, "json")))
                     print(f"Sent {len(sample_data)} synthetic option trades")
                     
                     # Every 3rd message, also send a different event type
                     if count % 3 == 0:
                         await websocket.send_json([{"status": "connected", "message": f"Connection active, sent {count} updates"}])
-                    
-                    
-                    # If we had a real connection:
-                    # if polygon_ws:
-                    #     data = await polygon_ws.recv()
-                    #     # Forward the raw message to the client
-                    #     await websocket.send_text(data)
             except Exception as e:
                 print(f"Error forwarding from Polygon: {e}")
         
@@ -200,26 +696,200 @@ async def websocket_options_endpoint(websocket: WebSocket, client_id: str):
         receive_task = asyncio.create_task(receive_from_client())
         forward_task = asyncio.create_task(forward_from_polygon())
         
-        # Wait for either task to complete
-        await asyncio.gather(receive_task, forward_task)
+        # The receive task ends when the client goes away; the forward task would
+        # otherwise run forever, so stop whichever is still going
+        done, pending = await asyncio.wait([receive_task, forward_task], return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
         
     except WebSocketDisconnect:
         print(f"Client {client_id} disconnected")
     except Exception as e:
         print(f"Error in websocket connection: {e}")
     finally:
+        for task in snapshot_tasks.values():
+            task.cancel()
+        # Release this client's upstream subscriptions
+        for symbol in client_subscriptions.pop(client_id, set()):
+            await feed_manager.unsubscribe(symbol)
+        client_formats.pop(client_id, None)
         if client_id in active_connections:
             del active_connections[client_id]
 
-# REST endpoint to fetch options chain data using Polygon.io snapshot API
+# REST endpoint to check the health of the upstream options feed
+@router.get("/options/feed/status")
+async def get_options_feed_status():
+    return feed_manager.status()
+
+# REST endpoint to read live quotes for an underlying straight from the book
+@router.get("/options/quotes/{symbol}")
+async def get_live_option_quotes(symbol: str, since_seq: int = 0):
+    symbol = symbol.upper()
+    return {
+        "symbol": symbol,
+        "sequence": live_quote_book.sequence,
+        "quotes": live_quote_book.snapshot(symbol, since_seq=since_seq)
+    }
+
+# How long an indexed chain is served from memory before it is fetched again
+CHAIN_CACHE_TTL = 60.0
+
+# Indexed chains per underlying symbol
+indexed_chain_cache: Dict[str, "IndexedChain"] = {}
+
+# Contract fields a client can project onto
+CONTRACT_FIELDS = {
+    "id", "symbol", "name", "strike", "expirationDate", "contractType", "lastPrice", "change",
+    "bidPrice", "askPrice", "volume", "openInterest", "impliedVolatility", "inTheMoney"
+}
+
+def black_scholes_delta(S, K, T, sigma, is_call, r: float = 0.04):
+    """Vectorized Black-Scholes delta over NumPy arrays"""
+    from scipy.stats import norm
+    d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
+    return np.where(is_call, norm.cdf(d1), norm.cdf(d1) - 1)
+
+class IndexedChain:
+    """An options chain held as NumPy columns sorted by (expiry, strike).
+
+    Expiry offsets give each expiration's row range and strikes are sorted
+    inside it, so expiry and strike windows resolve to slices via
+    searchsorted; the remaining predicates are vectorized masks over just
+    those rows. Contract dicts are only touched for the rows returned.
+    """
+    def __init__(self, response: OptionsChainResponse):
+        self.response = response
+        self.created = time.time()
+        self.symbol = response.symbol
+        self.underlying_price = response.underlyingPrice or 0.0
+        self.expirations = sorted(response.chain.keys())
+        
+        today = datetime.date.today()
+        self.dte = np.array([(datetime.date.fromisoformat(e) - today).days for e in self.expirations], dtype=np.int64)
+        
+        contracts, expiry_idx = [], []
+        for i, expiry in enumerate(self.expirations):
+            rows = list(response.chain[expiry].get("calls", {}).values()) + list(response.chain[expiry].get("puts", {}).values())
+            rows.sort(key=lambda c: float(c.get("strike") or 0))
+            contracts.extend(rows)
+            expiry_idx.extend([i] * len(rows))
+        self.contracts = contracts
+        self.expiry_idx = np.asarray(expiry_idx, dtype=np.int64)
+        self.offsets = np.searchsorted(self.expiry_idx, np.arange(len(self.expirations) + 1))
+        self.strike = np.array([float(c.get("strike") or 0) for c in contracts], dtype=np.float64)
+        self.is_call = np.array([c.get("contractType") == "call" for c in contracts], dtype=bool)
+        self.open_interest = np.array([c.get("openInterest") or 0 for c in contracts], dtype=np.int64)
+        self.volume = np.array([c.get("volume") or 0 for c in contracts], dtype=np.int64)
+        
+        # Delta from the contract IV (percent, as in the gamma engine), 30% when missing
+        iv = np.array([c.get("impliedVolatility") or 30.0 for c in contracts], dtype=np.float64) / 100
+        T = np.maximum(self.dte[self.expiry_idx], 1) / 365.0 if len(contracts) else np.zeros(0)
+        if self.underlying_price > 0 and len(contracts):
+            self.abs_delta = np.abs(black_scholes_delta(self.underlying_price, np.maximum(self.strike, 0.01), T, np.maximum(iv, 0.01), self.is_call))
+        else:
+            self.abs_delta = np.full(len(contracts), np.nan)
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.created < CHAIN_CACHE_TTL
+
+    def select_expiries(self, request: OptionsSymbolRequest) -> np.ndarray:
+        selected = np.arange(len(self.expirations))
+        if request.expirations:
+            wanted = set(request.expirations)
+            selected = np.array([i for i in selected if self.expirations[i] in wanted], dtype=np.int64)
+        if request.min_dte is not None:
+            selected = selected[self.dte[selected] >= request.min_dte]
+        if request.max_dte is not None:
+            selected = selected[self.dte[selected] <= request.max_dte]
+        if request.max_expirations:
+            selected = selected[:request.max_expirations]
+        return selected
+
+    def strike_window(self, request: OptionsSymbolRequest):
+        low, high = -np.inf, np.inf
+        if request.strike_range_pct is not None and self.underlying_price > 0:
+            low = self.underlying_price * (1 - request.strike_range_pct / 100)
+            high = self.underlying_price * (1 + request.strike_range_pct / 100)
+        if request.strike_min is not None:
+            low = max(low, request.strike_min)
+        if request.strike_max is not None:
+            high = min(high, request.strike_max)
+        return low, high
+
+    def query(self, request: OptionsSymbolRequest) -> OptionsChainResponse:
+        # Row ranges for the selected expiries, narrowed to the strike window
+        low, high = self.strike_window(request)
+        ranges = []
+        for e in self.select_expiries(request):
+            start, end = self.offsets[e], self.offsets[e + 1]
+            strikes = self.strike[start:end]
+            lo = start + np.searchsorted(strikes, low, side="left")
+            hi = start + np.searchsorted(strikes, high, side="right")
+            if hi > lo:
+                ranges.append(np.arange(lo, hi))
+        rows = np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+        
+        # Remaining predicates as masks over the surviving rows only
+        mask = np.ones(len(rows), dtype=bool)
+        if request.contract_type in ("call", "put"):
+            mask &= self.is_call[rows] == (request.contract_type == "call")
+        if request.min_open_interest:
+            mask &= self.open_interest[rows] >= request.min_open_interest
+        if request.min_volume:
+            mask &= self.volume[rows] >= request.min_volume
+        if request.min_delta is not None:
+            mask &= self.abs_delta[rows] >= request.min_delta
+        if request.max_delta is not None:
+            mask &= self.abs_delta[rows] <= request.max_delta
+        rows = rows[mask]
+        
+        fields = [f for f in request.fields if f in CONTRACT_FIELDS] if request.fields else None
+        chain_data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for row in rows.tolist():
+            contract = self.contracts[row]
+            expiry = self.expirations[self.expiry_idx[row]]
+            side = "calls" if self.is_call[row] else "puts"
+            entry = chain_data.setdefault(expiry, {"calls": {}, "puts": {}})
+            # Keyed like the unfiltered chain, so a contract has the same key in both
+            entry[side][str(contract.get("strike"))] = {f: contract.get(f) for f in fields} if fields else dict(contract)
+        
+        return OptionsChainResponse(
+            symbol=self.symbol,
+            expirations=sorted(chain_data.keys()),
+            strikes=np.unique(self.strike[rows]).tolist() if len(rows) else [],
+            underlyingPrice=self.response.underlyingPrice,
+            chain=chain_data
+        )
+
+def has_chain_filters(request: OptionsSymbolRequest) -> bool:
+    # Zero is a real bound (max_dte=0 is 0DTE only), so only unset and empty values mean no filter
+    return any(getattr(request, name) is not None and getattr(request, name) != [] for name in (
+        "expirations", "min_dte", "max_dte", "max_expirations", "strike_min", "strike_max", "strike_range_pct",
+        "min_delta", "max_delta", "contract_type", "min_open_interest", "min_volume", "fields"
+    ))
+
+# REST endpoint to fetch options chain data, optionally filtered server-side
 @router.post("/options/chain")
 async def get_options_chain(request: OptionsSymbolRequest):
+    symbol = request.symbol.upper()
+    
+    indexed = indexed_chain_cache.get(symbol)
+    if indexed is None or not indexed.is_fresh():
+        response = await asyncio.to_thread(fetch_options_chain, symbol)
+        if response.error or not response.chain:
+            return response
+        indexed = IndexedChain(response)
+        indexed_chain_cache[symbol] = indexed
+    
+    result = indexed.query(request) if has_chain_filters(request) else indexed.response
+    # Cached contracts still pick up the latest streamed quotes
+    apply_live_quotes(result.chain)
+    return result
+
+# Fetch options chain data using Polygon.io snapshot API
+def fetch_options_chain(symbol: str) -> OptionsChainResponse:
     import requests
-    import datetime
-    import json
-    from random import uniform
     
-    symbol = request.symbol.upper()
     api_key = get_polygon_api_key()
     
     try:
@@ -313,27 +983,11 @@ async def get_options_chain(request: OptionsSymbolRequest):
                 # If we got data from the API but no underlying price, estimate it
                 if underlying_price is None:
                     # Use common price ranges for popular symbols
-                    if symbol == "SPY":
-                        underlying_price = 400.0
-                    elif symbol == "QQQ":
-                        underlying_price = 350.0
-                    elif symbol == "AAPL":
-                        underlying_price = 175.0
-                    elif symbol == "MSFT":
-                        underlying_price = 350.0
-                    elif symbol == "GOOGL":
-                        underlying_price = 150.0
-                    elif symbol == "AMZN":
-                        underlying_price = 180.0
-                    elif symbol == "TSLA":
-                        underlying_price = 200.0
-                    elif symbol == "META":
-                        underlying_price = 450.0
-                    elif symbol == "NVDA":
-                        underlying_price = 850.0
-                    else:
-                        underlying_price = 100.0
+                    underlying_price = SYNTHETIC_BASE_PRICES.get(symbol, 100.0)
                         
+                # Overlay the latest streamed quotes, no extra upstream call needed
+                apply_live_quotes(chain_data)
+                
                 # If we only got one expiration date from the API, generate more
                 if len(expirations_list) <= 1:
                     print(f"Only found {len(expirations_list)} expiration dates from API. Generating more synthetic ones.")
@@ -369,8 +1023,130 @@ async def get_options_chain(request: OptionsSymbolRequest):
             error=f"Failed to generate options data: {str(e)}"
         )
     
+# Typical prices used when no quote is available
+SYNTHETIC_BASE_PRICES = {
+    "SPY": 400.0, "QQQ": 350.0, "AAPL": 175.0, "MSFT": 350.0, "GOOGL": 150.0,
+    "AMZN": 180.0, "TSLA": 200.0, "META": 450.0, "NVDA": 850.0
+}
+
+def synthetic_expiration_dates(today: datetime.date, num_weeklies: int = 6, num_monthlies: int = 6) -> List[datetime.date]:
+    """The next weekly Fridays followed by the monthly third Fridays after them"""
+    days_until_friday = (4 - today.weekday()) % 7 or 7
+    next_friday = today + datetime.timedelta(days=days_until_friday)
+    dates = [next_friday + datetime.timedelta(weeks=i) for i in range(num_weeklies)]
+    last_date = dates[-1] if dates else today
+    month_offset = 0
+    while len(dates) < num_weeklies + num_monthlies:
+        month = (today.month - 1 + month_offset) % 12 + 1
+        year = today.year + (today.month - 1 + month_offset) // 12
+        first_day = datetime.date(year, month, 1)
+        third_friday = first_day + datetime.timedelta(days=(4 - first_day.weekday()) % 7 + 14)
+        if third_friday > last_date:
+            dates.append(third_friday)
+        month_offset += 1
+    return dates
+
+def synthetic_strike_grid(underlying_price: float, num_strikes: Optional[int] = None, strike_range: float = 0.15) -> np.ndarray:
+    """Listed-style strike ladder around the underlying price"""
+    interval = 1.0 if underlying_price < 50 else (2.5 if underlying_price < 100 else (5.0 if underlying_price < 1000 else 10.0))
+    center = round(underlying_price / interval) * interval
+    if num_strikes:
+        half = num_strikes // 2
+        # Very wide ladders switch to finer increments rather than running below zero
+        while interval > 0.5 and center - interval * half <= 0:
+            interval = 2.5 if interval > 2.5 else (1.0 if interval > 1.0 else 0.5)
+        strikes = center + interval * np.arange(-half, num_strikes - half)
+    else:
+        steps = int(underlying_price * strike_range / interval)
+        strikes = center + interval * np.arange(-steps, steps + 1)
+    return np.round(strikes[strikes > 0], 2)
+
+def simulate_options_chain(symbol: str, underlying_price: float, expirations: List[datetime.date], strikes: np.ndarray,
+                           seed: Optional[int] = None, risk_free_rate: float = 0.04, base_vol: float = 0.25) -> Dict[str, np.ndarray]:
+    """Simulate a full chain as NumPy columns, one row per contract.
+
+    Prices are Black-Scholes values off a skewed volatility smile, quotes are
+    spread around them, and open interest clusters near the money, at round
+    strikes and in monthly expirations. The same seed always yields the same chain.
+    """
+    from scipy.stats import norm
+    rng = np.random.default_rng(seed)
+    today = datetime.date.today()
+    
+    # Grid of expiry x strike x (call, put), flattened to one row per contract
+    n_exp, n_strike = len(expirations), len(strikes)
+    days = np.array([(d - today).days for d in expirations], dtype=np.float64)
+    is_monthly = np.array([15 <= d.day <= 21 for d in expirations])
+    exp_idx = np.repeat(np.arange(n_exp), n_strike * 2)
+    K = np.tile(np.repeat(strikes, 2), n_exp)
+    is_call = np.tile(np.array([True, False]), n_exp * n_strike)
+    T = np.maximum(days[exp_idx], 1.0) / 365.0
+    S = underlying_price
+    
+    # Volatility: term structure plus a put skew and smile in standardized moneyness
+    moneyness = np.log(K / S) / np.sqrt(T)
+    atm_vol = base_vol * (1 + 0.15 * np.exp(-T * 12)) * rng.uniform(0.9, 1.1)
+    iv = atm_vol * (1 - 0.9 * moneyness * base_vol + 1.6 * (moneyness * base_vol) ** 2)
+    iv = np.clip(iv * rng.normal(1.0, 0.01, iv.shape), 0.05, 3.0)
+    
+    # Black-Scholes prices
+    sqrt_T = np.sqrt(T)
+    d1 = (np.log(S / K) + (risk_free_rate + 0.5 * iv ** 2) * T) / (iv * sqrt_T)
+    d2 = d1 - iv * sqrt_T
+    discount = K * np.exp(-risk_free_rate * T)
+    price = np.where(is_call, S * norm.cdf(d1) - discount * norm.cdf(d2), discount * norm.cdf(-d2) - S * norm.cdf(-d1))
+    price = np.maximum(price, 0.01)
+    delta = np.where(is_call, norm.cdf(d1), norm.cdf(d1) - 1)
+    
+    # Quotes: wider spreads on pricier and far OTM contracts, penny ticks under $3
+    tick = np.where(price < 3, 0.01, 0.05)
+    half_spread = np.maximum(tick, price * rng.uniform(0.01, 0.04, price.shape) * (1 + np.abs(moneyness)))
+    bid = np.maximum(np.round((price - half_spread) / tick) * tick, 0.0)
+    ask = np.round((price + half_spread) / tick) * tick
+    last = np.clip(price + rng.normal(0, 0.25, price.shape) * half_spread, bid, ask)
+    
+    # Open interest: log-normal, concentrated near the money, at round strikes and in monthlies
+    near_money = np.exp(-0.5 * (np.abs(delta) - 0.5) ** 2 / 0.04)
+    round_strike = np.where(K % 10 == 0, 1.8, np.where(K % 5 == 0, 1.3, 1.0))
+    expiry_weight = np.where(is_monthly[exp_idx], 2.5, 1.0) / (1 + T * 2)
+    open_interest = (rng.lognormal(7.0, 1.0, price.shape) * near_money * round_strike * expiry_weight).astype(np.int64)
+    volume = (open_interest * rng.beta(1.2, 12, price.shape) * (1 + 2 / (days[exp_idx] + 1))).astype(np.int64)
+    change = np.round(price * rng.normal(0, 0.08, price.shape), 2)
+    
+    # OCC symbols
+    date_codes = np.array([d.strftime("%y%m%d") for d in expirations])
+    strike_codes = np.char.zfill(np.round(K * 1000).astype(np.int64).astype(str), 8)
+    occ = np.char.add(np.char.add(np.char.add(f"O:{symbol}", date_codes[exp_idx]), np.where(is_call, "C", "P")), strike_codes)
+    
+    return {
+        "symbol": occ,
+        "expiry_index": exp_idx,
+        "strike": K,
+        "is_call": is_call,
+        "last": np.round(last, 2),
+        "bid": np.round(bid, 2),
+        "ask": np.round(ask, 2),
+        "change": change,
+        "volume": volume,
+        "open_interest": open_interest,
+        "iv": iv,
+        "delta": delta
+    }
+
+# REST endpoint to generate a seeded synthetic chain of a chosen size, for offline load testing
+@router.post("/options/chain/synthetic")
+async def get_synthetic_options_chain(request: SyntheticChainRequest) -> OptionsChainResponse:
+    return generate_synthetic_options_data(
+        request.symbol.upper(),
+        underlying_price=request.underlying_price,
+        seed=request.seed,
+        num_expirations=request.num_expirations,
+        num_strikes=request.num_strikes
+    )
+
 # Helper function to generate synthetic options data
-def generate_synthetic_options_data(symbol, underlying_price=None, existing_expirations=None, existing_strikes=None, existing_chain_data=None):
+def generate_synthetic_options_data(symbol, underlying_price=None, existing_expirations=None, existing_strikes=None, existing_chain_data=None,
+                                    seed=None, num_expirations=None, num_strikes=None):
     """Generate synthetic options data for a given symbol.
     
     Args:
@@ -379,174 +1155,90 @@ def generate_synthetic_options_data(symbol, underlying_price=None, existing_expi
         existing_expirations: List of existing expiration dates to include
         existing_strikes: List of existing strike prices to include
         existing_chain_data: Existing chain data to merge with synthetic data
+        seed: Random seed for a reproducible chain
+        num_expirations: Number of expirations to generate (defaults to 6 weekly + 6 monthly)
+        num_strikes: Strikes per expiration (defaults to a +/-15% ladder)
         
     Returns:
         OptionsChainResponse with synthetic data
     """
-    from random import uniform
-    
     try:
-        today = datetime.datetime.now()
-        expirations = existing_expirations or []
+        rng = np.random.default_rng(seed)
+        today = datetime.date.today()
+        expirations = list(existing_expirations or [])
         chain_data = existing_chain_data or {}
         
         # Generate a synthetic price if not provided
         if underlying_price is None:
-            if symbol == "SPY":
-                underlying_price = 400.0 + uniform(-20, 20)
-            elif symbol == "QQQ":
-                underlying_price = 350.0 + uniform(-15, 15)  
-            elif symbol == "AAPL":
-                underlying_price = 175.0 + uniform(-10, 10)  
-            elif symbol == "MSFT":
-                underlying_price = 350.0 + uniform(-10, 10)  
-            elif symbol == "GOOGL":
-                underlying_price = 150.0 + uniform(-5, 5)  
-            elif symbol == "AMZN":
-                underlying_price = 180.0 + uniform(-8, 8)   
-            elif symbol == "TSLA":
-                underlying_price = 200.0 + uniform(-15, 15) 
-            elif symbol == "META":
-                underlying_price = 450.0 + uniform(-10, 10)
-            elif symbol == "NVDA":
-                underlying_price = 850.0 + uniform(-30, 30)
-            else:
-                underlying_price = 100.0 + uniform(-10, 10)  # Default for other symbols
-            
+            base_price = SYNTHETIC_BASE_PRICES.get(symbol, 100.0)
+            underlying_price = round(base_price * (1 + rng.uniform(-0.04, 0.04)), 2)
             print(f"Using synthetic price for {symbol}: ${underlying_price:.2f}")
-            
-            # Round to 2 decimal places for cleaner display
-            underlying_price = round(underlying_price, 2)
-        
-        # Generate expiration dates (next 6 fridays + monthly options for next 6 months)
-        expiration_dates = []
-        current_date = today
-        
-        # Generate weekly expirations (next 6 Fridays)
-        for _ in range(6):
-            # Find the next friday
-            days_until_friday = (4 - current_date.weekday()) % 7
-            if days_until_friday == 0:
-                days_until_friday = 7  # If today is Friday, go to next Friday
-            next_friday = current_date + datetime.timedelta(days=days_until_friday)
-            expiration_dates.append(next_friday)
-            current_date = next_friday
-        
-        # Generate monthly expirations (3rd Friday of each month for next 6 months)
-        current_month = today.month
-        current_year = today.year
-        for i in range(6):
-            # Calculate the month and year
-            month = ((current_month - 1 + i) % 12) + 1
-            year = current_year + ((current_month + i - 1) // 12)
-            
-            # Get the first day of the month
-            first_day = datetime.datetime(year, month, 1)
-            
-            # Calculate the day of the week of the first day (0 is Monday, 4 is Friday)
-            first_day_weekday = first_day.weekday()
-            
-            # Calculate days until the first Friday
-            days_until_first_friday = (4 - first_day_weekday) % 7
-            
-            # Calculate the third Friday (first Friday + 14 days)
-            third_friday = first_day + datetime.timedelta(days=days_until_first_friday + 14)
-            
-            # Only add if not already in the list
-            if third_friday not in expiration_dates:
-                expiration_dates.append(third_friday)
         
-        # Sort the expiration dates
-        expiration_dates.sort()
-            
-        # Generate strikes around current price (15% below to 15% above)
-        # Start with existing strikes if provided
-        strikes = list(existing_strikes) if existing_strikes else []
+        # Expirations not already provided by the API
+        if num_expirations:
+            num_weeklies = max(1, num_expirations // 2)
+            expiration_dates = synthetic_expiration_dates(today, num_weeklies, num_expirations - num_weeklies)
+        else:
+            expiration_dates = synthetic_expiration_dates(today)
         
-        # Add synthetic strikes if needed
-        lowest_strike = int(underlying_price * 0.85)
-        highest_strike = int(underlying_price * 1.15)
-        # Make sure we have strike prices at regular intervals
-        strike_interval = 1.0 if underlying_price < 50 else (2.5 if underlying_price < 100 else 5.0)
+        # Prefer the symbol's actually listed expirations when the contract reference has them
+        try:
+            from app.apis.options_contracts import get_contract_store
+            store = get_contract_store()
+            listed = store.expirations_for(symbol) if store is not None else []
+            if listed:
+                expiration_dates = [datetime.date.fromisoformat(e) for e in listed[:len(expiration_dates)]]
+        except Exception as e:
+            print(f"Contract reference unavailable for {symbol} expirations: {e}")
+        expiration_dates = [d for d in expiration_dates if d.strftime('%Y-%m-%d') not in expirations]
         
-        current_strike = lowest_strike
-        while current_strike <= highest_strike:
-            if current_strike not in strikes:  # Only add if not already in the list
-                strikes.append(current_strike)
-            current_strike += strike_interval
+        # Strikes, merged with any existing ones
+        strike_grid = synthetic_strike_grid(underlying_price, num_strikes)
+        strikes = sorted(set(existing_strikes or []) | set(strike_grid.tolist()))
         
-        # Sort the strikes
-        strikes.sort()
+        if expiration_dates:
+            columns = simulate_options_chain(symbol, underlying_price, expiration_dates, np.asarray(strikes, dtype=np.float64),
+                                             seed=int(rng.integers(2**31)))
             
-        # Format expiration dates and generate options chain data
-        for exp_date in expiration_dates:
-            # Format as YYYY-MM-DD
-            formatted_date = exp_date.strftime('%Y-%m-%d')
-            if formatted_date not in expirations:  # Only add if not already in the list
+            # Build response dicts from plain Python lists in one pass
+            formatted_dates = [d.strftime('%Y-%m-%d') for d in expiration_dates]
+            short_dates = [d.strftime('%b %d') for d in expiration_dates]
+            for formatted_date in formatted_dates:
                 expirations.append(formatted_date)
-                
-                # Print diagnostic information
-                print(f"Adding expiration date: {formatted_date}")
-                
-                # Generate option chain data for this expiration
-                calls = {}
-                puts = {}
-                
-                for strike in strikes:
-                    strike_key = str(strike)
-                    
-                    # Generate call option
-                    call_price = max(0.01, underlying_price - strike + uniform(0.1, 2.0))
-                    call_iv = uniform(20.0, 40.0)
-                    call = {
-                        "id": f"{symbol}_{formatted_date}_C_{strike}",
-                        "symbol": f"{symbol}{exp_date.strftime('%y%m%d')}C{int(strike*1000):08d}",
-                        "name": f"{symbol} {exp_date.strftime('%b %d')} ${strike} Call",
-                        "strike": strike,
-                        "expirationDate": formatted_date,
-                        "contractType": "call",
-                        "lastPrice": round(call_price, 2),
-                        "change": round(uniform(-0.5, 0.5), 2),
-                        "bidPrice": round(call_price - uniform(0.05, 0.2), 2),
-                        "askPrice": round(call_price + uniform(0.05, 0.2), 2),
-                        "volume": int(uniform(10, 1000)),
-                        "openInterest": int(uniform(100, 5000)),
-                        "impliedVolatility": round(call_iv, 1),
-                        "inTheMoney": underlying_price > strike
-                    }
-                    calls[strike_key] = call
-                    
-                    # Generate put option
-                    put_price = max(0.01, strike - underlying_price + uniform(0.1, 2.0))
-                    put_iv = uniform(20.0, 40.0)
-                    put = {
-                        "id": f"{symbol}_{formatted_date}_P_{strike}",
-                        "symbol": f"{symbol}{exp_date.strftime('%y%m%d')}P{int(strike*1000):08d}",
-                        "name": f"{symbol} {exp_date.strftime('%b %d')} ${strike} Put",
-                        "strike": strike,
-                        "expirationDate": formatted_date,
-                        "contractType": "put",
-                        "lastPrice": round(put_price, 2),
-                        "change": round(uniform(-0.5, 0.5), 2),
-                        "bidPrice": round(put_price - uniform(0.05, 0.2), 2),
-                        "askPrice": round(put_price + uniform(0.05, 0.2), 2),
-                        "volume": int(uniform(10, 1000)),
-                        "openInterest": int(uniform(100, 5000)),
-                        "impliedVolatility": round(put_iv, 1),
-                        "inTheMoney": underlying_price < strike
-                    }
-                    puts[strike_key] = put
-                
-                chain_data[formatted_date] = {
-                    "calls": calls,
-                    "puts": puts
+                chain_data[formatted_date] = {"calls": {}, "puts": {}}
+            
+            rows = zip(columns["symbol"].tolist(), columns["expiry_index"].tolist(), columns["strike"].tolist(),
+                       columns["is_call"].tolist(), columns["last"].tolist(), columns["bid"].tolist(),
+                       columns["ask"].tolist(), columns["change"].tolist(), columns["volume"].tolist(),
+                       columns["open_interest"].tolist(), (columns["iv"] * 100).round(1).tolist())
+            for occ, exp_i, strike, is_call, last, bid, ask, change, volume, oi, iv in rows:
+                formatted_date = formatted_dates[exp_i]
+                contract_type = "call" if is_call else "put"
+                chain_data[formatted_date]["calls" if is_call else "puts"][str(strike)] = {
+                    "id": f"{symbol}_{formatted_date}_{'C' if is_call else 'P'}_{strike}",
+                    "symbol": occ,
+                    "name": f"{symbol} {short_dates[exp_i]} ${strike} {contract_type.capitalize()}",
+                    "strike": strike,
+                    "expirationDate": formatted_date,
+                    "contractType": contract_type,
+                    "lastPrice": last,
+                    "change": change,
+                    "bidPrice": bid,
+                    "askPrice": ask,
+                    "volume": volume,
+                    "openInterest": oi,
+                    "impliedVolatility": iv,
+                    "inTheMoney": underlying_price > strike if is_call else underlying_price < strike
                 }
         
+        # Overlay the latest streamed quotes onto the synthetic chain
+        apply_live_quotes(chain_data)
+        
         # Return the response after processing all expiration dates
         return OptionsChainResponse(
             symbol=symbol,
             expirations=sorted(expirations),  # Sort expirations for chronological order
-            strikes=sorted(strikes),
+            strikes=strikes,
             underlyingPrice=underlying_price,
             chain=chain_data
         )
@@ -0,0 +1,414 @@
+from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+import databutton as db
+import asyncio
+import json
+import time
+import uuid
+import numpy as np
+from typing import Dict, List, Optional, Any, Set
+from app.apis.stock_screener import (StockScreenerRequest, snapshot_table, get_polygon_api_key, get_filtered_tickers,
+                                     apply_columnar_predicates, filters_need_enrichment, plan_screen, wants_indicators,
+                                     uses_snapshot_filters)
+from app.apis.market_indicators import get_indicator_engine
+from app.apis.screener_universe import get_screener_universe
+from app.apis.options_contracts import get_contract_store
+
+router = APIRouter()
+
+# Models for API requests and responses
+class SaveScreenRequest(BaseModel):
+    name: str
+    user_id: str = "default"
+    request: StockScreenerRequest
+
+class SavedScreen(BaseModel):
+    id: str
+    name: str
+    user_id: str = "default"
+    request: StockScreenerRequest
+    created_at: float
+    updated_at: float
+
+class ScreenMembers(BaseModel):
+    screen_id: str
+    tickers: List[str]
+    count: int
+    exact: bool = True  # False when the screen needed more enrichment than the screener allows
+    evaluated_at: Optional[float] = None
+    error: Optional[str] = None
+
+# Storage key for every saved screen definition
+SAVED_SCREENS_KEY = "saved_screens"
+
+# How often subscribed screens are re-evaluated, in step with the market snapshot refresh
+SCREEN_MONITOR_INTERVAL = 30.0
+
+# Messages buffered per WebSocket client before it is resynced with a full member list
+SUBSCRIBER_QUEUE_SIZE = 100
+
+def load_saved_screens() -> Dict[str, SavedScreen]:
+    try:
+        stored = db.storage.json.get(SAVED_SCREENS_KEY, default={})
+        return {screen_id: SavedScreen(**screen) for screen_id, screen in stored.items()}
+    except Exception as e:
+        print(f"No stored saved screens available: {e}")
+        return {}
+
+def store_saved_screens():
+    db.storage.json.put(SAVED_SCREENS_KEY, {screen_id: screen.dict() for screen_id, screen in saved_screens.items()})
+
+# Saved screen definitions, seeded from storage at startup
+saved_screens: Dict[str, SavedScreen] = load_saved_screens()
+
+def snapshot_columns() -> tuple:
+    """The snapshot columns screens read; a refresh swaps in new arrays, so holding them keeps that version"""
+    return snapshot_table.tickers, snapshot_table.price, snapshot_table.change_percent, snapshot_table.prev_volume
+
+def changed_tickers(previous: tuple, current: tuple) -> List[str]:
+    """Tickers whose price, change or volume differ between two snapshot versions, plus listings added or dropped"""
+    previous_tickers, *previous_values = previous
+    tickers, *values = current
+    if len(previous_tickers) == 0 or len(tickers) == 0:
+        return tickers.tolist() + previous_tickers.tolist()
+    if np.array_equal(previous_tickers, tickers):
+        # Usual case: the same listings, so rows line up and only values need comparing
+        rows, changed, dropped = np.arange(len(tickers)), np.zeros(len(tickers), dtype=bool), []
+    else:
+        rows = np.minimum(np.searchsorted(previous_tickers, tickers), len(previous_tickers) - 1)
+        changed = previous_tickers[rows] != tickers
+        back = np.minimum(np.searchsorted(tickers, previous_tickers), len(tickers) - 1)
+        dropped = previous_tickers[tickers[back] != previous_tickers].tolist()
+    for before, after in zip(previous_values, values):
+        old = before[rows]
+        changed |= ~((old == after) | (np.isnan(old) & np.isnan(after)))
+    return tickers[changed].tolist() + dropped
+
+def input_versions(request: StockScreenerRequest, frame) -> tuple:
+    """Versions of the slow-moving tables a screen reads; any change means a full re-evaluation"""
+    universe = get_screener_universe()
+    store = get_contract_store() if request.has_options is not None else None
+    return (
+        universe.loaded_date if universe is not None else None,
+        frame.version if frame is not None else None,
+        store.loaded_date if store is not None else None,
+        filters_need_enrichment(request, frame)
+    )
+
+async def full_members(request: StockScreenerRequest, frame, api_key: str) -> tuple:
+    """(members, exact) of a screen evaluated over the whole universe"""
+    if filters_need_enrichment(request, frame):
+        result_set = await plan_screen(request, api_key, frame)
+        return set(result_set.tickers), result_set.exact
+    tickers = await get_filtered_tickers(request, api_key)
+    return set(apply_columnar_predicates(request, tickers, frame)), True
+
+async def recheck_members(request: StockScreenerRequest, members: Set[str], changed: List[str], frame, api_key: str) -> Set[str]:
+    """Members after rechecking only the changed tickers against the screen"""
+    if request.tickers:
+        wanted = {ticker.upper() for ticker in request.tickers}
+        changed = [ticker for ticker in changed if ticker in wanted]
+    if not changed:
+        return members
+    partial = request.copy(update={"tickers": changed})
+    passing = apply_columnar_predicates(partial, await get_filtered_tickers(partial, api_key), frame)
+    return (members - set(changed)) | set(passing)
+
+class ScreenState:
+    """Current members of a saved screen and the inputs they were evaluated against"""
+    def __init__(self, members: Set[str], exact: bool, inputs: tuple, snapshot: tuple):
+        self.members = members
+        self.exact = exact
+        self.inputs = inputs
+        self.snapshot = snapshot
+        self.evaluated_at = time.time()
+
+def members_message(screen_id: str, state: ScreenState) -> Dict[str, Any]:
+    return {"type": "members", "screen_id": screen_id, "tickers": sorted(state.members), "count": len(state.members),
+            "exact": state.exact, "evaluated_at": state.evaluated_at}
+
+class ScreenMonitor:
+    """Keeps subscribed saved screens live and pushes entered/exited diffs.
+
+    A screen is evaluated in full when a table it reads changes version
+    (universe build, indicator frame, contract store). Between those, only
+    tickers whose snapshot price, change or volume moved are rechecked, and
+    only for screens with snapshot filters. Each client has its own queue,
+    so a slow socket never holds up evaluation for everyone else, and each
+    screen has its own lock, so subscribing to one never waits on another.
+
+    Live screens are never enriched per ticker: one whose tables aren't
+    loaded yet holds its last members, marked inexact, until they are.
+    """
+    def __init__(self):
+        self.states: Dict[str, ScreenState] = {}
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.last_run_seconds: Optional[float] = None
+
+    def lock_for(self, screen_id: str) -> asyncio.Lock:
+        return self.locks.setdefault(screen_id, asyncio.Lock())
+
+    def ensure_started(self):
+        """Start the evaluation loop if it isn't already running"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        # The loop ends once the last subscriber leaves and restarts with the next one
+        while self.subscribers:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"Error re-evaluating saved screens: {e}")
+            await asyncio.sleep(SCREEN_MONITOR_INTERVAL)
+
+    async def tick(self):
+        started = time.time()
+        api_key = get_polygon_api_key()
+        await snapshot_table.ensure_fresh(api_key)
+        frames: Dict[Optional[str], Any] = {}
+        diffs: Dict[int, List[str]] = {}
+        for screen_id in list(self.subscribers):
+            screen = saved_screens.get(screen_id)
+            if screen is None:
+                continue
+            try:
+                async with self.lock_for(screen_id):
+                    await self.evaluate(screen, api_key, frames, diffs)
+            except Exception as e:
+                print(f"Error re-evaluating saved screen {screen_id}: {e}")
+        self.last_run_seconds = time.time() - started
+
+    async def frame_for(self, request: StockScreenerRequest, frames: Dict[Optional[str], Any]):
+        """The indicator frame for the screen's timeframe, prepared once per tick"""
+        if not wants_indicators(request):
+            return None
+        if request.timeframe not in frames:
+            engine = get_indicator_engine()
+            frames[request.timeframe] = await engine.prepare(request.timeframe) if engine is not None else None
+        return frames[request.timeframe]
+
+    async def evaluate(self, screen: SavedScreen, api_key: str, frames: Dict[Optional[str], Any],
+                       diffs: Dict[int, List[str]]) -> ScreenState:
+        """Bring one screen's members up to date, fully or incrementally, and publish what changed"""
+        request = screen.request
+        state = self.states.get(screen.id)
+        frame = await self.frame_for(request, frames)
+        inputs = input_versions(request, frame)
+        snapshot = snapshot_columns()
+
+        if inputs[-1] and screen.id in self.subscribers:
+            # Enriching the whole universe takes minutes, so a live screen waits for the tables to load instead
+            if state is not None and state.inputs == inputs:
+                return state
+            members, exact = (state.members if state is not None else set()), False
+        elif state is None or state.inputs != inputs or (inputs[-1] and state.snapshot[1] is not snapshot[1]):
+            members, exact = await full_members(request, frame, api_key)
+        elif uses_snapshot_filters(request) and state.snapshot[1] is not snapshot[1]:
+            # Screens last evaluated against the same snapshot version share one diff
+            version = id(state.snapshot[1])
+            if version not in diffs:
+                diffs[version] = changed_tickers(state.snapshot, snapshot)
+            members, exact = await recheck_members(request, state.members, diffs[version], frame, api_key), True
+        else:
+            state.snapshot = snapshot
+            return state
+
+        new_state = self.states[screen.id] = ScreenState(members, exact, inputs, snapshot)
+        if state is None:
+            self.publish(screen.id, members_message(screen.id, new_state))
+        elif members != state.members:
+            self.publish(screen.id, {
+                "type": "diff", "screen_id": screen.id,
+                "entered": sorted(members - state.members), "exited": sorted(state.members - members),
+                "count": len(members), "exact": exact, "evaluated_at": new_state.evaluated_at
+            })
+        return new_state
+
+    async def evaluate_now(self, screen: SavedScreen) -> ScreenState:
+        """Evaluate one screen outside the loop; a first evaluation sends subscribers the member list"""
+        api_key = get_polygon_api_key()
+        await snapshot_table.ensure_fresh(api_key)
+        return await self.evaluate(screen, api_key, {}, {})
+
+    async def current(self, screen: SavedScreen) -> ScreenState:
+        """The screen's members: kept current by the loop while subscribed, otherwise brought up to date now"""
+        async with self.lock_for(screen.id):
+            state = self.states.get(screen.id)
+            if state is not None and screen.id in self.subscribers:
+                return state
+            # Unchanged inputs and snapshot return the stored state; otherwise it is rechecked or rebuilt
+            return await self.evaluate_now(screen)
+
+    def send(self, queue: asyncio.Queue, message: Dict[str, Any]):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind gets its backlog replaced by the full member list
+            while not queue.empty():
+                queue.get_nowait()
+            state = self.states.get(message.get("screen_id"))
+            queue.put_nowait(members_message(message["screen_id"], state) if state is not None else message)
+
+    def publish(self, screen_id: str, message: Dict[str, Any]):
+        for queue in list(self.subscribers.get(screen_id, ())):
+            self.send(queue, message)
+
+    async def subscribe(self, screen: SavedScreen, queue: asyncio.Queue):
+        """Add a subscriber and send it the current members; diffs follow as the screen changes"""
+        self.subscribers.setdefault(screen.id, set()).add(queue)
+        try:
+            async with self.lock_for(screen.id):
+                state = self.states.get(screen.id)
+                if state is None:
+                    await self.evaluate_now(screen)
+                else:
+                    self.send(queue, members_message(screen.id, state))
+        except Exception as e:
+            # The subscription stays; the monitor loop retries the evaluation on its next pass
+            print(f"Error evaluating saved screen {screen.id}: {e}")
+            self.send(queue, {"error": f"Failed to evaluate screen: {str(e)}", "screen_id": screen.id})
+        self.ensure_started()
+
+    def unsubscribe(self, screen_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(screen_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            # Nobody is watching, so the next subscriber starts from a full evaluation
+            del self.subscribers[screen_id]
+            self.states.pop(screen_id, None)
+
+    def reset(self, screen_id: str):
+        """Drop a screen's state after its definition changed"""
+        self.states.pop(screen_id, None)
+
+    def close(self, screen_id: str):
+        """Tell a deleted screen's subscribers and stop tracking it"""
+        self.publish(screen_id, {"type": "deleted", "screen_id": screen_id})
+        self.subscribers.pop(screen_id, None)
+        self.states.pop(screen_id, None)
+        self.locks.pop(screen_id, None)
+
+# Global monitor for all saved screens
+screen_monitor = ScreenMonitor()
+
+def get_saved_screen(screen_id: str) -> SavedScreen:
+    screen = saved_screens.get(screen_id)
+    if screen is None:
+        raise HTTPException(status_code=404, detail=f"Saved screen {screen_id} not found")
+    return screen
+
+# REST endpoint to save a screen definition
+@router.post("/screens")
+async def create_saved_screen(body: SaveScreenRequest) -> SavedScreen:
+    now = time.time()
+    screen = SavedScreen(id=str(uuid.uuid4()), name=body.name, user_id=body.user_id, request=body.request,
+                         created_at=now, updated_at=now)
+    saved_screens[screen.id] = screen
+    try:
+        store_saved_screens()
+    except Exception as e:
+        saved_screens.pop(screen.id, None)
+        print(f"Error saving screen: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to save screen: {str(e)}")
+    return screen
+
+# REST endpoint to list a user's saved screens
+@router.get("/screens")
+async def list_saved_screens(user_id: str = "default") -> List[SavedScreen]:
+    return sorted((screen for screen in saved_screens.values() if screen.user_id == user_id), key=lambda screen: screen.created_at)
+
+# REST endpoint to change a saved screen; live subscribers are resent its new members
+@router.put("/screens/{screen_id}")
+async def update_saved_screen(screen_id: str, body: SaveScreenRequest) -> SavedScreen:
+    screen = get_saved_screen(screen_id)
+    updated = SavedScreen(id=screen.id, name=body.name, user_id=screen.user_id, request=body.request,
+                          created_at=screen.created_at, updated_at=time.time())
+    saved_screens[screen_id] = updated
+    try:
+        store_saved_screens()
+    except Exception as e:
+        saved_screens[screen_id] = screen
+        print(f"Error saving screen: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to save screen: {str(e)}")
+    screen_monitor.reset(screen_id)
+    if screen_id in screen_monitor.subscribers:
+        # Re-evaluating sends live subscribers the new member list
+        await screen_monitor.current(updated)
+    return updated
+
+# REST endpoint to delete a saved screen
+@router.delete("/screens/{screen_id}")
+async def delete_saved_screen(screen_id: str):
+    get_saved_screen(screen_id)
+    screen = saved_screens.pop(screen_id)
+    try:
+        store_saved_screens()
+    except Exception as e:
+        saved_screens[screen_id] = screen
+        print(f"Error deleting screen: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete screen: {str(e)}")
+    screen_monitor.close(screen_id)
+    return {"status": "deleted", "screen_id": screen_id}
+
+# REST endpoint for a saved screen's current members
+@router.get("/screens/{screen_id}/members")
+async def get_saved_screen_members(screen_id: str) -> ScreenMembers:
+    screen = get_saved_screen(screen_id)
+    try:
+        state = await screen_monitor.current(screen)
+        return ScreenMembers(screen_id=screen_id, tickers=sorted(state.members), count=len(state.members),
+                             exact=state.exact, evaluated_at=state.evaluated_at)
+    except Exception as e:
+        print(f"Error evaluating saved screen {screen_id}: {e}")
+        return ScreenMembers(screen_id=screen_id, tickers=[], count=0, error=f"Failed to evaluate screen: {str(e)}")
+
+# WebSocket endpoint streaming saved screen membership changes
+@router.websocket("/ws/screens/{client_id}")
+async def websocket_screens_endpoint(websocket: WebSocket, client_id: str):
+    await websocket.accept()
+    print(f"Saved screen client {client_id} connected")
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    subscribed: Set[str] = set()
+
+    # Subscribe and unsubscribe requests: {"action": "subscribe", "screen_id": "..."}
+    async def receive_from_client():
+        while True:
+            message = json.loads(await websocket.receive_text())
+            action, screen_id = message.get("action"), message.get("screen_id")
+            if action == "subscribe" and screen_id:
+                screen = saved_screens.get(screen_id)
+                if screen is None:
+                    screen_monitor.send(queue, {"error": f"Saved screen {screen_id} not found", "screen_id": screen_id})
+                    continue
+                subscribed.add(screen_id)
+                screen_monitor.send(queue, {"status": "subscribed", "screen_id": screen_id})
+                await screen_monitor.subscribe(screen, queue)
+            elif action == "unsubscribe" and screen_id:
+                subscribed.discard(screen_id)
+                screen_monitor.unsubscribe(screen_id, queue)
+                screen_monitor.send(queue, {"status": "unsubscribed", "screen_id": screen_id})
+
+    # Member lists and diffs, in the order they were published
+    async def send_to_client():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    tasks = [asyncio.create_task(receive_from_client()), asyncio.create_task(send_to_client())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        print(f"Saved screen client {client_id} disconnected")
+    except Exception as e:
+        print(f"Error in saved screen websocket: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        for screen_id in subscribed:
+            screen_monitor.unsubscribe(screen_id, queue)
@@ -0,0 +1,377 @@
+from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+import databutton as db
+import asyncio
+import bisect
+import datetime
+import io
+import re
+import time
+import numpy as np
+from zoneinfo import ZoneInfo
+from typing import Dict, List, Optional, Any, Callable
+from app.apis.market_data import PolygonAsyncClient, polygon_client
+
+router = APIRouter()
+
+# Models for API responses
+class UniverseStatus(BaseModel):
+    loaded_date: Optional[str] = None
+    tickers: int
+    sectors: int
+    industries: int
+    refreshing: bool
+    last_refresh_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+# Storage key for the persisted universe table
+UNIVERSE_KEY = "screener_universe"
+
+# Tickers whose reference and company details are fetched concurrently per batch during a bulk load
+UNIVERSE_BATCH_SIZE = 1000
+
+# Seconds before a failed bulk rebuild is retried
+REFRESH_RETRY_SECONDS = 900.0
+
+# The daily rebuild runs as a scheduled job: after this hour (Eastern), checked every UNIVERSE_SCHEDULE_SECONDS
+UNIVERSE_REBUILD_HOUR = 6
+UNIVERSE_SCHEDULE_SECONDS = 60.0
+
+# The rebuild makes two calls per listed ticker, so it gets its own slice of the shared Polygon rate limit
+UNIVERSE_REQUESTS_PER_SECOND = 10.0
+universe_client = PolygonAsyncClient(max_concurrency=4, requests_per_second=UNIVERSE_REQUESTS_PER_SECOND, parent=polygon_client)
+
+# The universe is rebuilt once per market date, not per server-local date
+MARKET_TZ = ZoneInfo("America/New_York")
+
+# Dictionary-encoded categorical columns and float columns of the universe table
+CATEGORY_COLUMNS = ["type", "exchange", "sector", "industry", "country"]
+NUMERIC_COLUMNS = ["market_cap", "pe_ratio", "dividend_yield"]
+
+# Get Polygon API key
+def get_polygon_api_key():
+    api_key = db.secrets.get("POLYGON_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Polygon API key not found")
+    return api_key
+
+def reference_fields(ticker_data: Dict[str, Any], company: Dict[str, Any]) -> Dict[str, Any]:
+    """Screener reference fields from a ticker's reference details and company meta"""
+    sic = ticker_data.get('sic_code') if isinstance(ticker_data.get('sic_code'), dict) else {}
+    return {
+        "name": ticker_data.get('name') or '',
+        "type": ticker_data.get('type'),
+        "exchange": ticker_data.get('primary_exchange'),
+        "market_cap": ticker_data.get('market_cap'),
+        # Company meta first, then the SIC fields of the reference lookup
+        "sector": company.get('sector') or sic.get('sector'),
+        "industry": company.get('industry') or sic.get('industry') or ticker_data.get('sic_description'),
+        "country": company.get('country'),
+        "pe_ratio": company.get('pe_ratio'),
+        "dividend_yield": company.get('dividend_yield'),
+    }
+
+def text_tokens(text: str) -> List[str]:
+    """Lowercase words of a category value or a search string"""
+    return re.findall(r"[a-z0-9]+", text.lower().replace('_', ' '))
+
+def matches_text(query: str, value: str) -> bool:
+    """Every word of the query starts a word of the value, e.g. 'semi equip' matches 'Semiconductor Equipment'"""
+    words = text_tokens(value)
+    return all(any(word.startswith(token) for word in words) for token in text_tokens(query))
+
+class TokenIndex:
+    """Sorted words of a column's vocabulary with the codes containing each, for partial matches.
+
+    A query token is looked up as a prefix range over the sorted words, so
+    each keystroke costs two bisects and a small union instead of a scan
+    over every value.
+    """
+    def __init__(self, vocab: List[str]):
+        postings: Dict[str, set] = {}
+        for code, value in enumerate(vocab):
+            for word in text_tokens(value):
+                postings.setdefault(word, set()).add(code)
+        self.size = len(vocab)
+        self.words = sorted(postings)
+        self.postings = [np.array(sorted(postings[word]), dtype=np.int64) for word in self.words]
+
+    def codes(self, query: str) -> np.ndarray:
+        """Codes of the values matching the query the way matches_text does"""
+        matched = np.arange(self.size)
+        for token in text_tokens(query):
+            # Words are [a-z0-9]+, so every word starting with the token sorts below token + "{"
+            start, end = bisect.bisect_left(self.words, token), bisect.bisect_left(self.words, token + "{")
+            if start == end:
+                return np.zeros(0, dtype=np.int64)
+            matched = np.intersect1d(matched, np.unique(np.concatenate(self.postings[start:end])))
+        return matched
+
+class ScreenerUniverse:
+    """Slowly changing reference data for every listed ticker, rebuilt in bulk once a day.
+
+    Rows are sorted by ticker. Categorical fields are dictionary-encoded as
+    int32 codes into a per-column vocabulary (-1 when missing) and numeric
+    fields are float64 with NaN for missing values, so reference screens are
+    vectorized masks over in-memory columns instead of per-ticker lookups.
+
+    Each categorical value also has a packed row bitmap (one bit per ticker),
+    so any combination of categorical filters is an OR over the wanted values
+    and an AND across filters on a few kilobytes, unpacked once at the end.
+    The table is persisted so a restart does not need to reload it.
+    """
+    def __init__(self):
+        self.tickers = np.zeros(0, dtype="U16")
+        self.names = np.zeros(0, dtype=str)
+        self.vocab: Dict[str, List[str]] = {column: [] for column in CATEGORY_COLUMNS}
+        self.codes: Dict[str, np.ndarray] = {column: np.zeros(0, dtype=np.int32) for column in CATEGORY_COLUMNS}
+        self.numbers: Dict[str, np.ndarray] = {column: np.zeros(0, dtype=np.float64) for column in NUMERIC_COLUMNS}
+        self.bitmaps: Dict[str, np.ndarray] = {}  # Column -> (values + missing, packed rows) bitmaps
+        self.industry_index = TokenIndex([])
+        self.options_key: Optional[tuple] = None
+        self.options_bits = np.zeros(0, dtype=np.uint8)
+        self.loaded_date: Optional[datetime.date] = None
+        self.refresh_task: Optional[asyncio.Task] = None
+        self.schedule_task: Optional[asyncio.Task] = None
+        self.retry_after = 0.0
+        self.last_refresh_seconds: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_date is not None and len(self) > 0
+
+    def build(self, rows: Dict[str, Dict[str, Any]], loaded_date: datetime.date):
+        """Build the table from reference fields keyed by ticker"""
+        tickers = sorted(rows)
+        self.tickers = np.array(tickers, dtype="U16")
+        self.names = np.array([rows[ticker].get("name") or "" for ticker in tickers], dtype=str)
+        for column in CATEGORY_COLUMNS:
+            vocab: Dict[str, int] = {}
+            values = [rows[ticker].get(column) for ticker in tickers]
+            self.codes[column] = np.array([vocab.setdefault(str(value), len(vocab)) if value else -1 for value in values],
+                                          dtype=np.int32)
+            self.vocab[column] = list(vocab)
+        for column in NUMERIC_COLUMNS:
+            values = [rows[ticker].get(column) for ticker in tickers]
+            self.numbers[column] = np.array([value if isinstance(value, (int, float)) else np.nan for value in values],
+                                            dtype=np.float64)
+        self.loaded_date = loaded_date
+        self.index()
+
+    def index(self):
+        """Build the packed bitmap of every categorical value (missing values last) and the industry token index"""
+        rows = np.arange(len(self))
+        for column in CATEGORY_COLUMNS:
+            onehot = np.zeros((len(self.vocab[column]) + 1, len(self)), dtype=bool)
+            onehot[self.codes[column], rows] = True  # Code -1 lands in the trailing missing row
+            self.bitmaps[column] = np.packbits(onehot, axis=1)
+        self.industry_index = TokenIndex(self.vocab["industry"])
+        self.options_key = None
+
+    def rows(self, tickers: List[str]) -> np.ndarray:
+        """Row of each ticker, -1 where the universe has none"""
+        if len(self) == 0:
+            return np.full(len(tickers), -1, dtype=np.int64)
+        wanted = np.array(tickers, dtype="U16")
+        rows = np.minimum(np.searchsorted(self.tickers, wanted), len(self) - 1)
+        return np.where(self.tickers[rows] == wanted, rows, -1)
+
+    def category(self, column: str, row: int) -> Optional[str]:
+        code = self.codes[column][row]
+        return self.vocab[column][code] if code >= 0 else None
+
+    def number(self, column: str, row: int) -> Optional[float]:
+        value = self.numbers[column][row]
+        return None if np.isnan(value) else float(value)
+
+    def lookup(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """The reference fields of one ticker, None if it isn't in the universe"""
+        row = int(self.rows([ticker])[0])
+        if row < 0:
+            return None
+        fields = {"name": str(self.names[row])}
+        fields.update({column: self.category(column, row) for column in CATEGORY_COLUMNS})
+        fields.update({column: self.number(column, row) for column in NUMERIC_COLUMNS})
+        return fields
+
+    def everything(self) -> np.ndarray:
+        """Packed bitmap with every row set"""
+        return np.packbits(np.ones(len(self), dtype=bool))
+
+    def pack(self, mask: np.ndarray) -> np.ndarray:
+        return np.packbits(mask)
+
+    def unpack(self, bitmap: np.ndarray) -> np.ndarray:
+        """Boolean row mask of a packed bitmap"""
+        return np.unpackbits(bitmap, count=len(self)).astype(bool)
+
+    def values_bitmap(self, column: str, codes, missing: bool = False) -> np.ndarray:
+        """Packed rows holding any of the codes (an OR of their bitmaps), plus missing values if asked"""
+        wanted = list(codes) + ([len(self.vocab[column])] if missing else [])
+        if not wanted:
+            return np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+        return np.bitwise_or.reduce(self.bitmaps[column][wanted], axis=0)
+
+    def category_bitmap(self, column: str, matches: Callable[[str], bool], missing: bool = False) -> np.ndarray:
+        """Packed rows whose value satisfies matches, tested once per vocabulary entry rather than per row"""
+        return self.values_bitmap(column, [code for code, value in enumerate(self.vocab[column]) if matches(value)], missing)
+
+    def industry_bitmap(self, query: str, missing: bool = False) -> np.ndarray:
+        """Packed rows whose industry matches the partial query, resolved through the token index"""
+        return self.values_bitmap("industry", self.industry_index.codes(query).tolist(), missing)
+
+    def options_bitmap(self, store) -> np.ndarray:
+        """Packed rows with listed options in the contract store, rebuilt when either table reloads"""
+        key = (self.loaded_date, store.loaded_date, len(store.underlyings))
+        if self.options_key != key:
+            listed = np.diff(store.offsets) > 0
+            optionable = np.array([underlying for underlying, has in zip(store.underlyings, listed.tolist()) if has], dtype="U16")
+            self.options_bits = np.packbits(np.isin(self.tickers, optionable))
+            self.options_key = key
+        return self.options_bits
+
+    def range_mask(self, column: str, low: Optional[float] = None, high: Optional[float] = None,
+                   missing: bool = False) -> np.ndarray:
+        """Rows within the bounds; missing values pass only when missing is True"""
+        values = self.numbers[column]
+        mask = np.ones(len(values), dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask | (np.isnan(values) & missing)
+
+    def save(self):
+        buffer = io.BytesIO()
+        columns = {f"{column}_vocab": np.array(self.vocab[column], dtype=str) for column in CATEGORY_COLUMNS}
+        columns.update({f"{column}_codes": self.codes[column] for column in CATEGORY_COLUMNS})
+        columns.update(self.numbers)
+        np.savez_compressed(buffer, tickers=self.tickers, names=self.names,
+                            loaded_date=np.array([self.loaded_date.isoformat()]), **columns)
+        db.storage.binary.put(UNIVERSE_KEY, buffer.getvalue())
+
+    def load(self) -> bool:
+        """Load the persisted table, if there is one"""
+        try:
+            data = np.load(io.BytesIO(db.storage.binary.get(UNIVERSE_KEY)))
+            self.tickers = data["tickers"]
+            self.names = data["names"]
+            for column in CATEGORY_COLUMNS:
+                self.vocab[column] = data[f"{column}_vocab"].tolist()
+                self.codes[column] = data[f"{column}_codes"]
+            for column in NUMERIC_COLUMNS:
+                self.numbers[column] = data[column]
+            self.loaded_date = datetime.date.fromisoformat(str(data["loaded_date"][0]))
+            self.index()
+            print(f"Loaded screener universe of {len(self)} tickers from storage ({self.loaded_date})")
+            return True
+        except Exception as e:
+            print(f"No stored screener universe available: {e}")
+            return False
+
+    async def refresh(self):
+        """List every active stock ticker, then fetch reference and company details in concurrent batches"""
+        started = time.time()
+        api_key = get_polygon_api_key()
+        listed = []
+        async for page in universe_client.iter_pages(
+                f"https://api.polygon.io/v3/reference/tickers?market=stocks&active=true&limit=1000&apiKey={api_key}",
+                api_key, max_pages=100, timeout=20.0):
+            listed.extend(result for result in page if result.get('ticker'))
+        if not listed:
+            raise Exception("Polygon returned no tickers")
+
+        rows: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(listed), UNIVERSE_BATCH_SIZE):
+            batch = listed[start:start + UNIVERSE_BATCH_SIZE]
+            urls = [f"https://api.polygon.io/v3/reference/tickers/{result['ticker']}?apiKey={api_key}" for result in batch]
+            urls += [f"https://api.polygon.io/v1/meta/symbols/{result['ticker']}/company?apiKey={api_key}" for result in batch]
+            pages = await universe_client.gather_json(urls)
+            for result, details, company in zip(batch, pages[:len(batch)], pages[len(batch):]):
+                ticker = result['ticker']
+                fields = reference_fields({**result, **((details or {}).get('results') or {})}, company or {})
+                if details is None:
+                    # A failed detail lookup keeps yesterday's values rather than blanking the row
+                    fields.update({key: value for key, value in (self.lookup(ticker) or {}).items()
+                                   if value is not None and fields.get(key) is None})
+                rows[ticker] = fields
+
+        self.build(rows, datetime.datetime.now(MARKET_TZ).date())
+        self.last_refresh_seconds = time.time() - started
+        print(f"Built screener universe of {len(self)} tickers in {self.last_refresh_seconds:.1f}s")
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Error saving screener universe: {e}")
+
+    def due(self) -> bool:
+        """True when the scheduled rebuild should run: no universe yet, or none for today after the rebuild hour"""
+        now = datetime.datetime.now(MARKET_TZ)
+        if self.loaded_date == now.date() or time.time() < self.retry_after:
+            return False
+        return not self.loaded or now.hour >= UNIVERSE_REBUILD_HOUR
+
+    async def refresh_now(self):
+        """Wait for the rebuild in flight, starting one if none is running"""
+        if self.refresh_task is None or self.refresh_task.done():
+            self.refresh_task = asyncio.create_task(self.refresh())
+        # Shielded so a caller going away doesn't cancel a rebuild others are waiting on
+        await asyncio.shield(self.refresh_task)
+
+    async def run_schedule(self):
+        while True:
+            if self.due():
+                try:
+                    await self.refresh_now()
+                except Exception as e:
+                    # A failed rebuild waits out the retry window before the schedule tries again
+                    self.retry_after = time.time() + REFRESH_RETRY_SECONDS
+                    print(f"Error refreshing screener universe: {e}")
+            await asyncio.sleep(UNIVERSE_SCHEDULE_SECONDS)
+
+    def ensure_fresh(self):
+        """Start the daily rebuild schedule if it isn't running"""
+        if self.schedule_task is None or self.schedule_task.done():
+            # Raises before the coroutine exists when there is no running loop
+            asyncio.get_running_loop()
+            self.schedule_task = asyncio.create_task(self.run_schedule())
+
+# Global universe, seeded from storage at startup
+screener_universe = ScreenerUniverse()
+screener_universe.load()
+
+def get_screener_universe() -> Optional[ScreenerUniverse]:
+    """The universe when it has been built, making sure the daily rebuild schedule is running"""
+    try:
+        screener_universe.ensure_fresh()
+    except RuntimeError:
+        # No running event loop, e.g. called from a worker thread
+        pass
+    return screener_universe if screener_universe.loaded else None
+
+# REST endpoint to check the screener universe
+@router.get("/screener/universe/status")
+async def get_universe_status() -> UniverseStatus:
+    return UniverseStatus(
+        loaded_date=screener_universe.loaded_date.isoformat() if screener_universe.loaded_date else None,
+        tickers=len(screener_universe),
+        sectors=len(screener_universe.vocab["sector"]),
+        industries=len(screener_universe.vocab["industry"]),
+        refreshing=screener_universe.refresh_task is not None and not screener_universe.refresh_task.done(),
+        last_refresh_seconds=screener_universe.last_refresh_seconds
+    )
+
+# REST endpoint to force a bulk rebuild of the screener universe, or wait for the one already running
+@router.post("/screener/universe/refresh")
+async def refresh_screener_universe() -> UniverseStatus:
+    try:
+        await screener_universe.refresh_now()
+        return await get_universe_status()
+    except Exception as e:
+        print(f"Error refreshing screener universe: {e}")
+        status = await get_universe_status()
+        status.error = f"Failed to refresh screener universe: {str(e)}"
+        return status
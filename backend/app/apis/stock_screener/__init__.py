@@ -2,8 +2,17 @@ from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
 import databutton as db
 import requests
-from typing import Dict, List, Optional, Any, Literal
+import json
+import asyncio
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Literal, Callable, Awaitable
 import re
+from app.apis.market_data import polygon_client
+from app.apis.options_contracts import get_contract_store
+from app.apis.market_indicators import get_indicator_engine
+from app.apis.screener_universe import get_screener_universe, reference_fields, matches_text
 
 router = APIRouter()
 
@@ -17,6 +26,8 @@ class StockScreenerRequest(BaseModel):
     market_cap_max: Optional[float] = None
     price_min: Optional[float] = None
     price_max: Optional[float] = None
+    change_min: Optional[float] = None  # Today's change, percent
+    change_max: Optional[float] = None
     sector: Optional[str] = None
     industry: Optional[str] = None
     country: Optional[str] = None
@@ -65,14 +76,18 @@ class TickerDetails(BaseModel):
     macd: Optional[float] = None
     macd_signal: Optional[str] = None  # bullish, bearish, crossover
     bollinger_position: Optional[str] = None  # upper, lower, middle
-    keltner_position: Optional[str] = None  # above_upper, below_lower, within
+    bollinger_width: Optional[str] = None  # squeeze, expansion
+    keltner_position: Optional[str] = None  # above_upper, below_lower, within, narrowing, widening
     stochastic: Optional[float] = None
-    stochastic_signal: Optional[str] = None  # oversold, overbought, bullish, bearish
+    stochastic_signal: Optional[str] = None  # oversold, overbought, bullish_crossover, bearish_crossover
+    trend: Optional[str] = None  # strong_uptrend, weak_uptrend, sideways, weak_downtrend, strong_downtrend
 
 class StockScreenerResponse(BaseModel):
     results: List[TickerDetails]
     total_results: int
     page: int = 1
+    total_is_exact: bool = True  # False while enrichment finishes in the background, or past SCREEN_ENRICH_LIMIT
+    sort_is_exact: bool = True  # False while the sort key is still being fetched; results are then in ticker order
     error: Optional[str] = None
 
 # Helper function to get Polygon API key
@@ -82,67 +97,216 @@ def get_polygon_api_key():
         raise HTTPException(status_code=500, detail="Polygon API key not found")
     return api_key
 
+# How often the whole-market snapshot is pulled again
+SNAPSHOT_REFRESH_SECONDS = 30.0
+
+def snapshot_quote(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Price, change and volume fields from one snapshot ticker entry"""
+    day = entry.get('day') or {}
+    prev_day = entry.get('prevDay') or {}
+    # Before the open the day bar is empty; the last trade or the previous close stands in
+    price = day.get('c') or (entry.get('lastTrade') or {}).get('p') or prev_day.get('c')
+    return {
+        "price": price,
+        "change_percent": entry.get('todaysChangePerc'),
+        "volume": day.get('v'),
+        "avg_volume": prev_day.get('v'),
+    }
+
+class MarketSnapshotTable:
+    """The all-tickers market snapshot as NumPy columns sorted by ticker.
+
+    One bulk request refreshes the whole table on a cadence; lookups are a
+    searchsorted on the ticker column and price, change and volume screens
+    are vectorized masks over every row, so no per-ticker calls are needed.
+    """
+    def __init__(self):
+        self.tickers = np.zeros(0, dtype="U16")
+        self.price = np.zeros(0, dtype=np.float64)
+        self.change_percent = np.zeros(0, dtype=np.float64)
+        self.volume = np.zeros(0, dtype=np.float64)
+        self.prev_volume = np.zeros(0, dtype=np.float64)
+        self.fetched_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def load(self, entries: List[Dict[str, Any]]):
+        quotes = [(entry['ticker'], snapshot_quote(entry)) for entry in entries if entry.get('ticker')]
+        quotes.sort(key=lambda item: item[0])
+        column = lambda field: np.array([quote[field] if quote[field] is not None else np.nan for _, quote in quotes], dtype=np.float64)
+        self.tickers = np.array([ticker for ticker, _ in quotes], dtype="U16")
+        self.price = column("price")
+        self.change_percent = column("change_percent")
+        self.volume = column("volume")
+        self.prev_volume = column("avg_volume")
+        self.fetched_at = time.time()
+
+    async def refresh(self, api_key: str):
+        data = await polygon_client.get_json(f"https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers?apiKey={api_key}", timeout=30.0)
+        if data and data.get('tickers'):
+            self.load(data['tickers'])
+            print(f"Loaded market snapshot for {len(self)} tickers")
+
+    async def ensure_fresh(self, api_key: str) -> bool:
+        """Refresh when stale (one refresh at a time); True if the table has rows"""
+        if time.time() - self.fetched_at >= SNAPSHOT_REFRESH_SECONDS:
+            async with self.lock:
+                if time.time() - self.fetched_at >= SNAPSHOT_REFRESH_SECONDS:
+                    try:
+                        await self.refresh(api_key)
+                    except Exception as e:
+                        print(f"Error refreshing market snapshot: {e}")
+        return len(self) > 0
+
+    def rows(self, tickers: List[str]) -> np.ndarray:
+        """Row of each ticker, -1 where the snapshot has none"""
+        if len(self) == 0:
+            return np.full(len(tickers), -1, dtype=np.int64)
+        wanted = np.array(tickers, dtype="U16")
+        rows = np.minimum(np.searchsorted(self.tickers, wanted), len(self) - 1)
+        return np.where(self.tickers[rows] == wanted, rows, -1)
+
+    def quote(self, ticker: str) -> Optional[Dict[str, Any]]:
+        row = int(self.rows([ticker])[0])
+        if row < 0:
+            return None
+        value = lambda column: None if np.isnan(column[row]) else float(column[row])
+        volume, avg_volume = value(self.volume), value(self.prev_volume)
+        return {
+            "price": value(self.price),
+            "change_percent": value(self.change_percent),
+            "volume": int(volume) if volume is not None else None,
+            "avg_volume": int(avg_volume) if avg_volume is not None else None,
+        }
+
+    def mask(self, request: StockScreenerRequest) -> np.ndarray:
+        """Rows passing the request's price, change and volume filters (NaN never passes a bound)"""
+        mask = np.ones(len(self), dtype=bool)
+        if request.price_min is not None:
+            mask &= self.price >= request.price_min
+        if request.price_max is not None:
+            mask &= self.price <= request.price_max
+        if request.change_min is not None:
+            mask &= self.change_percent >= request.change_min
+        if request.change_max is not None:
+            mask &= self.change_percent <= request.change_max
+        if request.volume_min is not None:
+            # Same basis as the avg_volume post-filter: the previous session's volume
+            mask &= self.prev_volume >= request.volume_min
+        return mask
+
+    def screen(self, request: StockScreenerRequest, tickers: Optional[List[str]] = None) -> List[str]:
+        """Tickers passing the snapshot filters, from the given list (in its order) or the whole market"""
+        mask = self.mask(request)
+        if tickers is None:
+            return self.tickers[mask].tolist()
+        rows = self.rows(tickers)
+        # Tickers the snapshot lacks are kept only when there is nothing to filter them on
+        filtered = any(bound is not None for bound in (request.price_min, request.price_max, request.change_min,
+                                                       request.change_max, request.volume_min))
+        keep = np.where(rows >= 0, mask[np.maximum(rows, 0)], not filtered)
+        return [ticker for ticker, kept in zip(tickers, keep.tolist()) if kept]
+
+snapshot_table = MarketSnapshotTable()
+
+def uses_reference_filters(request: StockScreenerRequest) -> bool:
+    return bool(request.exchange or request.market_cap_min or request.market_cap_max or request.is_etf is not None or request.sector)
+
+def uses_universe_filters(request: StockScreenerRequest) -> bool:
+    """Reference filters plus the company fields and options flag only the universe table indexes"""
+    return bool(uses_reference_filters(request) or request.industry or request.country or request.has_options is not None or
+                request.dividend_min is not None or request.dividend_max is not None)
+
+def uses_snapshot_filters(request: StockScreenerRequest) -> bool:
+    bounds = (request.price_min, request.price_max, request.change_min, request.change_max, request.volume_min)
+    return any(bound is not None for bound in bounds)
+
+# Exchange names accepted by the screener, as primary exchange MIC codes
+EXCHANGE_CODES = {"nasdaq": "XNAS", "nyse": "XNYS", "amex": "XASE", "arca": "ARCX"}
+
+def reference_mask(request: StockScreenerRequest, universe) -> np.ndarray:
+    """Universe rows passing the reference filters, with the post-filters' handling of missing values.
+
+    Categorical filters AND together the packed bitmaps of their matching
+    values; numeric ranges are packed masks, and one unpack gives the rows.
+    """
+    bitmap = universe.everything()
+    if request.exchange:
+        exchange = EXCHANGE_CODES.get(request.exchange.lower(), request.exchange.upper())
+        bitmap &= universe.category_bitmap("exchange", lambda value: value == exchange)
+    if request.is_etf is not None:
+        wanted_type = "ETF" if request.is_etf else "CS"
+        bitmap &= universe.category_bitmap("type", lambda value: value == wanted_type)
+    if request.sector:
+        sector = request.sector.replace('_', ' ').lower()
+        bitmap &= universe.category_bitmap("sector", lambda value: value.lower() == sector)
+    if request.industry:
+        bitmap &= universe.industry_bitmap(request.industry, missing=True)
+    if request.country:
+        country = request.country.lower()
+        bitmap &= universe.category_bitmap("country", lambda value: value.lower() == country, missing=True)
+    store = get_contract_store()
+    if request.has_options is not None and store is not None:
+        options = universe.options_bitmap(store)
+        bitmap &= options if request.has_options else ~options
+    if request.market_cap_min or request.market_cap_max:
+        bitmap &= universe.pack(universe.range_mask("market_cap", request.market_cap_min or None, request.market_cap_max or None))
+    if request.dividend_min is not None:
+        bitmap &= universe.pack(universe.range_mask("dividend_yield", request.dividend_min, request.dividend_max))
+    elif request.dividend_max is not None:
+        bitmap &= universe.pack(universe.range_mask("dividend_yield", high=request.dividend_max, missing=True))
+    return universe.unpack(bitmap)
+
 # Stock Screener endpoint
 @router.post("/screen")
 async def screen_stocks(request: StockScreenerRequest) -> StockScreenerResponse:
     api_key = get_polygon_api_key()
-    
+
     try:
         print(f"Processing stock screener request: {request}")
-        
-        # First, get a list of tickers that match our criteria
-        tickers_list = await get_filtered_tickers(request, api_key)
-        
-        # Calculate total number of matching tickers
-        total_results = len(tickers_list)
-        
+
+        # Prices, changes and volumes for the whole market come from one bulk snapshot
+        await snapshot_table.ensure_fresh(api_key)
+
+        # Indicator screens read locally computed values for every ticker
+        engine = get_indicator_engine() if wants_indicators(request) else None
+        frame = await engine.prepare(request.timeframe) if engine is not None else None
+
+        # The full, filtered and sorted result set; partial until a large enrichment finishes
+        result_set = await plan_screen(request, api_key, frame)
+        total_results = len(result_set.tickers)
+
         # Apply pagination
         page = max(1, request.page or 1)  # Ensure page is at least 1
         limit = min(request.limit or 50, 100)  # Cap at 100 to avoid overwhelming API
-        
+
         start_idx = (page - 1) * limit
         end_idx = start_idx + limit
-        
+
         # Get the subset of tickers for the current page
-        page_tickers = tickers_list[start_idx:end_idx] if start_idx < len(tickers_list) else []
-        
-        # Get details for each ticker
-        results = []
-        for ticker in page_tickers:
-            try:
-                details = await get_ticker_details(ticker, api_key, request)
-                if details:
-                    # Apply post-filtering for criteria not supported directly by the Polygon API endpoints
-                    if should_include_ticker(details, request):
-                        results.append(details)
-            except Exception as e:
-                print(f"Error getting details for {ticker}: {e}")
-        
-        # Sort results if sort criteria provided
-        if request.sort_by:
-            # Convert sort_by to the corresponding attribute in TickerDetails
-            sort_field = request.sort_by
-            # Handle special cases and conversions
-            if sort_field == "marketCap" or sort_field == "market_cap":
-                sort_field = "market_cap"
-            elif sort_field == "changePercent" or sort_field == "change_percent":
-                sort_field = "change_percent"
-            elif sort_field == "avgVolume" or sort_field == "avg_volume":
-                sort_field = "avg_volume"
-            elif sort_field == "dividendYield" or sort_field == "dividend_yield":
-                sort_field = "dividend_yield"
-            elif sort_field == "peRatio" or sort_field == "pe_ratio":
-                sort_field = "pe_ratio"
-            
-            # Sort the results
-            reverse = request.sort_direction == "desc"
-            results = sorted(results, key=lambda x: getattr(x, sort_field, 0) or 0, reverse=reverse)
-        
+        page_tickers = result_set.tickers[start_idx:end_idx]
+
+        # Details for the page: already enriched by the plan, or fetched for just these tickers
+        missing = [ticker for ticker in page_tickers if ticker not in result_set.details]
+        if missing:
+            fetched = await asyncio.gather(*[get_ticker_details(ticker, api_key, request, frame) for ticker in missing],
+                                           return_exceptions=True)
+            for ticker, details in zip(missing, fetched):
+                if isinstance(details, Exception):
+                    print(f"Error getting details for {ticker}: {details}")
+                elif details:
+                    result_set.details[ticker] = details
+        results = [result_set.details[ticker] for ticker in page_tickers if ticker in result_set.details]
+
         print(f"Returning {len(results)} results for stock screener (page {page} of {(total_results + limit - 1) // limit})")
         return StockScreenerResponse(
             results=results,
             total_results=total_results,  # Return the total count of matching tickers
-            page=page
+            page=page,
+            total_is_exact=result_set.exact,
+            sort_is_exact=result_set.sort_exact
         )
     except Exception as e:
         print(f"Error in screen_stocks: {e}")
@@ -155,9 +319,29 @@ async def screen_stocks(request: StockScreenerRequest) -> StockScreenerResponse:
 # Helper function to get list of tickers based on filter criteria
 async def get_filtered_tickers(request: StockScreenerRequest, api_key: str) -> List[str]:
     try:
+        universe = get_screener_universe()
+
         # If specific tickers were requested, return those directly (allows for quick specific search)
         if request.tickers and len(request.tickers) > 0:
-            return [ticker.upper() for ticker in request.tickers]
+            tickers = [ticker.upper() for ticker in request.tickers]
+            if universe is not None and uses_universe_filters(request):
+                mask = reference_mask(request, universe)
+                tickers = [ticker for ticker, row in zip(tickers, universe.rows(tickers).tolist()) if row >= 0 and mask[row]]
+            return snapshot_table.screen(request, tickers) if len(snapshot_table) and uses_snapshot_filters(request) else tickers
+
+        # The daily universe table answers every reference filter from memory
+        if universe is not None and (uses_universe_filters(request) or not len(snapshot_table)):
+            tickers = universe.tickers[reference_mask(request, universe)].tolist()
+            if len(snapshot_table) and uses_snapshot_filters(request):
+                tickers = snapshot_table.screen(request, tickers)
+            print(f"Found {len(tickers)} tickers matching universe filters")
+            return tickers
+
+        # Without reference-data filters the snapshot table is the universe
+        if len(snapshot_table) and not uses_reference_filters(request):
+            tickers = snapshot_table.screen(request)
+            print(f"Found {len(tickers)} tickers matching snapshot filters")
+            return tickers
             
         # Start with listing active tickers from Polygon
         url = f"https://api.polygon.io/v3/reference/tickers?active=true&sort=ticker&order=asc&limit=1000&apiKey={api_key}"
@@ -172,15 +356,6 @@ async def get_filtered_tickers(request: StockScreenerRequest, api_key: str) -> L
         if request.market_cap_max:
             url += f"&market_cap.lte={request.market_cap_max}"
         
-        if request.price_min:
-            url += f"&price.gte={request.price_min}"
-        
-        if request.price_max:
-            url += f"&price.lte={request.price_max}"
-        
-        if request.volume_min:
-            url += f"&volume.gte={request.volume_min}"
-        
         if request.is_etf is not None:
             url += f"&type={'ETF' if request.is_etf else 'CS'}"
         
@@ -213,6 +388,10 @@ async def get_filtered_tickers(request: StockScreenerRequest, api_key: str) -> L
             tickers.extend([result.get('ticker') for result in data.get('results', [])])
             next_url = data.get('next_url')
         
+        # Price, change and volume filters are masks over the snapshot table
+        if len(snapshot_table):
+            tickers = snapshot_table.screen(request, tickers)
+
         print(f"Found {len(tickers)} tickers matching criteria")
         return tickers
     except Exception as e:
@@ -224,8 +403,8 @@ async def get_filtered_tickers(request: StockScreenerRequest, api_key: str) -> L
 def should_include_ticker(details: TickerDetails, request: StockScreenerRequest) -> bool:
     # Apply industry filter if specified
     if request.industry and details.industry:
-        # Simple case-insensitive partial matching
-        if request.industry.lower() not in details.industry.lower().replace('_', ' '):
+        # Word-prefix partial matching, the same rule as the universe's industry token index
+        if not matches_text(request.industry, details.industry):
             return False
     
     # Apply country filter if specified
@@ -240,6 +419,19 @@ def should_include_ticker(details: TickerDetails, request: StockScreenerRequest)
     if request.dividend_max is not None and (details.dividend_yield is not None and details.dividend_yield > request.dividend_max):
         return False
     
+    # Apply price and change filters (already masked when the snapshot table is loaded)
+    if request.price_min is not None and (details.price is None or details.price < request.price_min):
+        return False
+
+    if request.price_max is not None and (details.price is None or details.price > request.price_max):
+        return False
+
+    if request.change_min is not None and (details.change_percent is None or details.change_percent < request.change_min):
+        return False
+
+    if request.change_max is not None and (details.change_percent is None or details.change_percent > request.change_max):
+        return False
+
     # Apply average volume filter if specified
     if request.volume_min is not None and (details.avg_volume is None or details.avg_volume < request.volume_min):
         return False
@@ -283,6 +475,8 @@ def should_include_ticker(details: TickerDetails, request: StockScreenerRequest)
             return False
         elif request.bollinger_signal == 'near_middle' and details.bollinger_position != 'middle':
             return False
+        elif request.bollinger_signal in ['squeeze', 'expansion'] and details.bollinger_width != request.bollinger_signal:
+            return False
             
     # Apply Keltner Channels filter
     if request.keltner_signal and details.keltner_position:
@@ -301,219 +495,242 @@ def should_include_ticker(details: TickerDetails, request: StockScreenerRequest)
         if request.stochastic_signal != details.stochastic_signal:
             return False
     
-    # Apply trend filter - would need more data points for a real implementation
-    # For now, we'll use a simple approximation based on the other indicators
+    # Apply trend filter
+    if request.trend and details.trend:
+        if request.trend != details.trend:
+            return False
     
     return True
 
+# How long each class of enrichment data is served from memory, in seconds
+ENRICHMENT_TTL = {
+    "reference": 24 * 3600.0,  # Name, type, market cap, SIC sector and industry
+    "company": 24 * 3600.0,  # Company meta: sector, industry, country, ratios
+    "snapshot": 15.0,  # Price, change and volume for tickers missing from the market snapshot
+    "indicators": 300.0,  # Indicator values for a ticker, timespan and window
+    "options": 24 * 3600.0,  # Whether the ticker has listed options
+}
+
+class EnrichmentCache:
+    """Enrichment lookups keyed by (data class, key), each class with its own TTL.
+
+    Concurrent requests for the same entry await one in-flight fetch, so
+    overlapping pages and repeated lookups hit Polygon once per data class.
+    Failed fetches (None) are not cached.
+    """
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 50_000):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (data class, key) -> (fetched_at, value)
+        self.pending: Dict[tuple, asyncio.Future] = {}
+
+    async def get(self, data_class: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        cache_key = (data_class, key)
+        entry = self.entries.get(cache_key)
+        if entry is not None and time.time() - entry[0] < self.ttls[data_class]:
+            return entry[1]
+        pending = self.pending.get(cache_key)
+        if pending is not None:
+            return await pending
+        future = self.pending[cache_key] = asyncio.ensure_future(fetch())
+        try:
+            value = await future
+        finally:
+            self.pending.pop(cache_key, None)
+        if value is not None:
+            self.entries[cache_key] = (time.time(), value)
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+enrichment_cache = EnrichmentCache(ENRICHMENT_TTL)
+
+async def fetch_reference(ticker: str, api_key: str) -> Optional[Dict[str, Any]]:
+    """Reference ticker details, shared by the name, type, market cap and SIC lookups"""
+    async def fetch():
+        data = await polygon_client.get_json(f"https://api.polygon.io/v3/reference/tickers/{ticker}?apiKey={api_key}")
+        return data.get('results', {}) if data else None
+    return await enrichment_cache.get("reference", ticker, fetch)
+
+async def fetch_snapshot(ticker: str, api_key: str) -> Dict[str, Any]:
+    async def fetch():
+        data = await polygon_client.get_json(f"https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers/{ticker}?apiKey={api_key}")
+        return data.get('ticker', {}) if data else None
+    return await enrichment_cache.get("snapshot", ticker, fetch) or {}
+
+async def fetch_company(ticker: str, api_key: str) -> Optional[Dict[str, Any]]:
+    async def fetch():
+        response = await polygon_client.get(f"https://api.polygon.io/v1/meta/symbols/{ticker}/company?apiKey={api_key}")
+        if response is None:
+            return None
+        # The legacy meta endpoint has nothing for many tickers, so a real miss is remembered as an empty record;
+        # rate limits, server errors and timeouts return None and are retried on the next lookup
+        if response.status_code == 404:
+            return {}
+        if response.status_code != 200:
+            print(f"Polygon API error: {response.status_code} for company meta of {ticker}")
+            return None
+        return (response.json() if response.content else None) or {}
+    return await enrichment_cache.get("company", ticker, fetch)
+
+async def fetch_indicator(ticker: str, indicator: str, timespan: str, window: int, api_key: str) -> List[float]:
+    """Indicator values, latest first"""
+    async def fetch():
+        url = f"https://api.polygon.io/v1/indicators/{indicator}/{ticker}?timespan={timespan}&window={window}&apiKey={api_key}"
+        data = await polygon_client.get_json(url)
+        if data and 'results' in data and data['results'].get('values'):
+            return [value['value'] if isinstance(value, dict) else value for value in data['results']['values']]
+        return None
+    return await enrichment_cache.get("indicators", f"{ticker}:{indicator}:{timespan}:{window}", fetch) or []
+
+async def fetch_has_options(ticker: str, api_key: str) -> Optional[bool]:
+    async def fetch():
+        data = await polygon_client.get_json(
+            f"https://api.polygon.io/v3/reference/options/contracts?underlying_ticker={ticker}&limit=1&apiKey={api_key}", timeout=5)
+        return len(data.get('results', [])) > 0 if data else None
+    return await enrichment_cache.get("options", ticker, fetch)
+
+# Map the screener timeframe to a Polygon indicator timespan
+def indicator_timespan(timeframe: Optional[str]) -> str:
+    if timeframe == "1w":
+        return "week"
+    elif timeframe in ("1m", "3m"):
+        return "month"
+    elif timeframe == "1y":
+        return "year"
+    return "day"
+
+def wants_indicators(request: Optional[StockScreenerRequest]) -> bool:
+    """Only fetch technical indicators if they're being used in the request"""
+    return bool(request and (request.rsi_min is not None or request.rsi_max is not None or
+                request.sma_comparison or request.macd_signal or
+                request.bollinger_signal or request.keltner_signal or request.stochastic_signal or
+                request.trend))
+
+async def no_values() -> List[float]:
+    return []
+
+# Indicator fields from per-ticker Polygon indicator values, used until the local bar panel is loaded
+def polygon_indicator_fields(price: Optional[float], rsi_values: List[float], sma20_values: List[float], sma50_values: List[float],
+                             ema20_values: List[float], atr_values: List[float]) -> Dict[str, Any]:
+    rsi = rsi_values[0] if rsi_values else None  # Latest RSI value
+    sma20 = sma20_values[0] if sma20_values else None
+    sma50 = sma50_values[0] if sma50_values else None
+    sma_status = None
+    keltner_position = None
+
+    # Determine SMA status
+    if sma20 is not None and sma50 is not None:
+        if sma20 > sma50:
+            sma_status = 'above'
+        elif sma20 < sma50:
+            sma_status = 'below'
+        # Basic crossover detection would need more data points
+
+    # Calculate Keltner Channels if we have both EMA and ATR
+    ema20 = ema20_values[0] if ema20_values else None
+    atr = atr_values[0] if atr_values else None
+    if ema20 is not None and atr is not None and price is not None:
+        # Standard multiplier is 2
+        multiplier = 2
+        upper_channel = ema20 + (multiplier * atr)
+        lower_channel = ema20 - (multiplier * atr)
+
+        # Determine position relative to Keltner Channels
+        if price > upper_channel:
+            keltner_position = 'above_upper'
+        elif price < lower_channel:
+            keltner_position = 'below_lower'
+        else:
+            keltner_position = 'within'
+
+        # Compare with the previous ATR for narrowing/widening channels
+        if len(atr_values) > 1:
+            atr_change = atr - atr_values[1]
+            # If ATR is decreasing, channels are narrowing (decreasing volatility)
+            if atr_change < -0.05:  # Threshold for significance
+                keltner_position = 'narrowing'
+            # If ATR is increasing, channels are widening (increasing volatility)
+            elif atr_change > 0.05:  # Threshold for significance
+                keltner_position = 'widening'
+
+    return {"rsi": rsi, "sma20": sma20, "sma50": sma50, "sma_status": sma_status, "keltner_position": keltner_position}
+
+# Indicator fields from the local indicator engine
+INDICATOR_FIELDS = ["rsi", "sma20", "sma50", "sma_status", "macd", "macd_signal", "bollinger_position", "bollinger_width",
+                    "keltner_position", "stochastic", "stochastic_signal", "trend"]
+
 # Helper function to get details for a specific ticker
-async def get_ticker_details(ticker: str, api_key: str, request: StockScreenerRequest = None) -> Optional[TickerDetails]:
+async def get_ticker_details(ticker: str, api_key: str, request: StockScreenerRequest = None,
+                             frame=None) -> Optional[TickerDetails]:
     try:
-        # Get ticker details from Polygon
-        ticker_url = f"https://api.polygon.io/v3/reference/tickers/{ticker}?apiKey={api_key}"
-        ticker_response = requests.get(ticker_url, timeout=10)  # Add timeout
-        
-        if ticker_response.status_code != 200:
-            print(f"Error fetching ticker details for {ticker}: {ticker_response.status_code}")
-            return None
-            
-        ticker_data = ticker_response.json().get('results', {})
-        
-        # Get latest price from Polygon
-        price_url = f"https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers/{ticker}?apiKey={api_key}"
-        price_response = requests.get(price_url, timeout=10)  # Add timeout
-        
-        price_data = {}
-        if price_response.status_code == 200:
-            price_data = price_response.json().get('ticker', {})
-        
+        timespan = indicator_timespan(request.timeframe if request else None)
+        use_indicators = wants_indicators(request)
+        store = get_contract_store()
+        quote = snapshot_table.quote(ticker)
+        universe = get_screener_universe()
+        reference = universe.lookup(ticker) if universe is not None else None
+
+        # Indicators from the caller's prepared frame cost no upstream calls; Polygon's are fetched only without one
+        local_indicators = frame.lookup(ticker) if use_indicators and frame is not None else None
+        fetch_indicators = use_indicators and local_indicators is None
+
+        # Every lookup for the ticker runs concurrently through the shared Polygon pool
+        (ticker_data, price_data, details_data, options_listed,
+         rsi_values, sma20_values, sma50_values, ema20_values, atr_values) = await asyncio.gather(
+            fetch_reference(ticker, api_key) if reference is None else asyncio.sleep(0),
+            fetch_snapshot(ticker, api_key) if quote is None else asyncio.sleep(0),
+            fetch_company(ticker, api_key) if reference is None else asyncio.sleep(0),
+            fetch_has_options(ticker, api_key) if store is None else asyncio.sleep(0),
+            *[fetch_indicator(ticker, indicator, timespan, window, api_key) if fetch_indicators else no_values()
+              for indicator, window in (("rsi", 14), ("sma", 20), ("sma", 50), ("ema", 20), ("atr", 20))]
+        )
+
+        # Reference fields come from the daily universe table, or from the per-ticker lookups without it
+        if reference is None:
+            if ticker_data is None:
+                print(f"Error fetching ticker details for {ticker}")
+                return None
+            reference = reference_fields(ticker_data, details_data or {})
+
         # Extract relevant data
-        name = ticker_data.get('name', '')
-        market_cap = ticker_data.get('market_cap')
-        
-        # Extract ticker details
-        price = price_data.get('day', {}).get('c') if price_data else None
-        change_percent = price_data.get('todaysChangePerc') if price_data else None
-        volume = price_data.get('day', {}).get('v') if price_data else None
-        avg_volume = price_data.get('prevDay', {}).get('v') if price_data else None
-        
-        # Get more details from additional Polygon endpoint
-        details_data = {}
-        try:
-            details_url = f"https://api.polygon.io/v1/meta/symbols/{ticker}/company?apiKey={api_key}"
-            details_response = requests.get(details_url, timeout=10)  # Add timeout
-            if details_response.status_code == 200:
-                details_data = details_response.json()
-        except Exception as e:
-            print(f"Error fetching additional details for {ticker}: {e}")
-        
-        # Extract sector, industry, country from details_data
-        sector = details_data.get('sector', None)
-        industry = details_data.get('industry', None)
-        country = details_data.get('country', None)
-        
-        # Get PE ratio and dividend yield
-        pe_ratio = details_data.get('pe_ratio')
-        dividend_yield = details_data.get('dividend_yield')
-        
-        # If essential data is missing, try to get it from a different source
-        if not sector or not industry:
-            try:
-                alt_details_url = f"https://api.polygon.io/v3/reference/tickers/{ticker}?apiKey={api_key}"
-                alt_details_response = requests.get(alt_details_url, timeout=10)  # Add timeout
-                if alt_details_response.status_code == 200:
-                    alt_details_data = alt_details_response.json().get('results', {})
-                    if not sector:
-                        sector = alt_details_data.get('sic_code', {}).get('sector')
-                    if not industry:
-                        industry = alt_details_data.get('sic_code', {}).get('industry')
-            except Exception as e:
-                print(f"Error fetching alternative details for {ticker}: {e}")
-        
-        # Get technical indicators data if requested
-        rsi = None
-        sma20 = None
-        sma50 = None
-        sma_status = None
-        macd = None
-        macd_signal = None
-        bollinger_position = None
-        keltner_position = None
-        stochastic = None
-        stochastic_signal = None
-        
-        # Only fetch technical indicators if they're being used in the request
-        if (request and (request.rsi_min is not None or request.rsi_max is not None or 
-                request.sma_comparison or request.macd_signal or 
-                request.bollinger_signal or request.keltner_signal or request.stochastic_signal or 
-                request.trend)):
-            # Map timeframe from request to Polygon API timespan
-            timespan = "day"  # Default
-            window_multiplier = 1
-            
-            # Convert timeframe to Polygon API parameters
-            if request.timeframe:
-                if request.timeframe == "1d":
-                    timespan = "day"
-                    window_multiplier = 1
-                elif request.timeframe == "1w":
-                    timespan = "week"
-                    window_multiplier = 1
-                elif request.timeframe == "1m":
-                    timespan = "month"
-                    window_multiplier = 1
-                elif request.timeframe == "3m":
-                    timespan = "month"
-                    window_multiplier = 3
-                elif request.timeframe == "1y":
-                    timespan = "year"
-                    window_multiplier = 1
-                    
-            print(f"Using timespan: {timespan} with multiplier: {window_multiplier} for technical indicators")
-            try:
-                # Get RSI data
-                rsi_url = f"https://api.polygon.io/v1/indicators/rsi/{ticker}?timespan={timespan}&window=14&apiKey={api_key}"
-                rsi_response = requests.get(rsi_url, timeout=10)  # Add timeout
-                if rsi_response.status_code == 200:
-                    rsi_data = rsi_response.json()
-                    if rsi_data and 'results' in rsi_data and rsi_data['results'].get('values'):
-                        rsi = rsi_data['results']['values'][0]  # Latest RSI value
-                
-                # Get SMA data (20 and 50 day)
-                sma20_url = f"https://api.polygon.io/v1/indicators/sma/{ticker}?timespan={timespan}&window=20&apiKey={api_key}"
-                sma20_response = requests.get(sma20_url, timeout=10)  # Add timeout
-                if sma20_response.status_code == 200:
-                    sma20_data = sma20_response.json()
-                    if sma20_data and 'results' in sma20_data and sma20_data['results'].get('values'):
-                        sma20 = sma20_data['results']['values'][0]  # Latest SMA20 value
-                
-                sma50_url = f"https://api.polygon.io/v1/indicators/sma/{ticker}?timespan={timespan}&window=50&apiKey={api_key}"
-                sma50_response = requests.get(sma50_url, timeout=10)  # Add timeout
-                if sma50_response.status_code == 200:
-                    sma50_data = sma50_response.json()
-                    if sma50_data and 'results' in sma50_data and sma50_data['results'].get('values'):
-                        sma50 = sma50_data['results']['values'][0]  # Latest SMA50 value
-                
-                # Determine SMA status
-                if sma20 is not None and sma50 is not None:
-                    if sma20 > sma50:
-                        sma_status = 'above'
-                    elif sma20 < sma50:
-                        sma_status = 'below'
-                    # Basic crossover detection would need more data points
-                    # For now we're simplifying
-                
-                # For a real implementation, we would get MACD, Bollinger Bands, Stochastic, etc.
-                # These APIs would need to be called specifically
-                
-                # Get data for Keltner Channels
-                try:
-                    # Get EMA20 data (exponential moving average)
-                    ema20_url = f"https://api.polygon.io/v1/indicators/ema/{ticker}?timespan={timespan}&window=20&apiKey={api_key}"
-                    ema20_response = requests.get(ema20_url, timeout=10)
-                    ema20 = None
-                    
-                    if ema20_response.status_code == 200:
-                        ema20_data = ema20_response.json()
-                        if ema20_data and 'results' in ema20_data and ema20_data['results'].get('values'):
-                            ema20 = ema20_data['results']['values'][0]  # Latest EMA20 value
-                    
-                    # Get ATR (Average True Range) for volatility measurement
-                    atr_url = f"https://api.polygon.io/v1/indicators/atr/{ticker}?timespan={timespan}&window=20&apiKey={api_key}"
-                    atr_response = requests.get(atr_url, timeout=10)
-                    atr = None
-                    
-                    if atr_response.status_code == 200:
-                        atr_data = atr_response.json()
-                        if atr_data and 'results' in atr_data and atr_data['results'].get('values'):
-                            atr = atr_data['results']['values'][0]  # Latest ATR value
-                    
-                    # Calculate Keltner Channels if we have both EMA and ATR
-                    if ema20 is not None and atr is not None and price is not None:
-                        # Standard multiplier is 2
-                        multiplier = 2
-                        upper_channel = ema20 + (multiplier * atr)
-                        lower_channel = ema20 - (multiplier * atr)
-                        
-                        # Determine position relative to Keltner Channels
-                        if price > upper_channel:
-                            keltner_position = 'above_upper'
-                        elif price < lower_channel:
-                            keltner_position = 'below_lower'
-                        else:
-                            keltner_position = 'within'
-                            
-                        # Additional calculations for narrowing/widening would require historical data
-                        # For a simplified approach, let's get yesterday's ATR for comparison
-                        if len(atr_data['results']['values']) > 1:
-                            prev_atr = atr_data['results']['values'][1]  # Yesterday's ATR value
-                            atr_change = atr - prev_atr
-                            
-                            # If ATR is decreasing, channels are narrowing (decreasing volatility)
-                            if atr_change < -0.05:  # Threshold for significance
-                                keltner_position = 'narrowing'
-                            # If ATR is increasing, channels are widening (increasing volatility)
-                            elif atr_change > 0.05:  # Threshold for significance
-                                keltner_position = 'widening'
-                except Exception as e:
-                    print(f"Error calculating Keltner Channels for {ticker}: {e}")
-                    keltner_position = None
-            except Exception as e:
-                print(f"Error fetching technical indicators for {ticker}: {e}")
-        
-        # Determine if it has options by checking if options are available
-        has_options = False
-        try:
-            options_url = f"https://api.polygon.io/v3/reference/options/contracts?underlying_ticker={ticker}&limit=1&apiKey={api_key}"
-            options_response = requests.get(options_url, timeout=5)  # Shorter timeout
-            if options_response.status_code == 200:
-                options_data = options_response.json()
-                has_options = len(options_data.get('results', [])) > 0
-        except Exception as e:
+        name = reference["name"]
+        market_cap = reference["market_cap"]
+
+        # Extract ticker details, from the market snapshot table when it has the ticker
+        if quote is None:
+            quote = snapshot_quote(price_data or {})
+        price = quote["price"]
+        change_percent = quote["change_percent"]
+        volume = quote["volume"]
+        avg_volume = quote["avg_volume"]
+
+        # Sector, industry, country, PE ratio and dividend yield
+        sector = reference["sector"]
+        industry = reference["industry"]
+        country = reference["country"]
+        pe_ratio = reference["pe_ratio"]
+        dividend_yield = reference["dividend_yield"]
+
+        # Technical indicators data
+        if local_indicators is not None:
+            indicators = {field: local_indicators.get(field) for field in INDICATOR_FIELDS}
+        elif fetch_indicators:
+            indicators = polygon_indicator_fields(price, rsi_values, sma20_values, sma50_values, ema20_values, atr_values)
+        else:
+            indicators = {}
+
+        # Determine if it has options
+        if store is not None:
+            # The daily contract reference already knows every optionable underlying
+            has_options = store.has_options(ticker)
+        elif options_listed is not None:
+            has_options = options_listed
+        else:
             # Fall back to simplified check based on market cap
             has_options = market_cap is not None and market_cap > 1_000_000_000
-            print(f"Error checking options for {ticker}, using fallback: {e}")
-        
+
         return TickerDetails(
             ticker=ticker,
             name=name,
@@ -527,24 +744,249 @@ async def get_ticker_details(ticker: str, api_key: str, request: StockScreenerRe
             avg_volume=avg_volume,
             pe_ratio=pe_ratio,
             dividend_yield=dividend_yield,
-            is_etf=(ticker_data.get('type') == 'ETF'),
+            is_etf=(reference["type"] == 'ETF'),
             has_options=has_options,
             # Technical indicators
-            rsi=rsi,
-            sma20=sma20,
-            sma50=sma50,
-            sma_status=sma_status,
-            macd=macd,
-            macd_signal=macd_signal,
-            bollinger_position=bollinger_position,
-            keltner_position=keltner_position,
-            stochastic=stochastic,
-            stochastic_signal=stochastic_signal
+            **indicators
         )
     except Exception as e:
         print(f"Error in get_ticker_details for {ticker}: {e}")
         return None
 
+# Query planning: cheap columnar predicates over the whole universe first, per-ticker enrichment
+# only for the survivors, and one sorted result set that every page is sliced from
+SCREEN_ENRICH_LIMIT = 1500  # Most tickers enriched for one screen
+SCREEN_ENRICH_BUDGET = 100  # Tickers enriched before a screen answers; the rest are enriched in the background
+SCREEN_RESULT_TTL = 60.0  # How long a planned result set serves further pages
+
+# TickerDetails attribute for each accepted sort_by spelling
+SORT_FIELDS = {
+    "marketCap": "market_cap", "changePercent": "change_percent", "avgVolume": "avg_volume",
+    "dividendYield": "dividend_yield", "peRatio": "pe_ratio"
+}
+
+# Sort fields available as columns without enrichment
+SNAPSHOT_SORT_COLUMNS = {"price": "price", "change_percent": "change_percent", "volume": "volume", "avg_volume": "prev_volume"}
+INDICATOR_SORT_COLUMNS = {"rsi", "sma20", "sma50", "macd", "stochastic"}
+UNIVERSE_SORT_COLUMNS = {"market_cap", "pe_ratio", "dividend_yield"}
+
+def sort_field(request: StockScreenerRequest) -> str:
+    field = request.sort_by or "ticker"
+    return SORT_FIELDS.get(field, field)
+
+class ScreenResultSet:
+    def __init__(self, tickers: List[str], details: Dict[str, TickerDetails], exact: bool = True, sort_exact: bool = True):
+        self.tickers = tickers
+        self.details = details
+        self.exact = exact
+        self.sort_exact = sort_exact
+        self.created = time.time()
+
+class PredicateStats:
+    """Observed pass rates per predicate, so the most selective columnar filters run first"""
+    def __init__(self):
+        self.pass_rates: Dict[str, float] = {}
+
+    def order(self, predicates: List[tuple]) -> List[tuple]:
+        return sorted(predicates, key=lambda predicate: self.pass_rates.get(predicate[0], 0.5))
+
+    def observe(self, name: str, checked: int, passed: int):
+        if checked:
+            rate = passed / checked
+            self.pass_rates[name] = 0.8 * self.pass_rates.get(name, rate) + 0.2 * rate
+
+predicate_stats = PredicateStats()
+
+def indicator_predicates(request: StockScreenerRequest, frame) -> List[tuple]:
+    """Columnar versions of the indicator post-filters, with the same handling of missing values"""
+    values, signals = frame.values, frame.signals
+    signal = lambda name, rows: signals[name][rows]
+    predicates = []
+    if request.rsi_min is not None:
+        predicates.append(("rsi_min", lambda rows: values["rsi"][rows] >= request.rsi_min))
+    if request.rsi_max is not None:
+        predicates.append(("rsi_max", lambda rows: ~(values["rsi"][rows] > request.rsi_max)))
+    if request.sma_comparison:
+        wanted = request.sma_comparison.replace("sma20_", "").replace("_sma50", "")
+        predicates.append(("sma_comparison", lambda rows: (signal("sma_status", rows) == wanted) | (signal("sma_status", rows) == "")))
+    if request.macd_signal:
+        predicates.append(("macd_signal", lambda rows: (signal("macd_signal", rows) == request.macd_signal) | (signal("macd_signal", rows) == "")))
+    if request.bollinger_signal in ("squeeze", "expansion"):
+        predicates.append(("bollinger_signal", lambda rows: (signal("bollinger_position", rows) == "")
+                           | (signal("bollinger_width", rows) == request.bollinger_signal)))
+    elif request.bollinger_signal:
+        wanted_position = request.bollinger_signal.replace("near_", "")
+        predicates.append(("bollinger_signal", lambda rows: (signal("bollinger_position", rows) == wanted_position)
+                           | (signal("bollinger_position", rows) == "")))
+    if request.keltner_signal:
+        wanted_keltner = ["narrowing", "widening"] if request.keltner_signal in ("narrowing", "widening") else [request.keltner_signal]
+        predicates.append(("keltner_signal", lambda rows: np.isin(signal("keltner_position", rows), wanted_keltner + [""])))
+    if request.stochastic_signal:
+        predicates.append(("stochastic_signal", lambda rows: (signal("stochastic_signal", rows) == request.stochastic_signal)
+                           | (signal("stochastic_signal", rows) == "")))
+    if request.trend:
+        predicates.append(("trend", lambda rows: (signal("trend", rows) == request.trend) | (signal("trend", rows) == "")))
+    return predicates
+
+def apply_columnar_predicates(request: StockScreenerRequest, tickers: List[str], frame) -> List[str]:
+    """Run the vectorized indicator predicates and the options lookup over every candidate"""
+    candidates = np.array(tickers, dtype=object)
+    if frame is not None and wants_indicators(request):
+        rows = np.array([frame.ticker_index.get(ticker, -1) for ticker in tickers], dtype=np.int64)
+        has_bar = np.zeros(len(rows), dtype=bool)
+        has_bar[rows >= 0] = frame.has_bar[rows[rows >= 0]]
+        # No bar means no indicator values: only rsi_min rejects missing values, the rest let them through
+        keep = has_bar | (request.rsi_min is None)
+        candidates, rows, has_bar = candidates[keep], rows[keep], has_bar[keep]
+        for name, predicate in predicate_stats.order(indicator_predicates(request, frame)):
+            passed = np.ones(len(rows), dtype=bool)
+            passed[has_bar] = predicate(rows[has_bar])
+            predicate_stats.observe(name, int(has_bar.sum()), int(passed[has_bar].sum()))
+            candidates, rows, has_bar = candidates[passed], rows[passed], has_bar[passed]
+
+    # With the universe loaded the options flag was already applied as a bitmap
+    store = get_contract_store()
+    if request.has_options is not None and store is not None and get_screener_universe() is None:
+        candidates = np.array([ticker for ticker in candidates if store.has_options(ticker) == request.has_options], dtype=object)
+    return candidates.tolist()
+
+def filters_need_enrichment(request: StockScreenerRequest, frame) -> bool:
+    """True when a filter can only be evaluated from per-ticker details"""
+    if (request.industry or request.country or request.dividend_min is not None or request.dividend_max is not None) \
+            and get_screener_universe() is None:
+        return True
+    if request.has_options is not None and get_contract_store() is None:
+        return True
+    if wants_indicators(request) and frame is None:
+        return True
+    return len(snapshot_table) == 0 and uses_snapshot_filters(request)
+
+def needs_enrichment(request: StockScreenerRequest, frame) -> bool:
+    """True when a filter or the sort key can only be evaluated from per-ticker details"""
+    return filters_need_enrichment(request, frame) or columnar_sort_values(request, [], frame) is None
+
+def columnar_sort_values(request: StockScreenerRequest, tickers: List[str], frame) -> Optional[np.ndarray]:
+    """The sort key for each ticker from the snapshot or indicator columns, None if it needs enrichment"""
+    field = sort_field(request)
+    if field == "ticker":
+        return np.array(tickers, dtype=object)
+    if field in SNAPSHOT_SORT_COLUMNS and len(snapshot_table):
+        rows = snapshot_table.rows(tickers)
+        column = getattr(snapshot_table, SNAPSHOT_SORT_COLUMNS[field])
+        return np.where(rows >= 0, column[np.maximum(rows, 0)], np.nan) if len(tickers) else np.zeros(0)
+    universe = get_screener_universe() if field in UNIVERSE_SORT_COLUMNS else None
+    if universe is not None:
+        rows = universe.rows(tickers)
+        return np.where(rows >= 0, universe.numbers[field][np.maximum(rows, 0)], np.nan) if len(tickers) else np.zeros(0)
+    if field in INDICATOR_SORT_COLUMNS and frame is not None:
+        rows = np.array([frame.ticker_index.get(ticker, -1) for ticker in tickers], dtype=np.int64)
+        return np.where(rows >= 0, frame.values[field][np.maximum(rows, 0)], np.nan) if len(tickers) else np.zeros(0)
+    return None
+
+def sorted_tickers(tickers: List[str], keys: np.ndarray, descending: bool) -> List[str]:
+    """Tickers ordered by key, missing keys last in either direction, ties by ticker"""
+    if keys.dtype == object:
+        order = sorted(range(len(tickers)), key=lambda i: keys[i], reverse=descending)
+        return [tickers[i] for i in order]
+    missing = np.isnan(keys)
+    order = np.lexsort((np.array(tickers, dtype=object).astype(str), -keys if descending else keys))
+    order = np.concatenate([order[~missing[order]], order[missing[order]]])
+    return [tickers[i] for i in order]
+
+def result_set_key(request: StockScreenerRequest) -> str:
+    return json.dumps(request.dict(exclude={"page", "limit"}), sort_keys=True, default=str)
+
+screen_results: "OrderedDict[str, ScreenResultSet]" = OrderedDict()
+screen_enrichments: Dict[str, asyncio.Task] = {}
+
+def cache_result_set(key: str, result_set: ScreenResultSet):
+    screen_results[key] = result_set
+    screen_results.move_to_end(key)
+    while len(screen_results) > 64:
+        screen_results.popitem(last=False)
+
+async def enrich_tickers(request: StockScreenerRequest, candidates: List[str], api_key: str, frame) -> List[TickerDetails]:
+    """Details of the candidates that pass the post-filters, in candidate order"""
+    enriched = await asyncio.gather(*[get_ticker_details(ticker, api_key, request, frame) for ticker in candidates],
+                                    return_exceptions=True)
+    kept = []
+    for ticker, result in zip(candidates, enriched):
+        if isinstance(result, Exception):
+            print(f"Error getting details for {ticker}: {result}")
+        elif result and should_include_ticker(result, request):
+            kept.append(result)
+    return kept
+
+def enriched_result(request: StockScreenerRequest, kept: List[TickerDetails], sorted_already: bool) -> tuple:
+    """(tickers, details) of enriched survivors, sorted by the requested field unless the columns already did"""
+    if sorted_already:
+        tickers = [result.ticker for result in kept]
+    else:
+        field = sort_field(request)
+        values = [getattr(result, field, None) for result in kept]
+        if any(isinstance(value, str) for value in values):
+            keys = np.array([value or "" for value in values], dtype=object)
+        else:
+            keys = np.array([value if isinstance(value, (int, float)) else np.nan for value in values], dtype=np.float64)
+        tickers = sorted_tickers([result.ticker for result in kept], keys, request.sort_direction == "desc")
+    return tickers, {result.ticker: result for result in kept}
+
+async def finish_enrichment(key: str, request: StockScreenerRequest, kept: List[TickerDetails], rest: List[str],
+                            sorted_already: bool, exact: bool, api_key: str, frame):
+    """Enrich the candidates a screen answered without, then replace its partial result set"""
+    try:
+        kept = kept + await enrich_tickers(request, rest, api_key, frame)
+        tickers, details = enriched_result(request, kept, sorted_already)
+        cache_result_set(key, ScreenResultSet(tickers, details, exact))
+        print(f"Finished enriching {len(rest)} more tickers in the background, {len(tickers)} passed")
+    except Exception as e:
+        print(f"Error enriching screen in the background: {e}")
+    finally:
+        screen_enrichments.pop(key, None)
+
+async def plan_screen(request: StockScreenerRequest, api_key: str, frame) -> ScreenResultSet:
+    """Filter the whole universe, cheapest predicates first, and sort it once for every page"""
+    key = result_set_key(request)
+    cached = screen_results.get(key)
+    if cached is not None and time.time() - cached.created < SCREEN_RESULT_TTL:
+        return cached
+
+    # Stage 1: reference filters and snapshot masks (price, change, volume) over the universe
+    tickers = await get_filtered_tickers(request, api_key)
+    # Stage 2: indicator masks and the options lookup, still columnar
+    tickers = apply_columnar_predicates(request, tickers, frame)
+    descending = request.sort_direction == "desc"
+
+    keys = columnar_sort_values(request, tickers, frame)
+    if keys is not None:
+        tickers = sorted_tickers(tickers, keys, descending)
+    details: Dict[str, TickerDetails] = {}
+    exact = sort_exact = True
+
+    # Stage 3: per-ticker enrichment, only for survivors and only when a filter or the sort needs it
+    if needs_enrichment(request, frame):
+        exact = len(tickers) <= SCREEN_ENRICH_LIMIT
+        candidates = tickers[:SCREEN_ENRICH_LIMIT]
+        head, rest = candidates[:SCREEN_ENRICH_BUDGET], candidates[SCREEN_ENRICH_BUDGET:]
+        print(f"Enriching {len(head)} of {len(tickers)} tickers that passed the columnar filters")
+        kept = await enrich_tickers(request, head, api_key, frame)
+        # Sorting only the enriched prefix would pass its order off as the top of the real one, so a sort
+        # that needs enrichment leaves a partial set in ticker order until every candidate is in
+        sort_exact = keys is not None or not rest
+        tickers, details = enriched_result(request, kept, keys is not None or bool(rest))
+        if rest:
+            # Answer from the first slice now; the full set replaces it in the cache once enriched
+            if key not in screen_enrichments:
+                screen_enrichments[key] = asyncio.create_task(
+                    finish_enrichment(key, request, kept, rest, keys is not None, exact, api_key, frame))
+            exact = False
+
+    result_set = ScreenResultSet(tickers, details, exact, sort_exact)
+    if exact or key in screen_enrichments:
+        # A partial set is only cached while its background enrichment hasn't replaced it yet
+        cache_result_set(key, result_set)
+    return result_set
+
 # Fallback list of common tickers in case the API fails
 def get_fallback_tickers() -> List[str]:
     return [
@@ -12,7 +12,7 @@ import uuid
 import time
 import re
 from app.apis.ted_brain_categories import sanitize_key
-from app.apis.options_flow import get_options_flow, OptionsFlowRequest
+from app.apis.options_flow import get_options_flow, OptionsFlowRequest, flow_aggregator, format_premium
 from app.apis.dark_pool import get_dark_pool_trades
 
 # Try to import Gemini library - gracefully handle if not available
@@ -653,6 +653,31 @@ async def generate_ai_response(message, history=None, user_context=None, include
             # Fetch options flow data
             flow_response = await get_options_flow(flow_request)
             
+            # Prefer today's premium aggregates, kept incrementally as prints are classified
+            aggregate = flow_aggregator.read(symbol, "day", top=3)
+            if aggregate.prints > 0:
+                total_premium = aggregate.call_premium + aggregate.put_premium
+                response = f"I analyzed today's options flow for {symbol}:\n\n"
+                response += f"• {aggregate.prints} sweeps/blocks, ${format_premium(total_premium)} total premium\n"
+                response += f"• Call premium ${format_premium(aggregate.call_premium)} vs put premium ${format_premium(aggregate.put_premium)}\n"
+                response += f"• Bullish ${format_premium(aggregate.bullish_premium)} vs bearish ${format_premium(aggregate.bearish_premium)} (by aggressor side)\n"
+                if aggregate.top_strikes:
+                    strikes = ", ".join(f"{s['strike']:g}{s['callPut']} (${format_premium(s['premium'])})" for s in aggregate.top_strikes)
+                    response += f"• Top strikes: {strikes}\n"
+                if aggregate.top_expiries:
+                    response += f"• Most active expiry: {aggregate.top_expiries[0]['expiry']}\n"
+                response += "\n"
+                
+                directional = aggregate.bullish_premium + aggregate.bearish_premium
+                if directional > 0 and aggregate.bullish_premium / directional > 0.6:
+                    response += "The options flow shows bullish positioning, led by calls bought at the ask and puts sold at the bid.\n"
+                elif directional > 0 and aggregate.bearish_premium / directional > 0.6:
+                    response += "The options flow shows bearish positioning, led by puts bought at the ask and calls sold at the bid.\n"
+                else:
+                    response += "The options flow shows mixed sentiment with balanced bullish/bearish premium.\n"
+                
+                return response, []
+            
             # Build response
             if flow_response and flow_response.data and len(flow_response.data) > 0:
                 calls = sum(1 for item in flow_response.data if item.callPut == "C")
@@ -684,30 +709,23 @@ async def generate_ai_response(message, history=None, user_context=None, include
             symbol = stock_symbols[0]
             
             # Fetch dark pool data
-            dp_response = await get_dark_pool_trades(symbol=symbol)
-            
+            dp_response = await get_dark_pool_trades(symbol=symbol, formatted=False)
+
             # Build response
-            if dp_response and dp_response.levels:
+            if dp_response and dp_response.level_stats:
                 response = f"I analyzed dark pool trading for {symbol}:\n\n"
-                
-                # Get current price
-                current_price = dp_response.levels.price.replace('$', '')
-                try:
-                    current_price = float(current_price)
-                except Exception:
-                    current_price = 0
-                
+                current_price = dp_response.level_stats.price
+
                 # Find key price levels
                 key_levels = []
-                for level in dp_response.levels.levels:
-                    if level.isHighlighted or float(level.percentage.replace('%', '')) > 5.0:
-                        price = float(level.price)
+                for level in dp_response.level_stats.levels:
+                    if level.significant or level.share > 5.0:
                         key_levels.append({
-                            'price': price,
+                            'price': level.price,
                             'volume': level.volume,
-                            'percentage': level.percentage
+                            'percentage': level.share
                         })
-                
+
                 # Sort by price
                 key_levels.sort(key=lambda x: x['price'])
                 
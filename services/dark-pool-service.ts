@@ -20,6 +20,7 @@ export interface PriceLevel {
   notional: string;
   percentage: string;
   spread: string;
+  prints?: string;
   isHighlighted: boolean;
 }
 